@@ -3,25 +3,68 @@
 # NECESSÁRIO: Instalar numpy, sounddevice, soundfile, PyQt5, scipy E keyboard
 # pip install numpy sounddevice soundfile PyQt5 scipy keyboard
 #
+import time
+_STARTUP_T0 = time.perf_counter() # Início do script, referência do relatório de --profile-startup
 import sys
 import os
+import argparse
+import tracemalloc
+import importlib
+import contextlib
 import numpy as np
-import sounddevice as sd
-import soundfile as sf
 import threading
 import queue
 import json 
-import keyboard 
+import copy
+import hashlib
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from math import gcd
+from numpy.lib.stride_tricks import sliding_window_view
 from PyQt5 import QtWidgets, QtCore, QtGui
-from scipy.signal import resample_poly
+_IMPORTS_DONE = time.perf_counter()
+# sounddevice, soundfile, keyboard e scipy.signal são importados sob demanda (ver LazyModule)
 
 # ==================== CONFIGURAÇÕES GLOBAIS (CORES E ÁUDIO) ====================
 # Taxa de amostragem (44100 Hz recomendado para USB/VB-CABLE)
 SAMPLERATE = 44100
 BLOCKSIZE = 512 
-CHANNELS = 1
+MIC_CHANNELS = 1 # O microfone é capturado em mono; a voz vai igual para todos os canais da saída
+MAX_OUTPUT_CHANNELS = 2 # Estéreo: clipes e músicas têm no máximo 2 canais, além disso seria só silêncio
 CONFIG_FILE = 'config.json'
+CONFIG_VERSION = 2 # Versão do esquema do config.json (arquivos sem 'version' são da versão 1)
+CONFIG_SAVE_DELAY_S = 0.5 # Janela em que as mudanças da configuração são juntadas numa única escrita
 ICON_PATH = 'logo.png' # Assumindo que o arquivo de ícone está na mesma pasta
+DISK_CACHE_DIR = 'clip_cache' # Clipes decodificados (.npy float32) + manifest.json, reaproveitados entre execuções
+CLIP_CACHE_MB = 256 # Orçamento padrão de memória para o cache de clipes decodificados
+PAGE_FRAMES = 1024 # Amostras float32 por página de 4 KB (pré-leitura dos clipes mapeados em memória)
+PREFETCH_FRAMES = SAMPLERATE // 2 # Quanto do clipe mapeado em memória é trazido para a RAM à frente da reprodução
+MANIFEST_SAVE_DELAY_S = 1.0 # Janela em que os clipes gravados no cache em disco viram uma única escrita do manifest
+PREWARM_WORKERS = max(2, min(8, os.cpu_count() or 2)) # Threads que decodificam clipes em paralelo
+RING_CAPACITY_FRAMES = BLOCKSIZE * 100 # Mesma capacidade da antiga fila (100 blocos)
+TARGET_LATENCY_MS = 60 # Latência máxima tolerada nos buffers antes de descartar áudio antigo
+MAX_VOICES = 16 # Tamanho fixo do pool de vozes do mixer (polifonia máxima)
+MAX_CALLBACK_FRAMES = BLOCKSIZE * 8 # Maior bloco aceito pelos buffers de trabalho dos callbacks
+STATS_SMOOTHING = 0.05 # Suavização exponencial do RMS nas estatísticas dos callbacks
+DRIFT_TARGET_BLOCKS = 1.5 # Reserva do buffer do microfone (em blocos de saída) além do bloco de entrada em trânsito
+DRIFT_SMOOTHING = 0.02 # Suavização exponencial do nível medido a cada callback
+DRIFT_KP = 1e-2 # Ganho proporcional do controle de drift (correção por erro relativo)
+DRIFT_KI = 5e-5 # Ganho integral do controle de drift (acumulado a cada callback)
+DRIFT_MAX_PPM = 2000 # Correção máxima da razão de reamostragem (partes por milhão)
+DRIFT_MAX_RATIO = 4 # Maior razão taxa_entrada/taxa_saída suportada (ex.: 192 kHz → 48 kHz)
+HIST_BINS = 64 # Número de faixas dos histogramas de instrumentação (a última acumula o excedente)
+DURATION_BIN_US = 50 # Largura da faixa do histograma de duração dos callbacks (µs)
+FILL_BIN_MS = 2 # Largura da faixa do histograma de preenchimento do buffer (ms)
+LATENCY_BIN_MS = 2 # Largura da faixa do histograma de latência ida-e-volta (ms)
+STREAM_CHUNK_FRAMES = 4096 # Frames lidos do arquivo por vez na música em streaming
+STREAM_BUFFER_S = 1.0 # Segundos de música decodificada mantidos à frente da reprodução
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.ogg', '.flac') # Arquivos reconhecidos na pasta do soundboard
+RESAMPLE_QUALITY = 'polyphase' # Qualidade padrão da reamostragem: linear, polyphase ou sinc
+CLIP_TARGET_LUFS = -16.0 # Loudness integrada (ITU-R BS.1770) para a qual os clipes do soundboard são ajustados
+CLIP_TRUE_PEAK_DBTP = -1.0 # Teto de true peak dos clipes depois do ganho de loudness
+STOP_FADE_MS = 5 # Fade-out de uma voz parada (evita o estalo do corte no meio da onda)
+CROSSFADE_MS = 30 # Transição voz ↔ música/efeitos: rampa do ducking do microfone e fade-in da música
 
 # Esquema de Cores Neon
 COLOR_BACKGROUND = '#1a1a1a'
@@ -32,192 +75,2626 @@ COLOR_WARNING = '#ffdd00'     # Amarelo/Laranja
 COLOR_ERROR = '#ff0000'
 COLOR_BORDER = '#333333'       # Borda discreta para grupos
 
-# Filas e flags de controle
-output_queue = queue.Queue(maxsize=100)
-monitor_queue = queue.Queue(maxsize=100) 
+# ==================== IMPORTAÇÕES SOB DEMANDA E PERFIL DA PARTIDA ====================
+
+class LazyModule:
+    """
+    Módulo importado só no primeiro uso, ou por load() na thread de partida, tirando do caminho
+    da janela o custo de scipy.signal (~1 s), do PortAudio e dos hooks de teclado. Depois de
+    carregado, os nomes públicos do módulo são copiados para o proxy: o acesso no callback de
+    áudio é uma busca comum no dicionário, sem passar por __getattr__.
+    """
+    def __init__(self, name):
+        self._lazy_name = name
+        self._lazy_lock = threading.Lock()
+        self.load_time = None # Segundos gastos na importação (None: ainda não carregado)
+
+    def load(self):
+        """Importa o módulo (uma única vez, mesmo com várias threads). Erros da importação sobem para quem chamou."""
+        with self._lazy_lock:
+            if self.load_time is None:
+                started = time.perf_counter()
+                module = importlib.import_module(self._lazy_name)
+                self.__dict__.update((name, value) for name, value in vars(module).items() if not name.startswith('_'))
+                self.load_time = time.perf_counter() - started
+        return self
+
+    def __getattr__(self, name):
+        # Só chega aqui antes do load() ou para nomes que o módulo não tem
+        if name.startswith('_') or self.load_time is not None:
+            raise AttributeError(f"módulo '{self._lazy_name}' não tem o atributo '{name}'")
+        return getattr(self.load(), name)
+
+sd = LazyModule('sounddevice') # OSError no load() se o PortAudio não estiver instalado
+sf = LazyModule('soundfile')
+keyboard = LazyModule('keyboard')
+scipy_signal = LazyModule('scipy.signal')
+
+class StartupProfile:
+    """Tempo de cada fase da abertura (thread principal e thread de partida), para --profile-startup."""
+    def __init__(self, t0):
+        self.t0 = t0
+        self.phases = [] # (nome, início, fim, thread)
+        self._lock = threading.Lock()
+
+    def add(self, name, start, end=None):
+        end = time.perf_counter() if end is None else end
+        with self._lock:
+            self.phases.append((name, start, end, threading.current_thread().name))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Registra a duração do bloco with como uma fase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start)
+
+    def mark(self, name):
+        """Registra um instante (fase de duração zero), ex.: a janela visível."""
+        now = time.perf_counter()
+        self.add(name, now, now)
+
+    def elapsed_ms(self, name):
+        """Milissegundos do início do script até o fim da fase (None se ela não aconteceu)."""
+        for phase_name, _, end, _ in self.phases:
+            if phase_name == name:
+                return (end - self.t0) * 1000
+        return None
+
+    def report(self):
+        print("\n=== Partida (ms desde o início do script) ===")
+        print(f"  {'fase':<44}{'duração':>9}{'fim':>9}  thread")
+        for name, start, end, thread in sorted(self.phases, key=lambda phase: phase[2]):
+            print(f"  {name:<44}{(end - start) * 1000:>9.1f}{(end - self.t0) * 1000:>9.1f}  {thread}")
+        visible, ready = self.elapsed_ms("janela visível"), self.elapsed_ms("pré-carga dos clipes")
+        if visible is not None:
+            print(f"Janela visível em {visible:.0f} ms" + (f"; pronto para tocar em {ready:.0f} ms" if ready is not None else ""))
+
+startup_profile = StartupProfile(_STARTUP_T0)
+
+# ==================== BUFFER CIRCULAR (SEM LOCK) ====================
+
+class RingBuffer:
+    """
+    Buffer circular float32 pré-alocado para UM produtor e UM consumidor.
+    Cada lado só altera o seu contador (escrita/leitura), que apenas cresce; como a
+    atribuição de int é atômica sob a GIL, não há lock nem alocação por bloco.
+    """
+    def __init__(self, capacity_frames, channels=MIC_CHANNELS):
+        self.capacity = capacity_frames
+        self.channels = channels
+        self._buf = np.zeros((capacity_frames, channels), dtype=np.float32)
+        self._write_count = 0 # Alterado somente pelo produtor
+        self._read_count = 0  # Alterado somente pelo consumidor
+        self._flush_to = -1 # Contador de escrita até onde o consumidor deve descartar
+        self.samplerate = SAMPLERATE # Taxa usada para converter o preenchimento em ms
+        self.max_fill = capacity_frames # Limite de latência (frames) imposto na leitura
+        self.overrun_frames = 0  # Frames descartados por falta de espaço
+        self.underrun_frames = 0 # Frames completados com silêncio
+        self.dropped_frames = 0  # Frames antigos descartados para respeitar max_fill
+
+    def fill(self):
+        """Quantidade de frames disponíveis para leitura."""
+        return self._write_count - self._read_count
+
+    def free(self):
+        """Espaço livre (em frames) para escrita."""
+        return self.capacity - self.fill()
+
+    def headroom(self):
+        """Frames que ainda cabem sem ultrapassar o limite de latência."""
+        return self.max_fill - self.fill()
+
+    def set_max_fill(self, frames):
+        """Define o limite de latência em frames (entre 1 bloco e a capacidade)."""
+        self.max_fill = max(BLOCKSIZE, min(int(frames), self.capacity))
+
+    def set_channels(self, channels):
+        """Realoca para outra contagem de canais, descartando o conteúdo (só com os streams parados)."""
+        if channels != self.channels:
+            self.channels = channels
+            self._buf = np.zeros((self.capacity, channels), dtype=np.float32)
+        self.clear()
+
+    @staticmethod
+    def _put(src, dst, gain):
+        # Ufuncs com broadcast alocam buffer interno: mono → N repete com copyto e aplica o ganho
+        # no lugar; N → mono soma os canais coluna a coluna e divide junto com o ganho
+        channels = src.shape[1]
+        if channels == dst.shape[1]:
+            np.multiply(src, gain, out=dst)
+        elif channels == 1:
+            np.copyto(dst, src)
+            np.multiply(dst, gain, out=dst)
+        else:
+            mono = dst[:, 0]
+            np.copyto(mono, src[:, 0])
+            for c in range(1, channels):
+                np.add(mono, src[:, c], out=mono)
+            np.multiply(dst, gain / channels, out=dst)
+
+    def write(self, data, gain=1.0):
+        """
+        Produtor: copia data (frames, canais) aplicando gain, convertendo para os canais do
+        buffer durante a própria cópia. Retorna os frames escritos.
+        """
+        frames = len(data)
+        n = min(frames, self.free())
+        if n < frames:
+            self.overrun_frames += frames - n
+        if n <= 0:
+            return 0
+
+        start = self._write_count % self.capacity
+        first = min(n, self.capacity - start)
+        self._put(data[:first], self._buf[start:start + first], gain)
+        if first < n:
+            self._put(data[first:n], self._buf[:n - first], gain)
+
+        self._write_count += n # Publica os frames só depois de copiados
+        return n
+
+    def read_into(self, out):
+        """
+        Consumidor: preenche out (frames, canais; um buffer mono é repetido em todos os canais),
+        completando com zeros no underrun. Retorna os frames lidos.
+        """
+        if self._flush_to >= 0:
+            self._read_count = max(self._read_count, self._flush_to)
+            self._flush_to = -1
+
+        frames = len(out)
+
+        # Descarta o áudio mais antigo se, após esta leitura, sobrar mais que max_fill
+        stale = self.fill() - frames - self.max_fill
+        if stale > 0:
+            self._read_count += stale
+            self.dropped_frames += stale
+
+        n = min(frames, self.fill())
+        if n > 0:
+            start = self._read_count % self.capacity
+            first = min(n, self.capacity - start)
+            np.copyto(out[:first], self._buf[start:start + first])
+            if first < n:
+                np.copyto(out[first:n], self._buf[:n - first])
+            self._read_count += n
+
+        if n < frames:
+            out[n:] = 0
+            self.underrun_frames += frames - n
+        return n
+
+    def clear(self):
+        """
+        Descarta o conteúdo já escrito. Seguro em qualquer thread: o consumidor aplica na
+        próxima leitura, preservando o que o produtor escrever depois desta chamada.
+        """
+        self._flush_to = self._write_count
+
+# Buffers e flags de controle
+output_channels = MAX_OUTPUT_CHANNELS  # Canais da saída virtual (negociados com o dispositivo)
+monitor_channels = MAX_OUTPUT_CHANNELS # Canais do monitor (podem ser diferentes dos da saída)
+output_ring = RingBuffer(RING_CAPACITY_FRAMES) # Microfone (mono) até a saída virtual
+monitor_ring = RingBuffer(RING_CAPACITY_FRAMES, monitor_channels) # Já no formato do dispositivo do monitor
+
+def set_target_latency(latency_ms, samplerate, input_samplerate=None):
+    """
+    Converte a latência alvo (ms) em frames e aplica aos buffers de saída e monitor.
+    O buffer do microfone guarda frames na taxa da entrada (a reamostragem é feita na leitura).
+    """
+    input_samplerate = input_samplerate or samplerate
+    for ring, sr in ((output_ring, input_samplerate), (monitor_ring, samplerate)):
+        ring.samplerate = sr
+        ring.set_max_fill(latency_ms * sr / 1000.0)
+
+# ==================== COMPENSAÇÃO DE DRIFT (MICROFONE → SAÍDA) ====================
+
+class DriftResampler:
+    """
+    Consumidor do buffer do microfone no modo de streams separados. Reamostra da taxa do
+    microfone para a da saída por interpolação cúbica (Catmull-Rom) com razão fracionária
+    ajustada continuamente por um controle PI do preenchimento do buffer: se o relógio da
+    entrada adianta, consome um pouco mais rápido; se atrasa, um pouco mais devagar. Assim a
+    latência fica constante por horas, sem cortes nem repetições de bloco. Todo o cálculo usa
+    buffers pré-alocados e é feito em mono; só a cópia final repete o resultado nos canais da saída.
+    """
+    HISTORY = 3 # Amostras guardadas no início (a interpolação cúbica olha uma para trás)
+
+    def __init__(self, ring, max_frames=MAX_CALLBACK_FRAMES, channels=MIC_CHANNELS):
+        self.ring = ring
+        self.clock = time.perf_counter # Relógio comum aos dois callbacks (o modo headless usa o simulado)
+        self._buf = np.zeros((max_frames * DRIFT_MAX_RATIO + 2 * self.HISTORY + 4, channels), dtype=np.float32)
+        self._ramp = np.arange(max_frames, dtype=np.float64)
+        self._pos = np.zeros(max_frames)
+        self._floor = np.zeros(max_frames)
+        self._idx = np.zeros(max_frames, dtype=np.intp)
+        self._frac = np.zeros((max_frames, 1), dtype=np.float32)
+        self._taps = np.zeros((4, max_frames, channels), dtype=np.float32)
+        self._tmp = np.zeros((max_frames, channels), dtype=np.float32)
+        self._tmp2 = np.zeros((max_frames, channels), dtype=np.float32)
+        self.configure(SAMPLERATE, SAMPLERATE)
+
+    def configure(self, input_sr, output_sr):
+        """Define as taxas nominais e zera o estado (chamado ao iniciar os streams)."""
+        self.input_samplerate = input_sr
+        self.nominal = input_sr / output_sr # Amostras de entrada por amostra de saída
+        self.ratio = self.nominal
+        self.correction = 0.0 # Correção atual (fração) aplicada sobre a razão nominal
+        self._integral = 0.0
+        self._t0 = 1.0 # Posição fracionária da próxima saída dentro de _buf
+        self._kept = self.HISTORY # Amostras já lidas do buffer e ainda não consumidas, no início de _buf
+        self._buf[:self.HISTORY] = 0
+        self._last_write = self.clock()
+        self._priming = True # Segura a leitura até o buffer chegar ao alvo (sem transiente de razão)
+        self.fill_avg = self.setpoint()
+
+    def mark_write(self):
+        """Chamado pelo input_callback logo após escrever no buffer."""
+        self._last_write = self.clock()
+
+    def setpoint(self):
+        """
+        Nível alvo (frames de entrada): um bloco de entrada em trânsito mais a reserva, abaixo
+        do limite de latência do buffer (com folga de um bloco antes do descarte), mas nunca
+        menor que o mínimo viável (o bloco em trânsito mais uma leitura).
+        """
+        minimum = BLOCKSIZE + BLOCKSIZE * self.nominal
+        target = BLOCKSIZE + DRIFT_TARGET_BLOCKS * BLOCKSIZE * self.nominal
+        return max(min(target, self.ring.max_fill - BLOCKSIZE), minimum)
+
+    def level(self):
+        """
+        Preenchimento contínuo: frames no buffer + idade da última escrita (em frames). Só o
+        preenchimento anda em degraus de um bloco inteiro quando as fases dos dois relógios se
+        cruzam; somando a idade da escrita o degrau se cancela e o drift aparece aos poucos.
+        """
+        age = min(max(self.clock() - self._last_write, 0.0), BLOCKSIZE / self.input_samplerate)
+        return self.ring.fill() + age * self.input_samplerate
+
+    def drift_ppm(self):
+        return self.correction * 1e6
+
+    def _steer(self):
+        """Controle PI: ajusta a razão pelo erro relativo do preenchimento suavizado."""
+        setpoint = self.setpoint()
+        self.fill_avg += DRIFT_SMOOTHING * (self.level() - self.fill_avg)
+        error = (self.fill_avg - setpoint) / setpoint
+        limit = DRIFT_MAX_PPM / 1e6
+        # Anti-windup: com a correção saturada o integrador só anda no sentido de sair do limite
+        if abs(self.correction) < limit or (error > 0) != (self.correction > 0):
+            self._integral = min(max(self._integral + DRIFT_KI * error, -limit), limit)
+        self.correction = min(max(DRIFT_KP * error + self._integral, -limit), limit)
+        self.ratio = self.nominal * (1.0 + self.correction)
+
+    def read_into(self, out):
+        """Preenche out (frames, canais) com o microfone reamostrado (underrun vira silêncio)."""
+        if self._priming:
+            excess = self.level() - self.setpoint()
+            if excess < 0:
+                out.fill(0)
+                return
+            # Descarta o que passou do alvo (o primeiro bloco pode chegar junto com outro)
+            self.ring.read_into(self._buf[self._kept:self._kept + min(int(excess), len(self._buf) - self._kept)])
+            self._priming = False
+        self._steer()
+
+        frames = len(out)
+        step = self.ratio
+        t0 = self._t0
+        t_next = t0 + step * frames
+        advance = int(t_next) - 1 # Início do que sobra para o próximo bloco (próximo t0 em [1, 2))
+        need = max(int(t0 + step * (frames - 1)) + 3, advance)
+
+        # Sobras do bloco anterior em _buf[:_kept]; as amostras novas entram logo depois
+        buf = self._buf
+        kept = self._kept
+        if need > kept:
+            self.ring.read_into(buf[kept:need])
+        else:
+            need = kept
+
+        # Posições das saídas (t0 + k * step), separadas em índice inteiro e fração
+        pos = self._pos[:frames]
+        np.multiply(self._ramp[:frames], step, out=pos)
+        np.add(pos, t0, out=pos)
+        floor = self._floor[:frames]
+        np.floor(pos, out=floor)
+        np.subtract(pos, floor, out=pos)
+        f = self._frac[:frames]
+        np.copyto(f[:, 0], pos) # Parte fracionária (conversão sem buffer temporário)
+        idx = self._idx[:frames]
+        np.copyto(idx, floor, casting='unsafe')
+
+        # Vizinhos x[-1], x[0], x[1], x[2] de cada posição
+        xm1, x0, x1, x2 = (tap[:frames] for tap in self._taps)
+        np.subtract(idx, 1, out=idx)
+        for tap in (xm1, x0, x1, x2):
+            np.take(buf, idx, axis=0, out=tap, mode='clip')
+            np.add(idx, 1, out=idx)
+
+        # Catmull-Rom: y = x0 + f/2 * (c + f * (b + f * a))
+        tmp, tmp2 = self._tmp[:frames], self._tmp2[:frames]
+        np.subtract(x0, x1, out=tmp)                                  # a = 3(x0 - x1) + x2 - x[-1]
+        np.multiply(tmp, 3.0, out=tmp)
+        np.add(tmp, x2, out=tmp)
+        np.subtract(tmp, xm1, out=tmp)
+        np.multiply(tmp, f, out=tmp)
+        np.multiply(xm1, 2.0, out=tmp2)                               # b = 2x[-1] - 5x0 + 4x1 - x2
+        np.add(tmp, tmp2, out=tmp)
+        np.multiply(x0, 5.0, out=tmp2)
+        np.subtract(tmp, tmp2, out=tmp)
+        np.multiply(x1, 4.0, out=tmp2)
+        np.add(tmp, tmp2, out=tmp)
+        np.subtract(tmp, x2, out=tmp)
+        np.multiply(tmp, f, out=tmp)
+        np.add(tmp, x1, out=tmp)                                      # c = x1 - x[-1]
+        np.subtract(tmp, xm1, out=tmp)
+        np.multiply(tmp, f, out=tmp)
+        np.multiply(tmp, 0.5, out=tmp)
+        np.add(x0, tmp, out=tmp)
+        np.copyto(out, tmp) # Mono → todos os canais da saída (o copyto repete sem buffer temporário)
+
+        # Guarda as amostras ainda não consumidas e a fase fracionária para o próximo bloco
+        self._kept = need - advance
+        np.copyto(buf[:self._kept], buf[advance:need])
+        self._t0 = t_next - advance
+
+mic_resampler = DriftResampler(output_ring)
+
+# ==================== CADEIA DE DSP (MICROFONE E LIMITADOR DA SAÍDA) ====================
+
+DSP_TIMING_WINDOW = 1024 # Blocos guardados por estágio para os percentis de CPU
+LIMITER_LOOKAHEAD_FRAMES = 64 # Antecipação do limitador (potência de 2; ~1,5 ms a 44,1 kHz)
+
+def _one_pole(time_ms, samplerate):
+    """Coeficientes (b, a) de um filtro de um polo com constante de tempo time_ms, em float32."""
+    alpha = np.exp(-1000.0 / (max(time_ms, 0.01) * samplerate))
+    return np.array([1.0 - alpha], dtype=np.float32), np.array([1.0, -alpha], dtype=np.float32)
+
+def _mean_square(block, out, tmp):
+    """Potência por amostra (média dos canais) de block (frames, canais) em out, sem alocar."""
+    np.multiply(block[:, 0], block[:, 0], out=out)
+    channels = block.shape[1]
+    for c in range(1, channels):
+        np.multiply(block[:, c], block[:, c], out=tmp)
+        np.add(out, tmp, out=out)
+    if channels > 1:
+        np.multiply(out, 1.0 / channels, out=out)
+
+def _apply_gain(block, gain):
+    """Multiplica cada canal de block pelo ganho por amostra (sem broadcast, que aloca buffer)."""
+    for c in range(block.shape[1]):
+        np.multiply(block[:, c], gain, out=block[:, c])
+
+class DSPStage:
+    """
+    Estágio de uma cadeia de DSP por blocos: processa (frames, canais) in-place com NumPy
+    vetorizado, e os filtros recursivos (scipy lfilter) guardam o estado entre blocos em zi.
+    Cada estágio tem um orçamento de CPU por bloco (budget_us, medido num bloco de BLOCKSIZE
+    frames) e a cadeia registra a duração de cada chamada para comparar com ele.
+    """
+    name = ''
+    label = ''
+    budget_us = 0.0
+    DEFAULTS = {}  # Parâmetro → valor padrão (o tipo do padrão vale para o valor salvo)
+    PARAMS = ()    # (parâmetro, rótulo, mínimo, máximo, passo) mostrados na aba de Configurações
+
+    def __init__(self, enabled=True, max_frames=MAX_CALLBACK_FRAMES):
+        self.enabled = self.default_enabled = enabled
+        self.max_frames = max_frames
+        self.samplerate = SAMPLERATE
+        self.channels = 1
+        for param, value in self.DEFAULTS.items():
+            setattr(self, param, value)
+        self._times = np.zeros(DSP_TIMING_WINDOW)
+        self.reset_stats()
+        self.configured = False # Os filtros (scipy) só são projetados no configure(), ao abrir os streams
+
+    def configure(self, samplerate, channels):
+        """Prepara o estágio para a taxa e os canais do stream e zera o estado dos filtros."""
+        self.samplerate, self.channels = samplerate, channels
+        self.configured = True
+        self._design()
+        self.reset()
+
+    def _design(self):
+        """Recalcula os coeficientes a partir dos parâmetros (sem mexer no estado)."""
+
+    def reset(self):
+        """Zera o estado carregado entre blocos."""
+
+    def process(self, block):
+        raise NotImplementedError
+
+    def settings(self):
+        return dict(enabled=self.enabled, **{param: getattr(self, param) for param in self.DEFAULTS})
+
+    def update(self, **settings):
+        """Aplica parâmetros (ex.: vindos do config.json); chaves desconhecidas são ignoradas."""
+        for key, value in settings.items():
+            if key == 'enabled':
+                self.enabled = bool(value)
+            elif key in self.DEFAULTS:
+                setattr(self, key, type(self.DEFAULTS[key])(value))
+        if self.configured:
+            self._design()
+
+    def reset_stats(self):
+        self.blocks = 0
+        self.max_duration = 0.0 # Segundos
+        self.over_budget = 0    # Blocos que passaram do orçamento
+
+    def record(self, elapsed):
+        self._times[self.blocks % DSP_TIMING_WINDOW] = elapsed
+        self.blocks += 1
+        if elapsed > self.max_duration:
+            self.max_duration = elapsed
+        if elapsed * 1e6 > self.budget_us:
+            self.over_budget += 1
+
+    def summary(self):
+        """Resumo da CPU por bloco (percentis sobre os últimos DSP_TIMING_WINDOW blocos)."""
+        times = self._times[:min(self.blocks, DSP_TIMING_WINDOW)] * 1e6
+        p50, p99 = np.percentile(times, (50, 99)) if len(times) else (0.0, 0.0)
+        return {'stage': self.name, 'enabled': self.enabled, 'blocks': self.blocks, 'budget_us': self.budget_us,
+                'duration_p50_us': round(float(p50), 1), 'duration_p99_us': round(float(p99), 1),
+                'duration_max_us': round(self.max_duration * 1e6, 1), 'over_budget': self.over_budget}
+
+class HighPassFilter(DSPStage):
+    """Butterworth de 2ª ordem: tira ronco, vento e o grave do 'pop' antes dos detectores."""
+    name = 'highpass'
+    label = "Filtro Passa-Altas"
+    budget_us = 60.0
+    DEFAULTS = {'cutoff_hz': 80.0}
+    PARAMS = (('cutoff_hz', "Corte (Hz)", 20.0, 400.0, 10.0),)
+
+    def _design(self):
+        b, a = scipy_signal.butter(2, min(self.cutoff_hz, 0.45 * self.samplerate), 'highpass', fs=self.samplerate)
+        self._coeffs = (b.astype(np.float32), a.astype(np.float32))
+
+    def reset(self):
+        self._zi = np.zeros((2, self.channels), dtype=np.float32)
+
+    def process(self, block):
+        b, a = self._coeffs
+        y, self._zi = scipy_signal.lfilter(b, a, block, axis=0, zi=self._zi)
+        np.copyto(block, y)
+
+class NoiseGate(DSPStage):
+    """
+    Gate pela potência suavizada: abaixo do limiar o ganho cai até 'range_db'. O ganho alvo
+    passa por dois filtros de um polo (ataque e liberação) e vale o maior dos dois, então o
+    gate abre rápido e fecha devagar sem laço por amostra.
+    """
+    name = 'gate'
+    label = "Noise Gate"
+    budget_us = 150.0
+    DEFAULTS = {'threshold_db': -50.0, 'range_db': -40.0, 'attack_ms': 2.0, 'release_ms': 150.0}
+    PARAMS = (('threshold_db', "Limiar (dBFS)", -90.0, 0.0, 1.0), ('range_db', "Redução (dB)", -90.0, 0.0, 1.0),
+              ('attack_ms', "Ataque (ms)", 0.1, 50.0, 0.5), ('release_ms', "Liberação (ms)", 5.0, 2000.0, 10.0))
+    DETECTOR_MS = 10.0
+
+    def __init__(self, enabled=True, max_frames=MAX_CALLBACK_FRAMES):
+        self._power = np.zeros(max_frames, dtype=np.float32)
+        self._tmp = np.zeros(max_frames, dtype=np.float32)
+        self._target = np.zeros(max_frames, dtype=np.float32)
+        self._open = np.zeros(max_frames, dtype=bool)
+        super().__init__(enabled, max_frames)
+
+    def _design(self):
+        self._detector = _one_pole(self.DETECTOR_MS, self.samplerate)
+        self._attack = _one_pole(self.attack_ms, self.samplerate)
+        self._release = _one_pole(self.release_ms, self.samplerate)
+        self._threshold = 10.0 ** (self.threshold_db / 10.0) # Em potência
+        self._floor = 10.0 ** (self.range_db / 20.0)
+
+    def reset(self):
+        self._detector_zi = np.zeros(1, dtype=np.float32)
+        self._attack_zi = np.zeros(1, dtype=np.float32)
+        self._release_zi = np.zeros(1, dtype=np.float32)
+
+    def process(self, block):
+        n = len(block)
+        power = self._power[:n]
+        _mean_square(block, power, self._tmp[:n])
+        envelope, self._detector_zi = scipy_signal.lfilter(*self._detector, power, zi=self._detector_zi)
+
+        # Alvo: 1 com o gate aberto, 'floor' com ele fechado
+        is_open, target = self._open[:n], self._target[:n]
+        np.greater(envelope, self._threshold, out=is_open)
+        np.copyto(target, is_open)
+        np.multiply(target, 1.0 - self._floor, out=target)
+        np.add(target, self._floor, out=target)
+
+        gain, self._attack_zi = scipy_signal.lfilter(*self._attack, target, zi=self._attack_zi)
+        slow, self._release_zi = scipy_signal.lfilter(*self._release, target, zi=self._release_zi)
+        np.maximum(gain, slow, out=gain)
+        _apply_gain(block, gain)
+
+class Compressor(DSPStage):
+    """
+    Compressor RMS: nível pela potência média numa janela de 'rms_ms', redução em dB acima
+    do limiar conforme a razão, suavizada por ataque (vale a maior redução) e liberação.
+    """
+    name = 'compressor'
+    label = "Compressor RMS"
+    budget_us = 200.0
+    DEFAULTS = {'threshold_db': -20.0, 'ratio': 3.0, 'attack_ms': 5.0, 'release_ms': 120.0, 'makeup_db': 3.0}
+    PARAMS = (('threshold_db', "Limiar (dBFS)", -60.0, 0.0, 1.0), ('ratio', "Razão (:1)", 1.0, 20.0, 0.5),
+              ('attack_ms', "Ataque (ms)", 0.1, 100.0, 0.5), ('release_ms', "Liberação (ms)", 10.0, 2000.0, 10.0),
+              ('makeup_db', "Ganho (dB)", 0.0, 24.0, 0.5))
+    RMS_MS = 10.0
+
+    def __init__(self, enabled=True, max_frames=MAX_CALLBACK_FRAMES):
+        self._power = np.zeros(max_frames, dtype=np.float32)
+        self._tmp = np.zeros(max_frames, dtype=np.float32)
+        super().__init__(enabled, max_frames)
+
+    def _design(self):
+        self._rms = _one_pole(self.RMS_MS, self.samplerate)
+        self._attack = _one_pole(self.attack_ms, self.samplerate)
+        self._release = _one_pole(self.release_ms, self.samplerate)
+        self._slope = 1.0 / max(self.ratio, 1.0) - 1.0 # dB de redução por dB acima do limiar
+
+    def reset(self):
+        self._rms_zi = np.zeros(1, dtype=np.float32)
+        self._attack_zi = np.zeros(1, dtype=np.float32)
+        self._release_zi = np.zeros(1, dtype=np.float32)
+
+    def process(self, block):
+        n = len(block)
+        power = self._power[:n]
+        _mean_square(block, power, self._tmp[:n])
+        level, self._rms_zi = scipy_signal.lfilter(*self._rms, power, zi=self._rms_zi)
+
+        # Redução em dB (≤ 0): (nível - limiar) * (1/razão - 1) acima do limiar
+        np.maximum(level, 1e-10, out=level)
+        np.log10(level, out=level)
+        np.multiply(level, 10.0, out=level)
+        np.subtract(level, self.threshold_db, out=level)
+        np.maximum(level, 0.0, out=level)
+        np.multiply(level, self._slope, out=level)
+
+        reduction, self._attack_zi = scipy_signal.lfilter(*self._attack, level, zi=self._attack_zi)
+        slow, self._release_zi = scipy_signal.lfilter(*self._release, level, zi=self._release_zi)
+        np.minimum(reduction, slow, out=reduction)
+        np.add(reduction, self.makeup_db, out=reduction)
+        np.multiply(reduction, 1.0 / 20.0, out=reduction)
+        np.power(10.0, reduction, out=reduction)
+        _apply_gain(block, reduction)
+
+class LookaheadLimiter(DSPStage):
+    """
+    Limitador com antecipação de LIMITER_LOOKAHEAD_FRAMES: o ganho necessário por amostra
+    (teto / pico entre os canais) passa por um mínimo deslizante e uma média móvel da mesma
+    janela, então a redução começa a descer uma janela antes do pico e chega nele já no valor
+    certo; a volta é suavizada pela liberação. O sinal sai atrasado de uma janela (menos uma
+    amostra). Substitui o antigo ajuste de pico por bloco, que bombeava o bloco inteiro.
+    """
+    name = 'limiter'
+    label = "Limitador (saída)"
+    budget_us = 200.0
+    DEFAULTS = {'ceiling': 0.95, 'release_ms': 80.0}
+    PARAMS = (('ceiling', "Teto (linear)", 0.1, 1.0, 0.01), ('release_ms', "Liberação (ms)", 5.0, 1000.0, 5.0))
+
+    def __init__(self, enabled=True, max_frames=MAX_CALLBACK_FRAMES):
+        self.min_gain = 1.0 # Menor ganho aplicado no último bloco
+        history = LIMITER_LOOKAHEAD_FRAMES - 1
+        self._need = np.ones(history + max_frames, dtype=np.float32)  # Ganho necessário (histórico + bloco)
+        self._min_a = np.zeros(history + max_frames, dtype=np.float32)
+        self._min_b = np.zeros(history + max_frames, dtype=np.float32)
+        self._window_min = np.ones(history + max_frames, dtype=np.float32)
+        self._cumsum = np.zeros(history + max_frames + 1)
+        self._gain = np.zeros(max_frames, dtype=np.float32)
+        self._tmp = np.zeros(max_frames, dtype=np.float32)
+        self._gain64 = np.zeros(max_frames)   # Ganho em float64 (misturar dtypes num ufunc aloca buffer de conversão)
+        self._released = np.zeros(max_frames) # Saída da liberação (float64, ver _design)
+        self._release_state = 1.0
+        super().__init__(enabled, max_frames)
+
+    def _design(self):
+        # Liberação de um polo em forma fechada, só com ufuncs in-place (o lfilter aloca a saída a
+        # cada bloco): y[n] = α^n · (α·y[-1] + (1-α)·Σ α^-k·x[k]). Como x > 0, a soma acumulada não
+        # perde precisão; o bloco é processado em trechos curtos o bastante para α^-k caber no float64.
+        # Uma tupla só, trocada de uma vez: o callback nunca vê metade de um projeto novo.
+        rate = 1000.0 / (max(self.release_ms, 0.01) * self.samplerate) # -ln(α)
+        span = max(1, min(self.max_frames, int(600.0 / rate)))
+        k = np.arange(span)
+        self._release = (float(np.exp(-rate)), span, np.exp(-rate * k), np.exp(rate * k))
+
+    def reset(self):
+        history = LIMITER_LOOKAHEAD_FRAMES - 1
+        self._delay = np.zeros((history + self.max_frames, self.channels), dtype=np.float32)
+        self._need.fill(1.0)
+        self._window_min.fill(1.0)
+        self._release_state = 1.0 # Repouso em ganho 1
+
+    def process(self, block):
+        n = len(block)
+        window = LIMITER_LOOKAHEAD_FRAMES
+        history = window - 1
+        delay = self._delay
+        np.copyto(delay[history:history + n], block)
+
+        # Ganho necessário por amostra: min(1, teto / pico entre os canais)
+        need = self._need[history:history + n]
+        tmp = self._tmp[:n]
+        np.abs(block[:, 0], out=need)
+        for c in range(1, block.shape[1]):
+            np.abs(block[:, c], out=tmp)
+            np.maximum(need, tmp, out=need)
+        np.maximum(need, self.ceiling, out=need)
+        np.divide(self.ceiling, need, out=need)
+
+        # Mínimo deslizante de 'window' amostras (terminando em cada amostra) por dobras de largura
+        src, dst, size, width = self._need, self._min_a, history + n, 1
+        while width < window:
+            np.minimum(src[:size - width], src[width:size], out=dst[:size - width])
+            size -= width
+            width *= 2
+            src, dst = dst, (self._min_b if dst is self._min_a else self._min_a)
+        np.copyto(self._window_min[history:history + n], src[:n])
+
+        # Média móvel do mínimo na mesma janela: rampa suave que chega ao mínimo na amostra do pico
+        cumsum = self._cumsum[:history + n + 1]
+        np.copyto(cumsum[1:], self._window_min[:history + n])
+        np.cumsum(cumsum[1:], out=cumsum[1:])
+        gain64 = self._gain64[:n]
+        np.subtract(cumsum[window:window + n], cumsum[:n], out=gain64)
+        np.multiply(gain64, 1.0 / window, out=gain64)
+
+        alpha, span, decay, growth = self._release
+        released = self._released[:n]
+        state = self._release_state
+        for start in range(0, n, span):
+            part = released[start:start + span]
+            m = len(part)
+            np.multiply(gain64[start:start + m], growth[:m], out=part)
+            np.cumsum(part, out=part)
+            np.multiply(part, 1.0 - alpha, out=part)
+            np.add(part, alpha * state, out=part)
+            np.multiply(part, decay[:m], out=part)
+            state = part[m - 1]
+        self._release_state = state
+        np.minimum(gain64, released, out=gain64)
+        gain = self._gain[:n]
+        np.copyto(gain, gain64, casting='same_kind')
+        self.min_gain = float(gain.min())
+
+        # Sinal atrasado de 'history' amostras, já com o ganho da amostra correspondente
+        for c in range(block.shape[1]):
+            np.multiply(delay[:n, c], gain, out=block[:, c])
+
+        # Históricos para o próximo bloco
+        np.copyto(delay[:history], delay[n:n + history])
+        np.copyto(self._need[:history], self._need[n:n + history])
+        np.copyto(self._window_min[:history], self._window_min[n:n + history])
+
+class DSPChain:
+    """Sequência de estágios aplicada in-place a cada bloco, com a CPU de cada estágio medida."""
+    def __init__(self, name, stages, max_frames=MAX_CALLBACK_FRAMES, channels=1):
+        self.name = name
+        self.stages = tuple(stages)
+        self.samplerate = SAMPLERATE
+        self.scratch = np.zeros((max_frames, channels), dtype=np.float32) # Entrada da cadeia (o callback copia aqui)
+
+    def configure(self, samplerate, channels):
+        """Ajusta a taxa e os canais do stream (só com os streams parados) e zera o estado."""
+        self.samplerate = samplerate
+        if channels != self.scratch.shape[1]:
+            self.scratch = np.zeros((len(self.scratch), channels), dtype=np.float32)
+        for stage in self.stages:
+            stage.configure(samplerate, channels)
+
+    def stage(self, name):
+        return next(stage for stage in self.stages if stage.name == name)
+
+    def process(self, block):
+        for stage in self.stages:
+            if stage.enabled:
+                started = time.perf_counter()
+                stage.process(block)
+                stage.record(time.perf_counter() - started)
+
+    def reset_stats(self):
+        for stage in self.stages:
+            stage.reset_stats()
+
+# Microfone: passa-altas → gate → compressor (na taxa do microfone); saída: limitador após a mixagem
+mic_chain = DSPChain('mic', (HighPassFilter(enabled=False), NoiseGate(enabled=False), Compressor(enabled=False)))
+output_limiter = LookaheadLimiter()
+output_chain = DSPChain('output', (output_limiter,), channels=MAX_OUTPUT_CHANNELS)
+DSP_CHAINS = (mic_chain, output_chain)
+
+def dsp_settings():
+    """Parâmetros de todos os estágios (salvos em 'dsp' no config.json)."""
+    return {stage.name: stage.settings() for chain in DSP_CHAINS for stage in chain.stages}
+
+def apply_dsp_settings(settings):
+    for chain in DSP_CHAINS:
+        for stage in chain.stages:
+            if isinstance(settings.get(stage.name), dict):
+                stage.update(**settings[stage.name])
+
+def dsp_report_lines():
+    """Uma linha de CPU por bloco para cada estágio ligado (diagnóstico e modo headless)."""
+    lines = []
+    for chain in DSP_CHAINS:
+        for stage in chain.stages:
+            if stage.enabled:
+                summary = stage.summary()
+                lines.append(f"{stage.label:20s}: p50 {summary['duration_p50_us']:6.1f} | p99 {summary['duration_p99_us']:6.1f} | "
+                             f"máx {summary['duration_max_us']:6.1f} µs (orçamento {stage.budget_us:.0f} µs, {stage.over_budget} blocos acima)")
+    return lines
+
+# ==================== MIXER (VOZ + MÚSICA + SOUNDBOARD) ====================
+
+MIXER_BUSES = ('music', 'sfx') # Barramentos de reprodução (o microfone é a base da mixagem)
+CROSSFADE_BUSES = ('music',) # Entram e saem cruzando com a voz; efeitos começam direto no ataque
+
+class Voice:
+    """
+    Slot do pool fixo de vozes: PCM pré-carregado, posição de leitura e ganho próprio.
+    Só o agendador ativa/libera o slot; o callback apenas avança pos e marca finished.
+    """
+    def __init__(self):
+        self.bus = None
+        self.key = None
+        self.gain = 1.0
+        self.data = None       # np.ndarray (frames, 1 ou output_channels) do clipe em reprodução
+        self.stream = None     # StreamingSource quando a voz toca em streaming (música longa)
+        self.pos = 0
+        self.sequence = 0      # Ordem de disparo (usada para roubar a voz mais antiga)
+        self.active = False    # Slot em uso (alterado só pelo agendador)
+        self.stopped = False   # Pedido de parada (qualquer thread)
+        self.finished = False  # Marcado pelo callback quando a voz sai da mixagem
+        self.choke_group = ''    # Grupo de corte: disparar outro atalho do grupo para esta voz
+        self.fade_in = 0         # Frames já percorridos do fade-in (só nos barramentos de CROSSFADE_BUSES)
+        self.fade_out = 0        # Frames já percorridos do fade-out depois de stop()
+        self.pressed_at = None   # Instante da tecla que disparou a voz (None: sem medida de latência)
+        self.activated_at = None # Instante em que o agendador publicou a voz
+        self.first_output = None # Instante (no DAC) da primeira amostra, marcado pelo callback
+
+    def stop(self):
+        self.stopped = True
+
+class Mixer:
+    """
+    Soma as vozes do pool ao microfone dentro do output_callback (uma multiplicação e uma
+    soma vetorizadas por voz por bloco). O pool é fixo e pré-alocado: o callback nunca
+    espera por lock nem cria objetos para tocar um clipe. Clipes mono tocam em todos os
+    canais (repetidos com copyto antes do ganho, sem buffer temporário).
+
+    Paradas e a troca voz ↔ áudio não são cortes secos: as envoltórias (cosseno elevado) são
+    calculadas uma vez por taxa e contagem de canais, já no formato do bloco (o broadcast de
+    uma coluna alocaria no callback), e aplicadas com a precisão de uma amostra: o fade-out
+    de STOP_FADE_MS a partir do bloco seguinte ao stop() e, em CROSSFADE_MS, a rampa do
+    ducking do microfone cruzando com o fade-in e o fade-out da música.
+    """
+    def __init__(self, num_voices=MAX_VOICES, max_frames=RING_CAPACITY_FRAMES, channels=MAX_OUTPUT_CHANNELS):
+        self.voices = tuple(Voice() for _ in range(num_voices))
+        self.max_frames = max_frames
+        self.samplerate = SAMPLERATE
+        self._scratch = np.zeros((max_frames, channels), dtype=np.float32)
+        self._envelope = np.zeros((max_frames, channels), dtype=np.float32) # Ganho do microfone durante a rampa
+        self.bus_gain = {bus: 1.0 for bus in MIXER_BUSES}
+        self.bus_ducking = {bus: True for bus in MIXER_BUSES} # Abaixa a voz enquanto o barramento toca
+        self.duck_level = 0.0 # Fator da voz durante o ducking (0 = voz pausada, como no SWITCH original)
+        self.duck_pos = 0 # Posição na rampa do microfone: 0 = voz inteira, len(rampa) - 1 = abaixada
+        self.output_time = 0.0 # Quando o bloco em mixagem chega ao DAC (definido pelo callback de saída)
+        self._build_envelopes()
+
+    def _build_envelopes(self):
+        """Pré-calcula as envoltórias para a taxa e os canais atuais (fora do callback)."""
+        channels = self._scratch.shape[1]
+
+        def ramp(time_ms):
+            # Cosseno elevado de 0 a 1, com as duas pontas incluídas
+            frames = max(1, int(round(self.samplerate * time_ms / 1000.0)))
+            curve = np.sin(0.5 * np.pi * np.arange(frames + 1) / frames) ** 2
+            return np.ascontiguousarray(np.repeat(curve[:, None], channels, axis=1), dtype=np.float32)
+
+        self._stop_fade = np.ascontiguousarray(ramp(STOP_FADE_MS)[-2::-1]) # 1 → 0, sem o 1 inicial
+        self._fade_in = ramp(CROSSFADE_MS)[1:]                             # 0 → 1, sem o 0 inicial
+        self._crossfade_out = np.ascontiguousarray(self._fade_in[::-1])   # 1 → 0, cruzando com a volta da voz
+        self._duck_ramp = ramp(CROSSFADE_MS)[::-1].copy()                  # 1 → 0: voz inteira → abaixada
+        self._unduck_ramp = self._duck_ramp[::-1].copy()                   # Volta (view invertida alocaria no callback)
+        self.duck_pos = min(self.duck_pos, len(self._duck_ramp) - 1)
+
+    def set_samplerate(self, samplerate):
+        """Recalcula as envoltórias para a taxa do stream de saída (só com ele parado)."""
+        if samplerate != self.samplerate:
+            self.samplerate = samplerate
+            self._build_envelopes()
+
+    def set_channels(self, channels):
+        """Realoca a mixagem para outra contagem de canais e para as vozes (formato antigo)."""
+        if channels != self._scratch.shape[1]:
+            for voice in self.voices:
+                voice.stop()
+            self._scratch = np.zeros((self.max_frames, channels), dtype=np.float32)
+            self._envelope = np.zeros((self.max_frames, channels), dtype=np.float32)
+            self._build_envelopes()
+
+    def active_voices(self):
+        return [v for v in self.voices if v.active and not v.finished]
+
+    def is_ducking(self):
+        """Indica se alguma voz ativa (e não parando) está abaixando o microfone."""
+        for voice in self.voices:
+            if voice.active and not voice.finished and not voice.stopped and self.bus_ducking.get(voice.bus):
+                return True
+        return False
+
+    def _duck_microphone(self, out):
+        """Leva o microfone ao nível do ducking (ou de volta) pela rampa, continuando de onde o bloco anterior parou."""
+        frames = len(out)
+        last = len(self._duck_ramp) - 1
+        target = last if self.duck_level < 1.0 and self.is_ducking() else 0
+        pos = self.duck_pos
+
+        if pos == target:
+            if pos and self.duck_level < 1.0:
+                np.multiply(out, self.duck_level, out=out)
+            return
+
+        n = min(frames, abs(target - pos))
+        if target > pos:
+            ramp = self._duck_ramp[pos + 1:pos + 1 + n]
+        else:
+            ramp = self._unduck_ramp[last - pos + 1:last - pos + 1 + n] # _duck_ramp[pos - 1], ..., [pos - n]
+        envelope = self._envelope[:n]
+        np.multiply(ramp, 1.0 - self.duck_level, out=envelope) # nível + (1 - nível) × rampa
+        np.add(envelope, self.duck_level, out=envelope)
+        np.multiply(out[:n], envelope, out=out[:n])
+        if n < frames and target and self.duck_level < 1.0:
+            np.multiply(out[n:], self.duck_level, out=out[n:])
+        self.duck_pos = pos + n if target > pos else pos - n
+
+    def _apply_fades(self, voice, scratch):
+        """
+        Aplica o fade-in e o fade-out da voz sobre o bloco já com ganho e retorna quantos frames
+        somar (o bloco acaba onde o fade-out termina; aí a voz sai da mixagem).
+        """
+        n = len(scratch)
+        crossfade = voice.bus in CROSSFADE_BUSES
+        if crossfade and voice.fade_in < len(self._fade_in):
+            m = min(n, len(self._fade_in) - voice.fade_in)
+            np.multiply(scratch[:m], self._fade_in[voice.fade_in:voice.fade_in + m], out=scratch[:m])
+            voice.fade_in += m
+        if voice.stopped:
+            fade = self._crossfade_out if crossfade else self._stop_fade
+            m = min(n, len(fade) - voice.fade_out)
+            np.multiply(scratch[:m], fade[voice.fade_out:voice.fade_out + m], out=scratch[:m])
+            voice.fade_out += m
+            if voice.fade_out >= len(fade):
+                voice.finished = True
+            return m
+        return n
+
+    def mix_into(self, out):
+        """Aplica o ducking sobre o microfone já presente em out e soma as vozes ativas."""
+        frames = len(out)
+
+        self._duck_microphone(out)
+
+        for voice in self.voices:
+            if not voice.active or voice.finished:
+                continue
+            if voice.stopped and voice.pos == 0:
+                voice.finished = True # Parada antes de soar: nada para esmaecer
+                continue
+
+            gain = voice.gain * self.bus_gain[voice.bus] * music_volume_factor
+            if voice.pos == 0:
+                voice.first_output = self.output_time # Primeira amostra da voz sai neste bloco
+
+            stream = voice.stream
+            if stream is not None:
+                target = stream.seek_target
+                if target is not None and target[0] != stream.applied_seek:
+                    # Seek publicado pelo agendador: buffer e posição mudam juntos, neste bloco
+                    stream.applied_seek, stream.play_ring, voice.pos = target
+                # Streaming: lê o que o agendador já decodificou (underrun vira silêncio)
+                scratch = self._scratch[:frames]
+                n = stream.play_ring.read_into(scratch)
+                np.multiply(scratch, gain, out=scratch)
+                m = self._apply_fades(voice, scratch)
+                np.add(out[:m], scratch[:m], out=out[:m])
+                voice.pos += n
+                if n < frames and stream.eof and stream.play_ring is stream.ring:
+                    voice.finished = True
+                continue
+
+            n = min(frames, len(voice.data) - voice.pos)
+            if n > 0:
+                scratch = self._scratch[:n]
+                block = voice.data[voice.pos:voice.pos + n]
+                if block.shape[1] == scratch.shape[1]:
+                    np.multiply(block, gain, out=scratch)
+                else:
+                    np.copyto(scratch, block)
+                    np.multiply(scratch, gain, out=scratch)
+                m = self._apply_fades(voice, scratch)
+                np.add(out[:m], scratch[:m], out=out[:m])
+                voice.pos += n
+
+            if voice.pos >= len(voice.data):
+                voice.finished = True
+
+mixer = Mixer()
+
 global_main_window = None
-mode_voice = True      
-playing_music = False
-stop_music_event = threading.Event()
 input_stream = None
 output_stream = None
 monitor_stream = None 
 music_volume_factor = 0.8 
 mic_volume_factor = 1.0 
 monitor_volume_factor = 0.5 
-current_soundboard_key = None     
-soundboard_stop_event = None      
 SOUNDBOARD_SHORTCUTS = {} 
+CLIP_TRIMS = {} # Caminho → [início_ms, fim_ms] definidos à mão (None = ponto detectado na análise)
+SHORTCUT_POLICIES = {} # Atalho customizado → PlayPolicy (ausente = modo padrão, alternar)
 
-# --- Funções de persistência e callbacks de áudio ---
-
-def save_config(input_idx, output_idx, monitor_idx, volume, mic_volume, monitor_volume, shortcuts, soundboard_folder):
-    """Salva a configuração atual em um arquivo JSON."""
-    config = {
-        'input_device_index': input_idx,
-        'output_device_index': output_idx,
-        'monitor_device_index': monitor_idx, 
-        'volume_level': volume,
-        'mic_volume_level': mic_volume,
-        'monitor_volume_level': monitor_volume, 
-        'soundboard_shortcuts': shortcuts,
-        'soundboard_folder': soundboard_folder
-    }
-    try:
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=4)
-    except Exception as e:
-        print(f"Erro ao salvar configuração: {e}", file=sys.stderr)
-
-def load_config():
-    """Carrega a configuração de um arquivo JSON."""
-    if os.path.exists(CONFIG_FILE):
+# --- Persistência da configuração (config.json) ---
+
+# Chave → (tipo, mínimo, máximo) validados na leitura; valores inválidos são descartados e o
+# código volta ao padrão dele. Chaves desconhecidas são mantidas (config de versão mais nova).
+SHORTCUT_SCHEMA = { # Campos de um atalho com modo de disparo próprio (ver PlayPolicy)
+    'path': (str, None, None),
+    'mode': (str, None, None),
+    'max_voices': (int, 1, MAX_VOICES),
+    'choke_group': (str, None, None),
+}
+
+CONFIG_SCHEMA = {
+    'input_device_index': (int, -1, None),
+    'output_device_index': (int, -1, None),
+    'monitor_device_index': (int, -1, None),
+    'volume_level': (int, 0, 100),
+    'mic_volume_level': (int, 0, 100),
+    'monitor_volume_level': (int, 0, 100),
+    'duck_level': (int, 0, 100),
+    'soundboard_shortcuts': (dict, None, None),
+    'soundboard_folder': (str, None, None),
+    'active_bank': (int, 0, None),
+    'clip_cache_mb': (int, 16, 4096),
+    'target_latency_ms': (int, 20, 1000),
+    'bus_ducking': (dict, None, None),
+    'duplex_mode': (bool, None, None),
+    'resample_quality': (str, None, None),
+    'disk_cache': (bool, None, None),
+    'clip_trims': (dict, None, None),
+    'dsp': (dict, None, None),
+}
+
+def _migrate_config_v1(config):
+    """1 → 2: atalhos sem arquivo (None ou '') eram gravados pela versão original; descarta."""
+    shortcuts = config.get('soundboard_shortcuts') or {}
+    if isinstance(shortcuts, dict):
+        config['soundboard_shortcuts'] = {k: v for k, v in shortcuts.items() if v}
+    return config
+
+CONFIG_MIGRATIONS = {1: _migrate_config_v1} # Versão de origem → função que leva à seguinte
+
+def migrate_config(config):
+    """Leva o dicionário lido do disco até CONFIG_VERSION e valida cada chave conhecida."""
+    version = config.get('version', 1)
+    if not isinstance(version, int) or version > CONFIG_VERSION:
+        print(f"config.json de versão desconhecida ({version}); lendo só as chaves conhecidas.", file=sys.stderr)
+        version = CONFIG_VERSION
+    while version < CONFIG_VERSION:
+        config = CONFIG_MIGRATIONS[version](config)
+        version += 1
+    config['version'] = version
+
+    _validate_fields(config, CONFIG_SCHEMA, '')
+    shortcuts = config.get('soundboard_shortcuts', {})
+    for hotkey, entry in list(shortcuts.items()):
+        if isinstance(entry, dict):
+            _validate_fields(entry, SHORTCUT_SCHEMA, f"soundboard_shortcuts.{hotkey}.")
+            entry = entry if entry.get('path') else None
+        if not isinstance(entry, str) and not isinstance(entry, dict):
+            print(f"config.json: atalho '{hotkey}' inválido ({shortcuts[hotkey]!r}); descartado.", file=sys.stderr)
+            del shortcuts[hotkey]
+    return config
+
+def _validate_fields(values, schema, prefix):
+    """Apaga (com um aviso) as chaves de values fora do esquema (tipo, mínimo, máximo) ou das opções válidas."""
+    for key, (kind, minimum, maximum) in schema.items():
+        if key not in values:
+            continue
+        value = values[key]
+        if kind is int and isinstance(value, float) and value.is_integer():
+            value = values[key] = int(value)
+        valid = isinstance(value, kind) and (kind is bool or not isinstance(value, bool))
+        if valid and kind is int:
+            valid = (minimum is None or value >= minimum) and (maximum is None or value <= maximum)
+        if key == 'resample_quality':
+            valid = valid and value in RESAMPLE_QUALITIES
+        elif key == 'mode':
+            valid = valid and value in PLAY_MODES
+        if not valid:
+            print(f"config.json: valor inválido para '{prefix}{key}' ({value!r}); usando o padrão.", file=sys.stderr)
+            del values[key]
+
+def load_config(path=CONFIG_FILE):
+    """Carrega a configuração de um arquivo JSON, já migrada e validada."""
+    if os.path.exists(path):
         try:
-            with open(CONFIG_FILE, 'r') as f:
-                return json.load(f)
+            with open(path, 'r') as f:
+                config = json.load(f)
+            if not isinstance(config, dict):
+                raise ValueError("o conteúdo não é um objeto JSON")
+            return migrate_config(config)
         except Exception as e:
-            print(f"Erro ao carregar configuração ({CONFIG_FILE}): {e}", file=sys.stderr)
-            return {}
-    return {} 
+            # O arquivo ilegível é guardado ao lado, para a próxima gravação não apagar os ajustes do usuário
+            print(f"Erro ao carregar configuração ({path}): {e}; guardado em {path}.invalid", file=sys.stderr)
+            try:
+                os.replace(path, f"{path}.invalid")
+            except OSError:
+                pass
+            return {'version': CONFIG_VERSION}
+    return {'version': CONFIG_VERSION}
+
+class ConfigService:
+    """
+    Dona da configuração em memória: a UI lê 'data' e registra mudanças com update(), que
+    só copia os valores e marca o estado como sujo (nunca toca o disco). Uma thread grava o
+    config.json no máximo uma vez por CONFIG_SAVE_DELAY_S, juntando tudo o que mudou na
+    janela (arrastar um slider vira uma escrita), de forma atômica: arquivo temporário e
+    os.replace, então uma queda no meio da escrita nunca deixa um config.json pela metade.
+    """
+    def __init__(self, path=CONFIG_FILE, delay=CONFIG_SAVE_DELAY_S):
+        self.path = path
+        self.delay = delay
+        self.data = {'version': CONFIG_VERSION}
+        self.writes = 0 # Escritas feitas (as mudanças juntadas não contam)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock() # flush() e a thread nunca escrevem o temporário juntas
+        self._changed = threading.Event()
+        self._version = 0 # Incrementada a cada update(); a gravação compara com a última gravada
+        self._saved_version = 0
+        self._thread = None
+
+    def load(self):
+        """Lê o arquivo (migrado e validado) e retorna o dicionário vivo da configuração."""
+        with self._lock:
+            self.data = load_config(self.path)
+        return self.data
+
+    def update(self, **changes):
+        """Registra mudanças (de qualquer thread); a escrita acontece depois, fora desta thread."""
+        changes = copy.deepcopy(changes) # A UI continua alterando os próprios dicionários
+        with self._lock:
+            self.data.update(changes)
+            self._version += 1
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ConfigWriter", daemon=True)
+            self._thread.start()
+        self._changed.set()
+
+    def flush(self):
+        """Grava já o que estiver pendente (ao sair do programa)."""
+        self._write()
+
+    def _run(self):
+        while True:
+            self._changed.wait()
+            time.sleep(self.delay) # Junta as mudanças que chegarem nessa janela
+            self._changed.clear()
+            self._write()
+
+    def _write(self):
+        with self._write_lock:
+            with self._lock:
+                if self._version == self._saved_version:
+                    return
+                version = self._version
+                text = json.dumps(self.data, indent=4)
+            try:
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp, 'w') as f:
+                    f.write(text)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            except Exception as e:
+                print(f"Erro ao salvar configuração: {e}", file=sys.stderr)
+                return
+            with self._lock:
+                self._saved_version = version
+                self.writes += 1
+
+config_service = ConfigService()
+
+# --- Callbacks de áudio ---
+
+class CallbackBuffers:
+    """
+    Buffers de trabalho pré-alocados de um stream e suas estatísticas correntes.
+    Tudo é calculado in-place (np.abs/np.multiply com out=), sem criar arrays por bloco.
+    """
+    def __init__(self, max_frames=MAX_CALLBACK_FRAMES, channels=MAX_OUTPUT_CHANNELS):
+        self.scratch = np.zeros((max_frames, channels), dtype=np.float32)
+        self.reset_stats()
+
+    def set_channels(self, channels):
+        if channels != self.scratch.shape[1]:
+            self.scratch = np.zeros((len(self.scratch), channels), dtype=np.float32)
+
+    def reset_stats(self):
+        self.callbacks = 0
+        self.peak = 0.0          # Pico do último bloco
+        self.peak_hold = 0.0     # Maior pico desde o último reset
+        self.rms = 0.0           # RMS suavizado
+        self.limited_blocks = 0  # Blocos em que o limitador reduziu o ganho
+
+    def measure(self, block):
+        """Atualiza pico e RMS com o bloco (frames, canais) e retorna o pico."""
+        scratch = self.scratch[:len(block)]
+        np.abs(block, out=scratch)
+        peak = float(scratch.max())
+        flat = block.reshape(-1)
+        rms = (float(np.dot(flat, flat)) / flat.size) ** 0.5
 
-def input_callback(indata, frames, time, status):
-    global mode_voice
+        self.callbacks += 1
+        self.peak = peak
+        if peak > self.peak_hold:
+            self.peak_hold = peak
+        self.rms += STATS_SMOOTHING * (rms - self.rms)
+        return peak
+
+output_buffers = CallbackBuffers()
+monitor_buffers = CallbackBuffers()
+
+def set_output_channels(output, monitor):
+    """
+    Ajusta o motor aos canais negociados com os dispositivos (só com os streams parados): a
+    saída virtual e o monitor podem ter contagens diferentes, e o buffer do monitor já guarda
+    no formato do dispositivo dele. Retorna True se os canais da saída mudaram (os clipes
+    decodificados para a contagem antiga deixam de servir).
+    """
+    global output_channels, monitor_channels
+    changed = output != output_channels
+    output_channels, monitor_channels = output, monitor
+    mixer.set_channels(output)
+    output_buffers.set_channels(output)
+    monitor_buffers.set_channels(monitor)
+    monitor_ring.set_channels(monitor)
+    return changed
+
+class StreamInstrumentation:
+    """
+    Instrumentação leve de um stream: duração de cada callback, flags de xrun do PortAudio,
+    preenchimento do buffer e latência ida-e-volta, acumulados em histogramas pré-alocados.
+    """
+    FLAGS = ('input_overflow', 'input_underflow', 'output_overflow', 'output_underflow')
+
+    def __init__(self, name):
+        self.name = name
+        self.duration_hist = np.zeros(HIST_BINS, dtype=np.int64) # Faixas de DURATION_BIN_US
+        self.fill_hist = np.zeros(HIST_BINS, dtype=np.int64)     # Faixas de FILL_BIN_MS
+        self.latency_hist = np.zeros(HIST_BINS, dtype=np.int64)  # Faixas de LATENCY_BIN_MS
+        self.reset()
+
+    def reset(self):
+        self.duration_hist[:] = 0
+        self.fill_hist[:] = 0
+        self.latency_hist[:] = 0
+        self.callbacks = 0
+        self.max_duration = 0.0 # Segundos
+        self.flag_counts = dict.fromkeys(self.FLAGS, 0)
+        self.last_fill_ms = 0.0
+        self.last_latency = 0.0 # Segundos (no input: só a latência de captura)
+
+    def record(self, started, status=None, fill_ms=-1.0, latency=-1.0):
+        """Registra um callback iniciado em 'started' (perf_counter). Valores negativos são ignorados."""
+        elapsed = time.perf_counter() - started
+        self.callbacks += 1
+        if elapsed > self.max_duration:
+            self.max_duration = elapsed
+        self.duration_hist[min(int(elapsed * 1e6 / DURATION_BIN_US), HIST_BINS - 1)] += 1
+
+        if status: # CallbackFlags só é verdadeiro quando algum flag está ligado
+            for flag in self.FLAGS:
+                if getattr(status, flag, False):
+                    self.flag_counts[flag] += 1
+
+        if fill_ms >= 0:
+            self.last_fill_ms = fill_ms
+            self.fill_hist[min(int(fill_ms / FILL_BIN_MS), HIST_BINS - 1)] += 1
+        if latency >= 0:
+            self.last_latency = latency
+            self.latency_hist[min(int(latency * 1000 / LATENCY_BIN_MS), HIST_BINS - 1)] += 1
+
+    @staticmethod
+    def percentile(hist, bin_width, q):
+        """Percentil aproximado (limite superior da faixa) a partir de um histograma."""
+        total = hist.sum()
+        if total == 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(hist), q / 100.0 * total))
+        return (min(index, HIST_BINS - 1) + 1) * bin_width
+
+    def summary(self):
+        """Resumo serializável (contadores, percentis e histogramas) para exibição e exportação."""
+        return {
+            'stream': self.name,
+            'callbacks': self.callbacks,
+            'duration_p50_us': self.percentile(self.duration_hist, DURATION_BIN_US, 50),
+            'duration_p99_us': self.percentile(self.duration_hist, DURATION_BIN_US, 99),
+            'duration_max_us': round(self.max_duration * 1e6, 1),
+            'fill_last_ms': round(self.last_fill_ms, 2),
+            'fill_p99_ms': self.percentile(self.fill_hist, FILL_BIN_MS, 99),
+            'latency_last_ms': round(self.last_latency * 1000, 2),
+            'latency_p50_ms': self.percentile(self.latency_hist, LATENCY_BIN_MS, 50),
+            'latency_p99_ms': self.percentile(self.latency_hist, LATENCY_BIN_MS, 99),
+            'flags': dict(self.flag_counts),
+            'duration_hist_us': {'bin_width': DURATION_BIN_US, 'counts': self.duration_hist.tolist()},
+            'fill_hist_ms': {'bin_width': FILL_BIN_MS, 'counts': self.fill_hist.tolist()},
+            'latency_hist_ms': {'bin_width': LATENCY_BIN_MS, 'counts': self.latency_hist.tolist()},
+        }
+
+input_stats = StreamInstrumentation('input')
+output_stats = StreamInstrumentation('output')
+monitor_stats = StreamInstrumentation('monitor')
+STREAM_STATS = (input_stats, output_stats, monitor_stats)
+
+def export_diagnostics(path):
+    """Exporta a instrumentação dos streams em JSON (.json) ou CSV (qualquer outra extensão)."""
+    summaries = [stats.summary() for stats in STREAM_STATS]
+    dsp = [stage.summary() for chain in DSP_CHAINS for stage in chain.stages]
+    triggers = trigger_stats.summary()
+    info = {'blocksize': BLOCKSIZE, 'samplerate': output_ring.samplerate, 'streams': summaries, 'dsp': dsp, 'triggers': triggers}
+
+    if path.lower().endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump(info, f, indent=4)
+        return
+
+    # CSV: uma linha por contador e uma por faixa de histograma
+    with open(path, 'w') as f:
+        f.write("stream,metric,bin_start,bin_end,value\n")
+        for summary in summaries:
+            name = summary['stream']
+            for metric, value in summary.items():
+                if isinstance(value, (int, float)) and metric != 'stream':
+                    f.write(f"{name},{metric},,,{value}\n")
+            for flag, count in summary['flags'].items():
+                f.write(f"{name},{flag},,,{count}\n")
+            for metric in ('duration_hist_us', 'fill_hist_ms', 'latency_hist_ms'):
+                width = summary[metric]['bin_width']
+                for i, count in enumerate(summary[metric]['counts']):
+                    f.write(f"{name},{metric},{i * width},{(i + 1) * width},{count}\n")
+        for summary in dsp:
+            for metric, value in summary.items():
+                if metric not in ('stage', 'enabled'):
+                    f.write(f"dsp_{summary['stage']},{metric},,,{value}\n")
+        for metric, value in triggers.items():
+            f.write(f"triggers,{metric},,,{value}\n")
+
+def input_callback(indata, frames, time_info, status):
+    started = time.perf_counter()
+    
+    # A voz nunca é descartada: o mixer decide se ela é abaixada (ducking)
+    # Volume e cadeia de DSP no buffer de trabalho da cadeia, depois direto no buffer circular
+    block = mic_chain.scratch[:frames]
+    np.multiply(indata, mic_volume_factor, out=block)
+    mic_chain.process(block)
+    output_ring.write(block)
+    mic_resampler.mark_write()
     
-    if mode_voice and not playing_music:
-        processed_data = indata * mic_volume_factor
-        output_queue.put(processed_data.copy())
+    # Latência de captura (ADC → callback); a saída soma o resto da ida-e-volta
+    capture = time_info.currentTime - time_info.inputBufferAdcTime if time_info is not None else -1.0
+    input_stats.record(started, status, latency=capture)
 
-def output_callback(outdata, frames, time, status):
-    global monitor_queue
-        
-    try:
-        data = output_queue.get_nowait()
-    except queue.Empty:
-        data = np.zeros((frames, CHANNELS), dtype='float32')
-
-    if data.shape[0] != frames:
-        # Padding ou Truncamento
-        if data.shape[0] < frames:
-             data = np.pad(data, ((0, frames - data.shape[0]), (0, 0))) 
-        else:
-             data = data[:frames] # Em caso de Buffer grande 
+def _finish_output_block(outdata):
+    """Etapas comuns da saída virtual: mixagem, cópia para o monitor e limitador com antecipação."""
+    # Soma música e efeitos por cima da voz
+    mixer.mix_into(outdata)
     
-    try:
-        monitor_queue.put_nowait(data.copy())
-    except queue.Full:
-        pass 
+    monitor_ring.write(outdata)
         
-    peak = np.max(np.abs(data))
-    if peak > 0.95: 
-        data = data * (0.95 / peak)
+    output_buffers.measure(outdata)
+    output_chain.process(outdata)
+    if output_limiter.enabled and output_limiter.min_gain < 0.999: # Abaixo do arredondamento da média móvel
+        output_buffers.limited_blocks += 1
+
+def _output_time(time_info):
+    """Instante (no relógio dos disparos) em que o bloco atual chega ao DAC."""
+    dac_delay = time_info.outputBufferDacTime - time_info.currentTime if time_info is not None else 0.0
+    return trigger_stats.clock() + dac_delay
+
+def output_callback(outdata, frames, time_info, status):
+    started = time.perf_counter()
+    fill_ms = output_ring.fill() * 1000.0 / output_ring.samplerate
+    mixer.output_time = _output_time(time_info)
+    
+    # Lê o microfone já reamostrado para o relógio da saída (o underrun é completado com silêncio)
+    mic_resampler.read_into(outdata)
     
-    outdata[:] = data
+    _finish_output_block(outdata)
+    
+    # Ida-e-volta: captura + tempo no buffer + (callback → DAC)
+    latency = -1.0
+    if time_info is not None:
+        latency = input_stats.last_latency + fill_ms / 1000.0 + (time_info.outputBufferDacTime - time_info.currentTime)
+    output_stats.record(started, status, fill_ms, latency)
 
-def monitor_callback(outdata, frames, time, status):
-    try:
-        data = monitor_queue.get_nowait()
-    except queue.Empty:
-        data = np.zeros((frames, CHANNELS), dtype='float32')
-        
-    if data.shape[0] != frames:
-        if data.shape[0] < frames:
-            data = np.pad(data, ((0, frames - data.shape[0]), (0, 0)))
-        else:
-            data = data[:frames]
-        
-    outdata[:] = data * monitor_volume_factor
+def duplex_callback(indata, outdata, frames, time_info, status):
+    """Modo duplex: o bloco do microfone vai direto para a saída no mesmo callback (sem buffer entre eles)."""
+    started = time.perf_counter()
+    mixer.output_time = _output_time(time_info)
+    
+    block = mic_chain.scratch[:frames]
+    np.multiply(indata, mic_volume_factor, out=block)
+    mic_chain.process(block)
+    np.copyto(outdata, block) # Microfone mono em todos os canais da saída
+    _finish_output_block(outdata)
+    
+    # No duplex a ida-e-volta vem direto dos tempos do PortAudio. O callback é um só: ele é
+    # medido uma vez, na saída (os flags de xrun do microfone chegam no mesmo status)
+    latency = time_info.outputBufferDacTime - time_info.inputBufferAdcTime if time_info is not None else -1.0
+    output_stats.record(started, status, 0.0, latency)
 
-def play_audio_thread(filepath, is_music, status_update_callback, hotkey=None, stop_event=None):
-    """Função genérica para tocar áudio em thread separada."""
-    global playing_music, mode_voice, current_soundboard_key, global_main_window
+def monitor_callback(outdata, frames, time_info, status):
+    started = time.perf_counter()
+    fill_ms = monitor_ring.fill() * 1000.0 / monitor_ring.samplerate
     
-    if not os.path.exists(filepath):
-        status_update_callback("Erro: Arquivo não encontrado.", COLOR_ERROR)
-        if not is_music:
-            mode_voice = True 
-            current_soundboard_key = None
-            if global_main_window:
-                global_main_window.update_monitor_stream_state()
-            while not output_queue.empty():
-                try: output_queue.get_nowait()
-                except: pass
-        return
+    monitor_ring.read_into(outdata)
+    np.multiply(outdata, monitor_volume_factor, out=outdata)
+    monitor_buffers.measure(outdata)
+    
+    monitor_stats.record(started, status, fill_ms)
 
-    # MÚSICA PRINCIPAL
-    if is_music:
-        stop_music_event.clear()
-        playing_music = True
-        mode_voice = False 
-        status_update_callback("MÚSICA Principal: Tocando → voz pausada", COLOR_ACCENT_AUDIO)
-        
-    # SOUNDBOARD
+# ==================== REAMOSTRAGEM ====================
+
+RESAMPLE_QUALITIES = {
+    'linear': "Linear (mais rápida, sem filtro anti-aliasing)",
+    'polyphase': "Polifásica (padrão, Kaiser β=5)",
+    'sinc': "Sinc janelada (máxima qualidade, Kaiser β=9)",
+}
+SINC_HALF_ZEROS = 32 # Cruzamentos por zero de cada lado do filtro da qualidade 'sinc'
+
+resample_quality = RESAMPLE_QUALITY
+
+_filter_cache = {} # (up, down, qualidade) -> filtro FIR projetado (somente leitura)
+_filter_lock = threading.Lock()
+
+def _design_filter(up, down, quality):
+    """Projeta o FIR passa-baixas da razão up/down (sem o ganho 'up', como no resample_poly)."""
+    max_rate = max(up, down)
+    if quality == 'linear':
+        # Triângulo de meia-largura 'up': equivale a interpolar linearmente entre amostras
+        h = (1.0 - np.abs(np.arange(1 - up, up)) / up) / up
+    elif quality == 'sinc':
+        half_len = SINC_HALF_ZEROS * max_rate
+        h = scipy_signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', 9.0))
     else:
-        mode_voice = False 
-        status_update_callback(f"Soundboard: Tocando atalho {hotkey} ({os.path.basename(filepath)}) → voz pausada", COLOR_ACCENT_AUDIO)
+        # Mesmo filtro padrão do resample_poly
+        half_len = 10 * max_rate
+        h = scipy_signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+    h.flags.writeable = False
+    return h
 
-    if global_main_window:
-        global_main_window.update_monitor_stream_state()
+def resample_filter(src_sr, dst_sr, quality=None):
+    """
+    Retorna (up, down, h) para converter src_sr → dst_sr. A razão é reduzida pelo MDC
+    (48000 → 44100 vira 147/160) e o filtro é projetado uma única vez por razão e qualidade.
+    """
+    quality = quality if quality in RESAMPLE_QUALITIES else resample_quality
+    g = gcd(int(src_sr), int(dst_sr))
+    up, down = int(dst_sr) // g, int(src_sr) // g
+    key = (up, down, quality)
+    with _filter_lock:
+        h = _filter_cache.get(key)
+    if h is None:
+        h = _design_filter(up, down, quality)
+        with _filter_lock:
+            h = _filter_cache.setdefault(key, h)
+    return up, down, h
 
-    try:
-        audio, sr = sf.read(filepath, dtype='float32')
-        
-        # Converte para mono
-        if len(audio.shape) > 1 and audio.shape[1] > 1:
-            audio = np.mean(audio, axis=1)
-            
-        # Resample para a taxa de amostragem do stream de saída (VB-CABLE)
-        target_sr = global_main_window.get_output_samplerate() if global_main_window else SAMPLERATE
-        if sr != target_sr:
-            audio = resample_poly(audio, target_sr, sr).astype(np.float32)
-            
-        # Aplica volume
-        peak = np.max(np.abs(audio))
-        if peak > 0:
-            audio = audio / peak * music_volume_factor
-
-        # Loop de reprodução
-        pos = 0
-        stop_condition = lambda: (is_music and stop_music_event.is_set()) or (not is_music and stop_event.is_set())
-
-        while pos < len(audio) and not stop_condition():
-            end = pos + BLOCKSIZE
-            block = audio[pos:end]
-            
-            if len(block) < BLOCKSIZE:
-                block = np.pad(block, (0, BLOCKSIZE - len(block)))
-            
-            if block.ndim == 1:
-                block = block.reshape(-1, 1)
-            
-            output_queue.put(block)
-            
-            pos = end
+def resample(audio, src_sr, dst_sr, quality=None):
+    """Reamostra um sinal inteiro (frames[, canais]) ao longo do eixo 0 com o filtro do cache."""
+    if int(src_sr) == int(dst_sr):
+        return audio
+    up, down, h = resample_filter(src_sr, dst_sr, quality)
+    return scipy_signal.resample_poly(audio, up, down, axis=0, window=h)
 
-    except Exception as e:
-        status_update_callback(f"Erro no áudio: {e}", COLOR_ERROR)
-    
-    finally:
-        while not output_queue.empty():
-            try: output_queue.get_nowait()
-            except: pass
-            
-        if is_music:
-            playing_music = False
-            status_update_callback("Música parada/finalizada → voltando sua voz...", COLOR_ACCENT_MIC)
-            
+class StreamingResampler:
+    """
+    Reamostrador polifásico com estado, equivalente ao resample() mas processando o
+    sinal em blocos consecutivos: guarda o histórico do filtro e a fase entre as chamadas.
+    """
+    def __init__(self, src_sr, dst_sr, channels=MIC_CHANNELS, quality=None):
+        self.up, self.down, h = resample_filter(src_sr, dst_sr, quality)
+        self.channels = channels
+
+        # Filtro do cache (com o ganho 'up' da sobreamostragem) decomposto em fases
+        half_len = (len(h) - 1) // 2
+        h = h * self.up
+        self.taps = -(-len(h) // self.up)
+        h = np.concatenate([h, np.zeros(self.taps * self.up - len(h))])
+        self._phases = np.ascontiguousarray(h.reshape(self.taps, self.up).T[:, ::-1], dtype=np.float32)
+        self._delay = half_len # Compensa o atraso do filtro (saída alinhada com a entrada)
+        self.reset()
+
+    def reset(self):
+        """Zera o estado (usado ao buscar outra posição do arquivo)."""
+        self._history = np.zeros((self.taps - 1, self.channels), dtype=np.float32)
+        self._base = -(self.taps - 1) # Índice absoluto de entrada do início do histórico
+        self._next = self._delay      # Próxima saída, em amostras da taxa sobreamostrada
+        self._in_total = 0
+        self._out_total = 0
+
+    def max_output(self, frames):
+        """Maior quantidade de frames que process() pode devolver para 'frames' de entrada."""
+        return -(-frames * self.up // self.down) + 1
+
+    def process(self, chunk):
+        """Reamostra o próximo bloco (frames, canais) da entrada."""
+        buf = np.concatenate([self._history, chunk])
+        self._in_total += len(chunk)
+        end = self._base + len(buf)
+
+        last = end * self.up - 1
+        count = (last - self._next) // self.down + 1 if last >= self._next else 0
+
+        n = self._next + self.down * np.arange(count)
+        q = n // self.up - self._base
+        windows = sliding_window_view(buf, self.taps, axis=0)
+        out = np.einsum('mct,mt->mc', windows[q - self.taps + 1], self._phases[n % self.up]).astype(np.float32)
+
+        self._next += self.down * count
+        self._out_total += count
+        self._history = buf[len(buf) - (self.taps - 1):]
+        self._base = end - (self.taps - 1)
+        return out
+
+    def flush(self):
+        """Esvazia o filtro no fim do arquivo, respeitando o tamanho total esperado da saída."""
+        expected = -(-self._in_total * self.up // self.down)
+        produced = self._out_total
+        out = self.process(np.zeros((self.taps, self.channels), dtype=np.float32))
+        return out[:max(0, expected - produced)]
+
+# ==================== ANÁLISE DE CLIPES (LOUDNESS ITU-R BS.1770 E SILÊNCIO) ====================
+
+LOUDNESS_BLOCK_S = 0.4 # Blocos de medição de 400 ms...
+LOUDNESS_STEP_S = 0.1  # ...com 75% de sobreposição
+LOUDNESS_ABSOLUTE_GATE = -70.0 # LUFS: blocos abaixo disso são silêncio
+LOUDNESS_RELATIVE_GATE = -10.0 # LU abaixo da média dos blocos que passaram pelo gate absoluto
+TRUE_PEAK_OVERSAMPLING = 4
+TRIM_THRESHOLD_DB = -50.0 # Abaixo disso (dB relativos ao pico do clipe) é silêncio ou ruído do encoder
+TRIM_PAD_MS = 10 # Margem mantida antes do início e depois do fim detectados (não come o ataque do som)
+
+_k_filter_cache = {} # taxa -> filtro K (2 biquads em formato sos)
+
+def k_weighting(samplerate):
+    """
+    Filtro K do BS.1770 (shelf de +4 dB nos agudos e passa-altas de ~38 Hz) como dois biquads.
+    Os coeficientes saem das equações do filtro analógico, que a 48 kHz reproduzem os da norma,
+    então o clipe é medido na própria taxa, sem reamostrar.
+    """
+    sos = _k_filter_cache.get(samplerate)
+    if sos is None:
+        # Shelf de agudos (transformação bilinear com pré-distorção em f0)
+        k = np.tan(np.pi * 1681.974450955533 / samplerate)
+        q = 0.7071752369554196
+        vh = 10 ** (3.999843853973347 / 20)
+        vb = vh ** 0.4996667741545416
+        shelf = [vh + vb * k / q + k * k, 2 * (k * k - vh), vh - vb * k / q + k * k,
+                 1 + k / q + k * k, 2 * (k * k - 1), 1 - k / q + k * k]
+        # Passa-altas
+        k = np.tan(np.pi * 38.13547087602444 / samplerate)
+        q = 0.5003270373238773
+        a0 = 1 + k / q + k * k
+        highpass = [a0, -2 * a0, a0, a0, 2 * (k * k - 1), 1 - k / q + k * k] # b = [1, -2, 1] como na norma
+        sos = np.array([shelf, highpass])
+        sos /= sos[:, 3:4] # Normaliza a0 = 1
+        sos = _k_filter_cache.setdefault(samplerate, sos)
+    return sos
+
+def analyze_loudness(audio, samplerate, playback_channels=1):
+    """
+    Mede o clipe uma única vez: retorna {'loudness': LUFS integrado (gates absoluto e relativo),
+    'true_peak': dBTP do sinal sobreamostrado 4x}. As potências dos canais são somadas (pesos
+    1,0 de L/R) e um clipe mono conta uma vez por canal em que vai tocar. Clipes menores que
+    um bloco de 400 ms são medidos como um bloco só; silêncio (ou tudo abaixo do gate) vira None.
+    """
+    if len(audio) == 0: # Arquivo vazio ou truncado: sem ganho (loudness_gain devolve 1,0)
+        return {'loudness': None, 'true_peak': None}
+    x = np.asarray(audio, dtype=np.float64).reshape(len(audio), -1)
+    if not np.any(x):
+        return {'loudness': None, 'true_peak': None}
+
+    y = scipy_signal.sosfilt(k_weighting(samplerate), x, axis=0)
+    power = np.sum(y * y, axis=1)
+    if x.shape[1] == 1:
+        power *= playback_channels
+    energy = np.concatenate(([0.0], np.cumsum(power)))
+    block, step = int(LOUDNESS_BLOCK_S * samplerate), int(LOUDNESS_STEP_S * samplerate)
+    if len(y) < block:
+        power = energy[-1:] / len(y)
+    else:
+        starts = np.arange(0, len(y) - block + 1, step)
+        power = (energy[starts + block] - energy[starts]) / block
+
+    # Gate absoluto e depois o relativo (10 LU abaixo da média do que sobrou)
+    gated = power[power > 10 ** ((LOUDNESS_ABSOLUTE_GATE + 0.691) / 10)]
+    if len(gated):
+        gated = gated[gated > gated.mean() * 10 ** (LOUDNESS_RELATIVE_GATE / 10)]
+    loudness = float(-0.691 + 10 * np.log10(gated.mean())) if len(gated) else None
+
+    oversampled = resample(x, samplerate, samplerate * TRUE_PEAK_OVERSAMPLING, 'polyphase')
+    peak = max(np.max(np.abs(oversampled)), np.max(np.abs(x)))
+    return {'loudness': loudness, 'true_peak': float(20 * np.log10(peak))}
+
+def find_trim(audio, samplerate):
+    """
+    Primeiro e último frame acima de TRIM_THRESHOLD_DB, com TRIM_PAD_MS de margem: retorna
+    {'start': frame, 'end': frame} para pular o silêncio inicial e o enchimento do encoder.
+    Um clipe todo em silêncio (ou vazio) fica inteiro.
+    """
+    if len(audio) == 0:
+        return {'start': 0, 'end': 0}
+    level = np.abs(np.asarray(audio).reshape(len(audio), -1)).max(axis=1)
+    peak = level.max()
+    if peak <= 0:
+        return {'start': 0, 'end': len(audio)}
+    above = np.flatnonzero(level > peak * 10 ** (TRIM_THRESHOLD_DB / 20))
+    pad = int(samplerate * TRIM_PAD_MS / 1000)
+    return {'start': int(max(above[0] - pad, 0)), 'end': int(min(above[-1] + 1 + pad, len(audio)))}
+
+def analyze_clip(audio, samplerate, playback_channels=1):
+    """Análise completa feita uma vez por clipe decodificado (guardada no manifest do cache em disco)."""
+    return dict(analyze_loudness(audio, samplerate, playback_channels), **find_trim(audio, samplerate))
+
+def loudness_gain(analysis):
+    """Ganho linear que leva o clipe a CLIP_TARGET_LUFS sem o true peak passar de CLIP_TRUE_PEAK_DBTP."""
+    loudness, true_peak = analysis.get('loudness'), analysis.get('true_peak')
+    if true_peak is None:
+        return 1.0
+    gain_db = CLIP_TRUE_PEAK_DBTP - true_peak
+    if loudness is not None:
+        gain_db = min(gain_db, CLIP_TARGET_LUFS - loudness)
+    return float(10 ** (gain_db / 20))
+
+# ==================== CACHE DE CLIPES (PCM DECODIFICADO) ====================
+
+class Clip:
+    """PCM decodificado de um arquivo, a análise feita uma única vez e o ganho que a reprodução aplica."""
+    __slots__ = ('audio', 'analysis', 'gain', 'start', 'end')
+
+    def __init__(self, audio, analysis):
+        self.audio = audio       # np.ndarray (frames, canais), no nível original do arquivo
+        self.analysis = analysis # {'loudness': LUFS, 'true_peak': dBTP, 'start': frame, 'end': frame}
+        self.gain = loudness_gain(analysis)
+        self.start = analysis.get('start', 0)
+        self.end = analysis.get('end', len(audio))
+
+    def segment(self, samplerate, trim=None):
+        """
+        View (sem cópia) do trecho que toca: do início ao fim detectados, ou dos pontos
+        manuais trim = [início_ms, fim_ms] quando definidos (None mantém o detectado).
+        """
+        start, end = self.start, self.end
+        if trim:
+            if trim[0] is not None:
+                start = int(trim[0] * samplerate / 1000)
+            if trim[1] is not None:
+                end = int(trim[1] * samplerate / 1000)
+        start = min(max(start, 0), len(self.audio))
+        return self.audio[start:max(start, min(end, len(self.audio)))]
+
+def decode_clip(filepath, target_sr, quality=None, channels=MAX_OUTPUT_CHANNELS):
+    """
+    Decodifica o arquivo e reamostra para target_sr (sem mexer no nível), mantendo os canais
+    do arquivo até 'channels': estéreo continua estéreo, mono fica mono (o mixer repete nos
+    canais da saída) e só uma saída mono recebe a mistura dos canais.
+    """
+    audio, sr = sf.read(filepath, dtype='float32', always_2d=True)
+
+    if audio.shape[1] > channels:
+        audio = audio.mean(axis=1, keepdims=True) if channels == 1 else audio[:, :channels]
+
+    # Resample para a taxa de amostragem do stream de saída (VB-CABLE)
+    audio = resample(audio, sr, target_sr, quality)
+
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+def touch_pages(audio, start=0, frames=PREFETCH_FRAMES):
+    """
+    Lê uma amostra por página de audio[start:start + frames] para trazer um clipe mapeado
+    em memória para o cache de páginas do SO antes de o callback precisar dele.
+    """
+    if len(audio) > start:
+        np.add.reduce(audio[start:start + frames:max(PAGE_FRAMES // audio.shape[1], 1), 0])
+
+class DiskClipStore:
+    """
+    Cache persistente em disco dos clipes decodificados: um .npy float32 por clipe (já
+    reamostrado) e um manifest.json com caminho, tamanho, mtime, hash do conteúdo do original
+    e a análise de loudness. Os clipes voltam com np.load(mmap_mode='r'): abrir é instantâneo,
+    as páginas entram sob demanda e são compartilhadas pelo cache de páginas do SO.
+    Arquivos com o mesmo conteúdo (cópias, renomeados, mtime alterado) reaproveitam o .npy.
+    """
+    MANIFEST = 'manifest.json'
+    VERSION = 3 # 2: PCM sem normalização de pico + análise de loudness; 3: clipes estéreo
+
+    def __init__(self, directory=DISK_CACHE_DIR):
+        self.directory = directory
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock() # Serializa as gravações do manifest (fora do _lock)
+        self._entries = None # Manifest carregado no primeiro uso
+        self._dirty = False
+        self._flush_timer = None
+
+    @staticmethod
+    def _entry_key(path, target_sr, quality, channels):
+        return f"{path}|{int(target_sr)}|{quality}|{channels}"
+
+    @staticmethod
+    def content_hash(path):
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _manifest_locked(self):
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(os.path.join(self.directory, self.MANIFEST), 'r') as f:
+                    manifest = json.load(f)
+                if manifest.get('version') == self.VERSION:
+                    self._entries = manifest.get('entries', {})
+                else:
+                    # Formato antigo: os .npy têm o mesmo nome mas outro conteúdo, então saem todos
+                    print("Cache em disco de uma versão anterior: os clipes serão decodificados de novo.", file=sys.stderr)
+                    for filename in os.listdir(self.directory):
+                        if filename.endswith('.npy'):
+                            os.remove(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Manifest do cache em disco inválido (será recriado): {e}", file=sys.stderr)
+        return self._entries
+
+    def _mark_dirty_locked(self):
+        """
+        Agenda a gravação do manifest para daqui a MANIFEST_SAVE_DELAY_S: uma pré-carga de N
+        clipes vira poucas escritas, e não N manifests inteiros regravados sob o lock. O timer
+        não é daemon, então o que estiver pendente é gravado antes do processo terminar.
+        """
+        self._dirty = True
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(MANIFEST_SAVE_DELAY_S, self.flush)
+            self._flush_timer.name = "ManifestWriter"
+            self._flush_timer.start()
+
+    def flush(self):
+        """Grava já o manifest, se mudou (fim de um lote de pré-carga, saída do programa)."""
+        with self._write_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                data = json.dumps({'version': self.VERSION, 'entries': self._entries}, indent=1)
+            # Escrita atômica: um manifest pela metade nunca substitui o anterior
+            path = os.path.join(self.directory, self.MANIFEST)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, 'w') as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"Erro ao gravar o manifest do cache em disco: {e}", file=sys.stderr)
+
+    def _remove_unreferenced_locked(self, filename):
+        if filename and not any(e.get('file') == filename for e in self._entries.values()):
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except OSError:
+                pass
+
+    def load(self, path, target_sr, quality, channels):
+        """
+        Retorna (Clip com o PCM mapeado em memória ou None, hash do conteúdo se precisou
+        calculá-lo), para o store() não ler o arquivo de novo depois de uma falha.
+        """
+        if not self.enabled:
+            return None, None
+        stat = os.stat(path)
+        key = self._entry_key(path, target_sr, quality, channels)
+        content = None
+        with self._lock:
+            entry = self._manifest_locked().get(key)
+            valid = entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime
+        if not valid:
+            # Mudou (ou é novo): o conteúdo decide; um .npy do mesmo áudio é reaproveitado
+            content = self.content_hash(path)
+            with self._lock:
+                entries = self._manifest_locked()
+                entry = next((e for e in entries.values() if e['hash'] == content and e['samplerate'] == int(target_sr)
+                              and e['quality'] == quality and e['channels'] == channels), None)
+                if entry is None:
+                    return None, content
+                old = entries.get(key)
+                entries[key] = dict(entry, path=path, size=stat.st_size, mtime=stat.st_mtime)
+                if old is not None:
+                    self._remove_unreferenced_locked(old.get('file'))
+                self._mark_dirty_locked()
+        try:
+            audio = np.load(os.path.join(self.directory, entry['file']), mmap_mode='r')
+            if audio.dtype != np.float32 or audio.ndim != 2 or audio.shape[1] > channels:
+                raise ValueError(f"formato inesperado {audio.dtype} {audio.shape}")
+        except Exception as e:
+            print(f"Cache em disco de '{path}' inválido (decodificando de novo): {e}", file=sys.stderr)
+            with self._lock:
+                self._manifest_locked().pop(key, None)
+            return None, content
+        audio = audio.view(np.ndarray) # View simples: o callback fatia o clipe sem passar pelo código Python do memmap
+        analysis = entry['analysis']
+        if 'start' not in analysis:
+            # Entrada gravada antes da detecção de silêncio: completa uma única vez
+            analysis = dict(analysis, **find_trim(audio, target_sr))
+            with self._lock:
+                current = self._manifest_locked().get(key)
+                if current is not None:
+                    current['analysis'] = analysis
+                    self._mark_dirty_locked()
+        return Clip(audio, analysis), content
+
+    def forget(self, paths):
+        """Tira do manifest os arquivos apagados e remove os .npy que nenhuma outra entrada usa."""
+        paths = set(paths)
+        with self._lock:
+            entries = self._manifest_locked()
+            gone = [key for key, entry in entries.items() if entry['path'] in paths]
+            if not gone:
+                return
+            for filename in {entries.pop(key).get('file') for key in gone}:
+                self._remove_unreferenced_locked(filename)
+            self._mark_dirty_locked()
+
+    def store(self, path, target_sr, quality, channels, clip, content=None):
+        """Grava o clipe decodificado e sua análise no manifest (erros só geram aviso)."""
+        if not self.enabled:
+            return
+        try:
+            stat = os.stat(path)
+            content = content or self.content_hash(path)
+            filename = f"{content}_{int(target_sr)}_{quality}_{channels}ch.npy"
+            os.makedirs(self.directory, exist_ok=True)
+            target = os.path.join(self.directory, filename)
+            if not os.path.exists(target):
+                tmp = f"{target}.{threading.get_ident()}.tmp"
+                with open(tmp, 'wb') as f:
+                    np.save(f, np.ascontiguousarray(clip.audio, dtype=np.float32))
+                os.replace(tmp, target)
+            key = self._entry_key(path, target_sr, quality, channels)
+            with self._lock:
+                entries = self._manifest_locked()
+                old = entries.get(key)
+                entries[key] = {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': content,
+                                'samplerate': int(target_sr), 'quality': quality, 'channels': channels,
+                                'frames': len(clip.audio), 'file': filename,
+                                'analysis': clip.analysis}
+                if old is not None and old.get('file') != filename:
+                    self._remove_unreferenced_locked(old.get('file'))
+                self._mark_dirty_locked()
+        except Exception as e:
+            print(f"Erro ao gravar '{path}' no cache em disco: {e}", file=sys.stderr)
+
+disk_store = DiskClipStore()
+
+class ClipCache:
+    """
+    Cache LRU em memória de clipes já decodificados, reamostrados e analisados (os que vêm
+    do DiskClipStore são mapeados em memória, então o orçamento limita o que fica aberto).
+    A chave é (caminho, mtime, taxa de saída, qualidade, canais da saída): editar o arquivo,
+    trocar o dispositivo de saída ou a qualidade da reamostragem gera uma entrada nova, e as
+    antigas saem pelo orçamento de memória.
+    """
+    def __init__(self, budget_mb=CLIP_CACHE_MB):
+        self._entries = OrderedDict() # chave -> Clip
+        self._loading = {}            # chave -> threading.Event (decodificação em andamento)
+        self._lock = threading.Lock()
+        self._pool = None             # ThreadPoolExecutor do pré-carregamento (criado no primeiro uso)
+        self._batch = []              # Futures do último lote de pré-carregamento
+        self.used_bytes = 0
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+
+    @staticmethod
+    def _make_key(filepath, target_sr):
+        path = os.path.abspath(filepath)
+        return (path, os.path.getmtime(path), int(target_sr), resample_quality, output_channels)
+
+    def set_budget(self, budget_mb):
+        """Altera o orçamento de memória e descarta o excedente imediatamente."""
+        with self._lock:
+            self.budget_bytes = int(budget_mb * 1024 * 1024)
+            self._evict_locked()
+
+    def _evict_locked(self):
+        # Remove os clipes usados há mais tempo até caber no orçamento (sempre mantém o mais recente)
+        while self.used_bytes > self.budget_bytes and len(self._entries) > 1:
+            _, clip = self._entries.popitem(last=False)
+            self.used_bytes -= clip.audio.nbytes
+
+    def invalidate(self, filepath):
+        """Descarta da memória todas as versões do arquivo (qualquer mtime, taxa ou qualidade)."""
+        path = os.path.abspath(filepath)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == path]:
+                self.used_bytes -= self._entries.pop(key).audio.nbytes
+
+    def peek(self, filepath, target_sr):
+        """Retorna o Clip se já estiver no cache, ou None (nunca decodifica)."""
+        key = self._make_key(filepath, target_sr)
+        with self._lock:
+            clip = self._entries.get(key)
+            if clip is not None:
+                self._entries.move_to_end(key)
+            return clip
+
+    def get(self, filepath, target_sr):
+        """Retorna o Clip, decodificando e analisando somente se ainda não estiver no cache."""
+        key = self._make_key(filepath, target_sr)
+
+        while True:
+            with self._lock:
+                clip = self._entries.get(key)
+                if clip is not None:
+                    self._entries.move_to_end(key)
+                    return clip
+                pending = self._loading.get(key)
+                if pending is None:
+                    pending = self._loading[key] = threading.Event()
+                    break
+            # Outra thread (ex.: pré-carregamento) já está decodificando: espera e tenta de novo
+            pending.wait()
+
+        try:
+            # Disco primeiro (mapeado em memória); só decodifica e analisa o que nunca foi visto
+            path, _, samplerate, quality, channels = key
+            clip, content = disk_store.load(path, samplerate, quality, channels)
+            if clip is None:
+                audio = decode_clip(path, samplerate, quality, channels)
+                clip = Clip(audio, analyze_clip(audio, samplerate, channels))
+                disk_store.store(path, samplerate, quality, channels, clip, content)
+            else:
+                touch_pages(clip.audio, clip.start) # O início do clipe já na RAM: o disparo não espera o disco
+            with self._lock:
+                self._entries[key] = clip
+                self.used_bytes += clip.audio.nbytes
+                self._evict_locked()
+            return clip
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            pending.set()
+
+    def _prewarm_one(self, path, target_sr):
+        try:
+            self.get(path, target_sr)
+            return True
+        except Exception as e:
+            print(f"Erro ao pré-carregar '{path}': {e}", file=sys.stderr)
+            return False
+
+    def prewarm_async(self, paths, target_sr, progress=None):
+        """
+        Decodifica em paralelo, num pool de threads, os arquivos que ainda não estão no cache
+        (a decodificação e a reamostragem rodam em C e liberam o GIL). O que ainda não começou
+        do lote anterior é cancelado. progress(feitos, total, falhas) é chamado de uma thread
+        do pool a cada arquivo concluído. Retorna os futures do lote.
+        """
+        paths = [p for p in dict.fromkeys(paths) if p and os.path.exists(p) and self.peek(p, target_sr) is None]
+        counter_lock = threading.Lock()
+        counts = [0, 0] # concluídos, falhas
+
+        def on_done(future):
+            if future.cancelled():
+                return
+            with counter_lock:
+                counts[0] += 1
+                counts[1] += not future.result()
+                done, failed = counts
+            if done == len(paths):
+                disk_store.flush() # Fim do lote: o manifest com todos os clipes novos numa escrita só
+            if progress is not None:
+                progress(done, len(paths), failed)
+
+        with self._lock:
+            for future in self._batch:
+                future.cancel()
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=PREWARM_WORKERS, thread_name_prefix='prewarm')
+            self._batch = [self._pool.submit(self._prewarm_one, path, target_sr) for path in paths]
+            batch = list(self._batch)
+        for future in batch:
+            future.add_done_callback(on_done)
+        return batch
+
+    def prewarm(self, paths, target_sr):
+        """Decodifica antecipadamente os arquivos informados e espera terminar (ignora os inválidos)."""
+        wait(self.prewarm_async(paths, target_sr))
+
+clip_cache = ClipCache()
+
+# ==================== STREAMING (MÚSICAS LONGAS) ====================
+
+class StreamingSource:
+    """
+    Decodifica um arquivo longo em blocos (sf.SoundFile.blocks) e reamostra em fluxo para um
+    buffer circular pequeno: a reprodução começa no primeiro bloco e a memória fica constante.
+    Sem ver o arquivo inteiro não há normalização de pico; o volume é o do próprio arquivo.
+    """
+    def __init__(self, filepath, target_sr, channels=MAX_OUTPUT_CHANNELS):
+        self.file = sf.SoundFile(filepath)
+        self.samplerate = int(target_sr)
+        self.channels = channels
+        self.resampler = None
+        if self.file.samplerate != self.samplerate:
+            self.resampler = StreamingResampler(self.file.samplerate, self.samplerate, channels)
+        self.ring = RingBuffer(int(self.samplerate * STREAM_BUFFER_S), channels) # Onde fill() escreve
+        self.play_ring = self.ring # Onde o callback lê (troca para o buffer novo de um seek)
+        self.eof = False
+        self.seek_target = None # (número do seek, buffer, posição em frames) publicado pelo agendador
+        self.applied_seek = 0   # Último seek aplicado pelo callback
+        self._seeks = 0
+        self._blocks = self._open_blocks()
+
+    def _open_blocks(self):
+        return self.file.blocks(blocksize=STREAM_CHUNK_FRAMES, dtype='float32', always_2d=True)
+
+    def duration(self):
+        return self.file.frames / self.file.samplerate
+
+    def fill(self):
+        """Decodifica blocos até o buffer ficar cheio (chamado pelo agendador)."""
+        needed = self.resampler.max_output(STREAM_CHUNK_FRAMES) if self.resampler else STREAM_CHUNK_FRAMES
+        while not self.eof and self.ring.free() >= needed:
+            try:
+                chunk = next(self._blocks)
+            except StopIteration:
+                if self.resampler:
+                    self.ring.write(self.resampler.flush())
+                self.eof = True
+                break
+
+            # Converte para o número de canais da saída
+            if chunk.shape[1] != self.channels:
+                if self.channels == 1:
+                    chunk = chunk.mean(axis=1, keepdims=True)
+                elif chunk.shape[1] == 1:
+                    chunk = np.repeat(chunk, self.channels, axis=1)
+                else:
+                    chunk = chunk[:, :self.channels]
+            if self.resampler:
+                chunk = self.resampler.process(chunk)
+            self.ring.write(chunk)
+
+    def seek(self, seconds):
+        """
+        Reposiciona a leitura (chamado pelo agendador). A posição nova é decodificada num
+        buffer novo e publicada em seek_target com uma única atribuição; o callback troca de
+        buffer e de posição juntos, na fronteira do bloco, e é o único que escreve voice.pos.
+        """
+        frame = int(min(max(seconds, 0.0), self.duration()) * self.file.samplerate)
+        self.file.seek(frame)
+        self._blocks = self._open_blocks()
+        if self.resampler:
+            self.resampler.reset()
+        self.ring = RingBuffer(self.ring.capacity, self.channels)
+        self.eof = False
+        self.fill()
+        position = frame / self.file.samplerate
+        self._seeks += 1
+        self.seek_target = (self._seeks, self.ring, int(position * self.samplerate))
+        return position
+
+    def close(self):
+        self.file.close()
+
+# ==================== AGENDADOR DE REPRODUÇÃO (POOL DE VOZES) ====================
+
+SCHEDULER_POLL_S = 0.02 # Intervalo para recolher vozes terminadas e reportar status
+TRIGGER_LOG_SIZE = 256 # Disparos mais recentes guardados para os percentis de latência
+
+class TriggerLatencyStats:
+    """
+    Latência de cada disparo, medida a partir do instante da tecla: até a voz ser publicada
+    no pool (caminho de software, alvo abaixo de 1 ms) e até a primeira amostra chegar ao
+    DAC (soma a espera pelo próximo bloco e a latência de saída do dispositivo). Cada medida
+    vai para o log (stderr) e para uma janela circular usada nos percentis.
+    """
+    def __init__(self, size=TRIGGER_LOG_SIZE):
+        self.clock = time.perf_counter # Relógio comum à tecla e ao callback (o modo headless usa o simulado)
+        self.log = True
+        self.size = size
+        self._activation = np.zeros(size)
+        self._first_sample = np.zeros(size)
+        self.reset()
+
+    def reset(self):
+        self.triggers = 0
+        self.last_activation = 0.0   # Segundos
+        self.last_first_sample = 0.0 # Segundos
+
+    def record(self, key, activation, first_sample):
+        slot = self.triggers % self.size
+        self._activation[slot] = activation
+        self._first_sample[slot] = first_sample
+        self.triggers += 1
+        self.last_activation, self.last_first_sample = activation, first_sample
+        if self.log:
+            print(f"Disparo '{key}': tecla → voz ativa {activation * 1e3:.3f} ms | tecla → 1ª amostra {first_sample * 1e3:.2f} ms",
+                  file=sys.stderr)
+
+    def summary(self):
+        """Percentis (ms) dos últimos 'size' disparos."""
+        count = min(self.triggers, self.size)
+        info = {'triggers': self.triggers}
+        for name, samples in (('activation', self._activation[:count]), ('first_sample', self._first_sample[:count])):
+            p50, p99 = np.percentile(samples, (50, 99)) * 1e3 if count else (0.0, 0.0)
+            info.update({f'{name}_p50_ms': round(float(p50), 3), f'{name}_p99_ms': round(float(p99), 3),
+                         f'{name}_max_ms': round(float(samples.max()) * 1e3, 3) if count else 0.0})
+        return info
+
+trigger_stats = TriggerLatencyStats()
+
+def _voice_state_text(bus):
+    """Descreve o que acontece com a voz enquanto o barramento toca."""
+    if not mixer.bus_ducking.get(bus) or mixer.duck_level >= 1.0:
+        return "voz mixada"
+    return "voz pausada" if mixer.duck_level <= 0 else "voz abaixada"
+
+PLAY_MODES = {
+    'toggle': "Alternar: a mesma tecla para o som",
+    'oneshot': "Uma vez: ignora a tecla enquanto toca",
+    'retrigger': "Reiniciar: toca de novo do começo",
+    'overlap': "Sobrepor: uma voz nova a cada tecla (até o limite)",
+}
+
+class PlayPolicy:
+    """
+    Como um atalho reage a disparos repetidos ('mode', um de PLAY_MODES; 'max_voices' vale
+    no modo sobrepor) e o grupo de corte dele: disparar um atalho do grupo para as vozes dos
+    outros atalhos do mesmo grupo.
+    """
+    __slots__ = ('mode', 'max_voices', 'choke_group')
+
+    def __init__(self, mode='toggle', max_voices=1, choke_group=''):
+        # Valores de um config.json editado à mão voltam ao padrão em vez de quebrar a abertura
+        self.mode = mode if isinstance(mode, str) and mode in PLAY_MODES else 'toggle'
+        try:
+            max_voices = int(max_voices)
+        except (TypeError, ValueError, OverflowError):
+            max_voices = 1
+        self.max_voices = max(1, min(max_voices, MAX_VOICES))
+        self.choke_group = choke_group.strip() if isinstance(choke_group, str) else ''
+
+    @classmethod
+    def from_config(cls, entry):
+        return cls(entry.get('mode', 'toggle'), entry.get('max_voices', 1), entry.get('choke_group', ''))
+
+    def to_config(self):
+        return {'mode': self.mode, 'max_voices': self.max_voices, 'choke_group': self.choke_group}
+
+    def is_default(self):
+        return self.mode == 'toggle' and self.max_voices == 1 and not self.choke_group
+
+DEFAULT_POLICY = PlayPolicy()
+
+class PlaybackScheduler:
+    """
+    Thread única e permanente dona do pool de vozes do mixer. A GUI (e os hotkeys) apenas
+    enfileiram comandos, processados em ordem; o callback de saída lê direto dos buffers
+    das vozes. Assim não há uma thread por clipe nem laço Python por bloco.
+    """
+    def __init__(self, voices):
+        self.voices = voices
+        self.samplerate = SAMPLERATE # Taxa do stream de saída (para buscar o clipe no cache)
+        self.status_callback = lambda message, color: None
+        self.state_callback = lambda: None # Avisado quando vozes começam/terminam
+        self._commands = queue.SimpleQueue()
+        self._loading = {}  # key -> (path, bus, grupo de corte) com decodificação em andamento (cache miss)
+        self._deferred = [] # Disparos aguardando o slot roubado ser liberado pelo callback
+        self._sequence = 0
+        self._thread = None
+
+    def start(self):
+        """Inicia a thread do agendador (uma única vez)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="PlaybackScheduler", daemon=True)
+            self._thread.start()
+
+    # --- API pública (qualquer thread) ---
+
+    def trigger(self, key, path, bus, policy=DEFAULT_POLICY, pressed=None):
+        """
+        Dispara o clipe da tecla conforme a PlayPolicy dela. 'pressed' é o instante da tecla
+        (trigger_stats.clock) para medir a latência até a primeira amostra.
+        """
+        self._commands.put(('trigger', key, path, bus, policy, pressed))
+
+    def toggle(self, key, path, bus, pressed=None):
+        """Inicia o clipe da tecla ou, se ela já estiver tocando, para a reprodução."""
+        self.trigger(key, path, bus, DEFAULT_POLICY, pressed)
+
+    def stop_all(self):
+        self._commands.put(('stop_all',))
+
+    def seek(self, key, seconds):
+        """Reposiciona uma voz em streaming (música principal)."""
+        self._commands.put(('seek', key, seconds))
+
+    def position(self, key):
+        """Retorna (posição, duração) em segundos da voz em streaming da tecla, ou None."""
+        for voice in self.voices:
+            stream = voice.stream
+            if voice.active and voice.key == key and stream is not None:
+                return voice.pos / stream.samplerate, stream.duration()
+        return None
+
+    def reset(self):
+        """Libera todas as vozes de imediato. Use só com o stream de saída parado."""
+        self._commands.put(('reset',))
+
+    def is_playing(self, key=None):
+        """Indica se a tecla (ou qualquer voz, se key for None) está tocando ou carregando."""
+        if key is None:
+            return bool(self._loading) or any(v.active for v in self.voices)
+        return (key in self._loading or any(item[0] == key for item in self._deferred)
+                or any(v.active and v.key == key for v in self.voices))
+
+    # --- Thread do agendador ---
+
+    def _run(self):
+        while True:
+            self.step(SCHEDULER_POLL_S)
+
+    def step(self, timeout=0):
+        """
+        Uma iteração do agendador: processa os comandos pendentes (esperando até 'timeout'
+        pelo primeiro), alimenta os streams e recolhe as vozes terminadas. O modo headless
+        chama este método direto, sem thread, para manter a simulação reprodutível.
+        """
+        try:
+            command = self._commands.get(timeout=timeout) if timeout else self._commands.get_nowait()
+        except queue.Empty:
+            command = None
+
+        while command is not None:
+            try:
+                self._handle(command)
+            except Exception as e:
+                self.status_callback(f"Erro no áudio: {e}", COLOR_ERROR)
+            try:
+                command = self._commands.get_nowait()
+            except queue.Empty:
+                command = None
+
+        self._feed_streams()
+        self._record_latency()
+        self._reap()
+
+    def _handle(self, command):
+        action = command[0]
+
+        if action == 'trigger':
+            _, key, path, bus, policy, pressed = command
+            playing = [v for v in self.voices if v.active and v.key == key and not v.stopped]
+            deferred = [item for item in self._deferred if item[0] == key] # Esperando slot (pool cheio)
+            busy = bool(playing) or bool(deferred) or key in self._loading
+            mode = policy.mode
+
+            if mode == 'toggle' and busy:
+                for voice in playing:
+                    voice.stop()
+                self._loading.pop(key, None) # Cancelado antes de terminar de carregar
+                self._drop_deferred(lambda item: item[0] == key)
+                return
+            if mode == 'oneshot' and busy:
+                return
+            if mode == 'retrigger':
+                for voice in playing:
+                    voice.stop()
+                self._loading.pop(key, None)
+                self._drop_deferred(lambda item: item[0] == key)
+            elif mode == 'overlap':
+                if key in self._loading:
+                    return # A primeira cópia ainda está carregando
+                if len(playing) + len(deferred) >= policy.max_voices:
+                    if playing:
+                        min(playing, key=lambda v: v.sequence).stop()
+                    else:
+                        self._drop_deferred(lambda item: item is deferred[0])
+
+            self._choke(policy.choke_group, key)
+            self._start(key, path, bus, pressed, policy.choke_group)
+
+        elif action == 'loaded':
+            _, key, path, bus, clip, pressed, choke_group = command
+            if self._loading.get(key) == (path, bus, choke_group):
+                del self._loading[key]
+                self._activate(key, path, bus, clip, pressed=pressed, choke_group=choke_group)
+
+        elif action == 'load_failed':
+            _, key, message = command
+            if self._loading.pop(key, None) is not None:
+                self.status_callback(f"Erro no áudio: {message}", COLOR_ERROR)
+
+        elif action == 'seek':
+            _, key, seconds = command
+            for voice in self.voices:
+                if voice.active and voice.key == key and voice.stream is not None:
+                    voice.stream.seek(seconds) # O callback aplica a posição nova no próximo bloco
+
+        elif action == 'stop_all':
+            self._loading.clear()
+            self._drop_deferred()
+            for voice in self.voices:
+                if voice.active:
+                    voice.stop()
+
+        elif action == 'reset':
+            self._loading.clear()
+            self._drop_deferred()
+            for voice in self.voices:
+                if voice.active:
+                    voice.stop()
+                    voice.finished = True
+
+    def _drop_deferred(self, match=None):
+        """Descarta os disparos adiados (todos, ou só os que 'match' aceita) e fecha os streams deles."""
+        kept = []
+        for item in self._deferred:
+            if match is None or match(item):
+                stream = item[4]
+                if stream is not None:
+                    stream.close()
+            else:
+                kept.append(item)
+        self._deferred = kept
+
+    def _choke(self, group, key):
+        """Para as vozes (e cargas e disparos adiados) dos outros atalhos do mesmo grupo de corte."""
+        if not group:
+            return
+        for voice in self.voices:
+            if voice.active and not voice.stopped and voice.choke_group == group and voice.key != key:
+                voice.stop()
+        for other in [k for k, pending in self._loading.items() if pending[2] == group and k != key]:
+            del self._loading[other]
+        self._drop_deferred(lambda item: item[6] == group and item[0] != key)
+
+    def _start(self, key, path, bus, pressed=None, choke_group=''):
+        if not os.path.exists(path):
+            self.status_callback("Erro: Arquivo não encontrado.", COLOR_ERROR)
+            return
+
+        if bus == 'music':
+            # Música: streaming em blocos (começa no primeiro bloco, memória constante)
+            stream = StreamingSource(path, self.samplerate, output_channels)
+            stream.fill()
+            self._activate(key, path, bus, stream=stream, pressed=pressed, choke_group=choke_group)
+            return
+
+        clip = clip_cache.peek(path, self.samplerate)
+        if clip is not None:
+            self._activate(key, path, bus, clip, pressed=pressed, choke_group=choke_group)
+            return
+
+        # Cache miss: decodifica fora do agendador para não atrasar os outros disparos
+        self._loading[key] = (path, bus, choke_group)
+        samplerate = self.samplerate
+
+        def _load():
+            try:
+                self._commands.put(('loaded', key, path, bus, clip_cache.get(path, samplerate), pressed, choke_group))
+            except Exception as e:
+                self._commands.put(('load_failed', key, str(e)))
+
+        threading.Thread(target=_load, daemon=True).start()
+
+    def _activate(self, key, path, bus, clip=None, stream=None, pressed=None, choke_group=''):
+        voice = next((v for v in self.voices if not v.active), None)
+        if voice is None:
+            # Pool cheio: para a voz mais antiga ainda tocando (cada disparo adiado rouba um slot
+            # diferente) e dispara assim que o callback liberar o slot
+            playing = [v for v in self.voices if not v.stopped]
+            if playing:
+                min(playing, key=lambda v: v.sequence).stop()
+            self._deferred.append((key, path, bus, clip, stream, pressed, choke_group))
+            return
+
+        self._sequence += 1
+        voice.bus = bus
+        voice.key = key
+        voice.gain = clip.gain if clip is not None else 1.0 # Ganho de loudness: um escalar por voz
+        voice.data = clip.segment(self.samplerate, CLIP_TRIMS.get(path)) if clip is not None else None
+        voice.stream = stream
+        voice.pos = 0
+        voice.sequence = self._sequence
+        voice.stopped = False
+        voice.finished = False
+        voice.choke_group = choke_group
+        voice.fade_in = 0
+        voice.fade_out = 0
+        voice.first_output = None
+        voice.pressed_at = pressed
+        voice.activated_at = trigger_stats.clock() if pressed is not None else None
+        voice.active = True # Publica a voz para o callback por último
+
+        # MÚSICA PRINCIPAL
+        if bus == 'music':
+            self.status_callback(f"MÚSICA Principal: Tocando → {_voice_state_text('music')}", COLOR_ACCENT_AUDIO)
+        # SOUNDBOARD
         else:
-            is_cancelled = stop_event.is_set()
-            current_soundboard_key = None 
-            
-            if is_cancelled:
-                status_update_callback(f"Soundboard ({hotkey}) CANCELADO → voltando sua voz...", COLOR_ACCENT_MIC)
+            self.status_callback(f"Soundboard: Tocando atalho {key} ({os.path.basename(path)}) → {_voice_state_text('sfx')}", COLOR_ACCENT_AUDIO)
+        self.state_callback()
+
+    def _feed_streams(self):
+        """
+        Mantém os buffers das vozes em streaming cheios e traz para a RAM o trecho à frente
+        dos clipes mapeados do disco (o callback nunca espera uma falta de página).
+        """
+        for voice in self.voices:
+            if not voice.active or voice.finished:
+                continue
+            stream, data = voice.stream, voice.data
+            if stream is not None:
+                try:
+                    stream.fill()
+                except Exception as e:
+                    voice.stop()
+                    self.status_callback(f"Erro no áudio: {e}", COLOR_ERROR)
+            elif data is not None:
+                touch_pages(data, voice.pos)
+
+    def _record_latency(self):
+        """Registra a latência dos disparos cuja primeira amostra o callback já mixou."""
+        for voice in self.voices:
+            if voice.active and voice.pressed_at is not None and voice.first_output is not None:
+                trigger_stats.record(voice.key, voice.activated_at - voice.pressed_at, voice.first_output - voice.pressed_at)
+                voice.pressed_at = None
+
+    def _reap(self):
+        """Libera as vozes que o callback marcou como terminadas e reporta o status."""
+        released = False
+        for voice in self.voices:
+            if not voice.active or not voice.finished:
+                continue
+
+            voice.active = False
+            voice.data = None
+            voice.pressed_at = None
+            if voice.stream is not None:
+                voice.stream.close()
+                voice.stream = None
+            released = True
+
+            if voice.bus == 'music':
+                self.status_callback("Música parada/finalizada → voltando sua voz...", COLOR_ACCENT_MIC)
+            elif voice.stopped:
+                self.status_callback(f"Soundboard ({voice.key}) CANCELADO → voltando sua voz...", COLOR_ACCENT_MIC)
             else:
-                status_update_callback(f"Soundboard ({hotkey}) finalizado → voltando sua voz...", COLOR_ACCENT_MIC)
-        
-        mode_voice = True 
-        
-        if global_main_window:
-            global_main_window.update_monitor_stream_state()
+                self.status_callback(f"Soundboard ({voice.key}) finalizado → voltando sua voz...", COLOR_ACCENT_MIC)
+
+        if released:
+            deferred, self._deferred = self._deferred, []
+            for item in deferred:
+                self._choke(item[6], item[0]) # O grupo pode ter mudado enquanto o disparo esperava
+                self._activate(*item)
+            self.state_callback()
+
+scheduler = PlaybackScheduler(mixer.voices)
+
+# ==================== SOUNDBOARD (BANCOS E ÍNDICE DE ATALHOS) ====================
+
+BANK_SIZE = 9 # Slots por banco: HOME+1 a HOME+9
+MUSIC_HOTKEY = 'home+0'
+STOP_ALL_HOTKEY = 'home+end'
+BANK_NEXT_HOTKEY = 'home+page down'
+BANK_PREV_HOTKEY = 'home+page up'
+FOLDER_POLL_INTERVAL = 0.2 # Segundos entre varreduras da pasta do soundboard
+
+def bank_slot(hotkey):
+    """Número do slot (1 a BANK_SIZE) de um atalho 'home+N', ou None para qualquer outro."""
+    prefix, _, rest = hotkey.partition('+')
+    if prefix == 'home' and rest.isdigit() and 1 <= int(rest) <= BANK_SIZE:
+        return int(rest)
+    return None
+
+def scan_soundboard_folder(folder):
+    """
+    Áudios da pasta do soundboard → (mtime_ns, tamanho), numa única passada de os.scandir
+    (no Windows o stat vem junto com a listagem). Ordenar as chaves dá o mapeamento estável.
+    """
+    files = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(AUDIO_EXTENSIONS) and entry.is_file():
+                stat = entry.stat()
+                files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+def split_banks(paths):
+    """Divide a lista de áudios em bancos de BANK_SIZE (o último pode ficar incompleto)."""
+    return [paths[i:i + BANK_SIZE] for i in range(0, len(paths), BANK_SIZE)]
+
+class FolderWatcher:
+    """
+    Varre a pasta do soundboard a cada FOLDER_POLL_INTERVAL numa thread própria e compara
+    (mtime, tamanho) com a varredura anterior; on_change(adicionados, removidos, alterados) é
+    chamado da thread do watcher só quando algo muda. Um arquivo só é reportado depois de
+    aparecer igual em duas varreduras seguidas, para não decodificar uma cópia pela metade.
+    """
+    def __init__(self, on_change, interval=FOLDER_POLL_INTERVAL):
+        self.on_change = on_change
+        self.interval = interval
+        self._folder = None
+        self._known = {}   # caminho -> (mtime_ns, tamanho) já reportado
+        self._pending = {} # caminho -> assinatura da última varredura, ainda não estável
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, folder):
+        """Passa a observar 'folder' (vazio/None para parar) e retorna a varredura inicial."""
+        snapshot = scan_soundboard_folder(folder) if folder else {}
+        with self._lock:
+            self._folder, self._known, self._pending = folder, dict(snapshot), {}
+        if folder and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="FolderWatcher", daemon=True)
+            self._thread.start()
+        return snapshot
+
+    def poll(self):
+        """Faz uma varredura e retorna (adicionados, removidos, alterados) já estáveis."""
+        with self._lock:
+            folder = self._folder
+        if not folder:
+            return [], [], []
+        try:
+            current = scan_soundboard_folder(folder)
+        except OSError:
+            current = {} # Pasta apagada ou inacessível: os áudios dela somem do soundboard
+        with self._lock:
+            if folder != self._folder: # Trocaram de pasta durante a varredura
+                return [], [], []
+            removed = [path for path in self._known if path not in current]
+            added, changed, pending = [], [], {}
+            for path, signature in current.items():
+                if self._known.get(path) == signature:
+                    continue
+                if self._pending.get(path) != signature:
+                    pending[path] = signature # Ainda sendo gravado (ou acabou de mudar): espera assentar
+                    continue
+                (changed if path in self._known else added).append(path)
+            self._pending = pending
+            for path in removed:
+                del self._known[path]
+            for path in added + changed:
+                self._known[path] = current[path]
+        return added, removed, changed
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            added, removed, changed = self.poll()
+            if added or removed or changed:
+                try:
+                    self.on_change(added, removed, changed)
+                except Exception as e:
+                    print(f"Erro ao aplicar mudanças da pasta do soundboard: {e}", file=sys.stderr)
+
+def parse_shortcuts(entries):
+    """
+    Lê 'soundboard_shortcuts' do config.json: cada atalho guarda o caminho ou, com um modo
+    de disparo próprio, {'path', 'mode', 'max_voices', 'choke_group'}. Retorna
+    ({atalho: caminho}, {atalho: PlayPolicy}).
+    """
+    shortcuts, policies = {}, {}
+    for hotkey, entry in entries.items():
+        if isinstance(entry, dict):
+            shortcuts[hotkey] = entry.get('path')
+            policy = PlayPolicy.from_config(entry)
+            if not policy.is_default():
+                policies[hotkey] = policy
+        else:
+            shortcuts[hotkey] = entry
+    return shortcuts, policies
+
+def serialize_shortcuts(shortcuts, policies):
+    """Inverso de parse_shortcuts: atalhos no modo padrão continuam só com o caminho."""
+    entries = {}
+    for hotkey, path in shortcuts.items():
+        policy = policies.get(hotkey)
+        entries[hotkey] = dict(path=path, **policy.to_config()) if policy and not policy.is_default() else path
+    return entries
+
+def build_hotkey_index(shortcuts, banks, active_bank, policies=None):
+    """
+    Índice atalho → (chave da voz, caminho, barramento, PlayPolicy) consultado a cada tecla
+    (O(1)). Entram só os slots do banco ativo, os atalhos customizados (valem em todos os
+    bancos e têm prioridade sobre o slot com a mesma tecla) e a música principal em HOME+0.
+    A chave da voz leva o banco, para que o HOME+1 de outro banco não pare o clipe que já toca.
+    """
+    policies = policies or {}
+    index = {}
+    if 0 <= active_bank < len(banks):
+        for slot, path in enumerate(banks[active_bank], 1):
+            index[f"home+{slot}"] = (f"banco {active_bank + 1}: home+{slot}", path, 'sfx', DEFAULT_POLICY)
+    for hotkey, path in shortcuts.items():
+        if path and hotkey != '0':
+            index[hotkey] = (hotkey, path, 'sfx', policies.get(hotkey, DEFAULT_POLICY))
+    if shortcuts.get('0'):
+        index[MUSIC_HOTKEY] = ('0', shortcuts['0'], 'music', DEFAULT_POLICY)
+    return index
+
+class TriggerDispatcher:
+    """
+    Thread dedicada aos disparos: o hook do teclado (ou o clique de um botão) só marca o
+    instante da tecla e enfileira o atalho; aqui ele é resolvido no índice e vira um comando
+    do agendador, sem passar pela thread da UI (um rebuild de widgets ou um diálogo aberto
+    não atrasam o som). A UI só recebe o status depois, pelo status_callback.
+    """
+    def __init__(self):
+        self.index = {} # Atalho → (chave da voz, caminho, barramento, PlayPolicy); a UI troca o dicionário inteiro
+        self.status_callback = lambda message, color: None
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="TriggerDispatcher", daemon=True)
+            self._thread.start()
+
+    def press(self, hotkey):
+        """Chamado de qualquer thread no instante da tecla."""
+        self._queue.put((hotkey, trigger_stats.clock()))
+
+    def _run(self):
+        while True:
+            hotkey, pressed = self._queue.get()
+            try:
+                self._dispatch(hotkey, pressed)
+            except Exception as e:
+                self.status_callback(f"Erro no disparo de {hotkey.upper()}: {e}", COLOR_ERROR)
+
+    def _dispatch(self, hotkey, pressed):
+        if hotkey == STOP_ALL_HOTKEY:
+            if scheduler.is_playing():
+                scheduler.stop_all()
+                self.status_callback("TODOS os áudios parados (HOME+END). Retornando ao modo voz...", COLOR_WARNING)
+            return
+
+        entry = self.index.get(hotkey)
+        if entry is None:
+            self.status_callback(f"Atalho {hotkey.upper()} não configurado.", COLOR_WARNING)
+            return
+        if not input_stream or not output_stream or not monitor_stream:
+            self.status_callback("Streams de áudio não iniciados. Ative-os primeiro!", COLOR_ERROR)
+            return
+
+        key, path, bus, policy = entry
+        # Repetição da mesma tecla conforme a política dela; teclas diferentes tocam juntas
+        scheduler.trigger(key, path, bus, policy, pressed)
+
+trigger_dispatcher = TriggerDispatcher()
+
 
 # ==================== CONTROLES DE WIDGETS PERSONALIZADOS ====================
 
@@ -230,29 +2707,32 @@ class NoScrollSlider(QtWidgets.QSlider):
 
 class VoiceGamingSWITCH(QtWidgets.QMainWindow):
     status_signal = QtCore.pyqtSignal(str, str)
-    hotkey_signal = QtCore.pyqtSignal(str) 
+    state_signal = QtCore.pyqtSignal()
+    bank_signal = QtCore.pyqtSignal(int)
+    folder_signal = QtCore.pyqtSignal(list, list, list)
+    devices_signal = QtCore.pyqtSignal(list, object)
+    backends_signal = QtCore.pyqtSignal()
+    startup_signal = QtCore.pyqtSignal(bool) # Partida concluída (False: alguma etapa falhou)
 
     def __init__(self):
         super().__init__()
-        self.config = load_config()
+        self.config = config_service.load() # Dicionário vivo: reflete cada save_current_config
         
-        global global_main_window, music_volume_factor, mic_volume_factor, monitor_volume_factor, SOUNDBOARD_SHORTCUTS
+        global global_main_window, music_volume_factor, mic_volume_factor, monitor_volume_factor, SOUNDBOARD_SHORTCUTS, CLIP_TRIMS
         global_main_window = self 
 
-        SOUNDBOARD_SHORTCUTS = self.config.get('soundboard_shortcuts', {})
+        SOUNDBOARD_SHORTCUTS, policies = parse_shortcuts(self.config.get('soundboard_shortcuts', {}))
+        SHORTCUT_POLICIES.update(policies)
+        CLIP_TRIMS = copy.deepcopy(self.config.get('clip_trims', {})) # Cópia: só o config_service mexe no self.config
         self.musica_path = SOUNDBOARD_SHORTCUTS.get('0')
 
-        self.device_info = sd.query_devices()
-        self.input_devices = [d for d in self.device_info if d['max_input_channels'] > 0]
-        self.output_devices = [d for d in self.device_info if d['max_output_channels'] > 0]
-        self.monitor_devices = [d for d in self.device_info if d['max_output_channels'] > 0]
-        
-        # Dicionário para armazenar a taxa de amostragem padrão dos dispositivos selecionados
-        self.device_sample_rates = {
-            'input': self.get_device_default_samplerate(self.config.get('input_device_index', -1)),
-            'output': self.get_device_default_samplerate(self.config.get('output_device_index', -1)),
-            'monitor': self.get_device_default_samplerate(self.config.get('monitor_device_index', -1)),
-        }
+        # Os dispositivos são enumerados pela thread de partida depois que a janela aparece
+        # (_load_backends); até lá as listas ficam vazias e valem as taxas padrão
+        self.devices_loaded = False
+        self.backends_ready = False # scipy.signal carregado: os clipes já podem ser decodificados
+        self.hotkeys_ready = False  # Listener do keyboard iniciado: os atalhos podem ser registrados
+        self.startup_errors = []    # Etapas da partida que falharam
+        self._set_devices([], (-1, -1))
         
         self.volume_level = self.config.get('volume_level', 80)
         music_volume_factor = self.volume_level / 100.0
@@ -263,7 +2743,34 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         self.monitor_level = self.config.get('monitor_volume_level', 50) 
         monitor_volume_factor = self.monitor_level / 100.0
         
+        # Ducking: quais barramentos abaixam a voz e para qual nível (% do volume do microfone)
+        self.bus_ducking = {bus: True for bus in MIXER_BUSES}
+        self.bus_ducking.update(self.config.get('bus_ducking', {}))
+        self.duck_level = self.config.get('duck_level', 0)
+        mixer.bus_ducking.update(self.bus_ducking)
+        mixer.duck_level = self.duck_level / 100.0
+        
         self.soundboard_folder = self.config.get('soundboard_folder', '') 
+        self.soundboard_banks = [] # Áudios da pasta divididos em bancos de BANK_SIZE
+        self.active_bank = self.config.get('active_bank', 0)
+        self.hotkey_index = {}     # Atalho → (chave da voz, caminho, barramento)
+        self.soundboard_buttons = {} # Atalho → botão do grid (reaproveitado entre atualizações)
+        self.folder_watcher = FolderWatcher(self._on_folder_change)
+        
+        self.clip_cache_mb = self.config.get('clip_cache_mb', CLIP_CACHE_MB)
+        clip_cache.set_budget(self.clip_cache_mb)
+        
+        self.target_latency_ms = self.config.get('target_latency_ms', TARGET_LATENCY_MS)
+        self.duplex_mode = self.config.get('duplex_mode', True)
+        self.resample_quality = self.config.get('resample_quality', RESAMPLE_QUALITY)
+        self.disk_cache = self.config.get('disk_cache', True)
+        disk_store.enabled = self.disk_cache
+        global resample_quality
+        resample_quality = self.resample_quality
+        apply_dsp_settings(self.config.get('dsp', {}))
+        set_target_latency(self.target_latency_ms, self.get_output_samplerate(), self.get_input_samplerate())
+        set_output_channels(self.get_output_channels(), self.get_monitor_channels())
+        scheduler.samplerate = self.get_output_samplerate()
         
         # ONDE O ERRO OCORRIA: Chamando a função para mapear a pasta
         if self.soundboard_folder and os.path.isdir(self.soundboard_folder):
@@ -314,29 +2821,146 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         self.setup_tray_icon()
         self.setup_ui()
         self.status_signal.connect(self.update_status_ui)
-        self.hotkey_signal.connect(self.play_soundboard_audio) 
-        self.setup_hotkeys()
+        self.bank_signal.connect(self.switch_bank)
+        self.folder_signal.connect(self._apply_folder_changes)
+        self.state_signal.connect(self.update_monitor_stream_state)
+        
+        # Agendador único de reprodução (status e estado voltam para a thread da UI via sinais)
+        scheduler.status_callback = self.status_signal.emit
+        scheduler.state_callback = self.state_signal.emit
+        scheduler.start()
+        
+        # Atalhos vão direto para o agendador por uma thread própria (a UI só recebe o status)
+        trigger_dispatcher.status_callback = self.status_signal.emit
+        trigger_dispatcher.start()
+        
+        # O resto da partida (PortAudio, keyboard, scipy, pré-carga) roda depois da janela aparecer
+        self.devices_signal.connect(self._on_devices_loaded)
+        self.backends_signal.connect(self._on_backends_ready)
+        QtCore.QTimer.singleShot(0, self._start_background_load)
+
+    # --- Partida em etapas ---
+    def _start_background_load(self):
+        """Primeira volta do loop de eventos (janela já desenhada): inicia a thread de partida."""
+        startup_profile.mark("janela visível")
+        threading.Thread(target=self._load_backends, name="Startup", daemon=True).start()
+
+    def _load_backends(self):
+        """
+        Thread de partida: PortAudio e a lista de dispositivos (uma única consulta), soundfile e
+        keyboard, e por último o scipy.signal. Cada etapa entrega o resultado à UI por um sinal;
+        startup_signal(ok) sempre chega, mesmo se uma etapa falhar (--profile-startup espera por ele).
+        """
+        try:
+            self._load_backend_stages()
+        except Exception as e: # scipy ausente ou falha inesperada: sem pré-carga dos clipes
+            self._report_startup_error("scipy.signal", e)
+            self.startup_signal.emit(False)
+            return
+        self.backends_signal.emit()
+
+    def _load_backend_stages(self):
+        devices, defaults = [], (-1, -1)
+        try:
+            with startup_profile.phase("sounddevice (PortAudio)"):
+                sd.load()
+            with startup_profile.phase("enumeração dos dispositivos"):
+                devices = [dict(d) for d in sd.query_devices()]
+                defaults = tuple(sd.default.device)
+        except Exception as e: # PortAudio ausente: a interface abre, mas sem dispositivos
+            self._report_startup_error("PortAudio", e, " Instale o sounddevice/PortAudio.")
+        with startup_profile.phase("soundfile + keyboard"):
+            for name, module in (('soundfile', sf), ('keyboard', keyboard)):
+                try:
+                    module.load()
+                    if module is keyboard:
+                        keyboard.unhook_all() # Também inicia o listener, que os hotkeys precisam
+                        self.hotkeys_ready = True
+                except Exception as e: # Ex.: keyboard sem permissão ou sem dispositivos de entrada
+                    self._report_startup_error(name, e)
+        self.devices_signal.emit(devices, defaults)
+        with startup_profile.phase("scipy.signal"):
+            scipy_signal.load()
+
+    def _report_startup_error(self, name, error, hint=""):
+        """Uma etapa da partida falhou: avisa no console e no status e guarda para o resultado da partida."""
+        self.startup_errors.append(name)
+        print(f"Erro ao carregar o {name}: {type(error).__name__}: {error}", file=sys.stderr)
+        self.status_signal.emit(f"ERRO ao carregar o {name}: {type(error).__name__}: {error}.{hint}", COLOR_ERROR)
+
+    def _set_devices(self, devices, defaults):
+        """Guarda a lista de dispositivos e recalcula as taxas e os canais dos selecionados."""
+        self.device_info = devices
+        self.default_devices = defaults
+        self.input_devices = [d for d in devices if d['max_input_channels'] > 0]
+        self.output_devices = [d for d in devices if d['max_output_channels'] > 0]
+        self.monitor_devices = [d for d in devices if d['max_output_channels'] > 0]
+        
+        # Dicionário para armazenar a taxa de amostragem padrão dos dispositivos selecionados
+        self.device_sample_rates = {
+            'input': self.get_device_default_samplerate(self.config.get('input_device_index', -1)),
+            'output': self.get_device_default_samplerate(self.config.get('output_device_index', -1)),
+            'monitor': self.get_device_default_samplerate(self.config.get('monitor_device_index', -1)),
+        }
+
+    def _on_devices_loaded(self, devices, defaults):
+        """Na thread da UI: preenche os dispositivos, ajusta o motor às taxas reais e registra os atalhos."""
+        with startup_profile.phase("dispositivos na UI + atalhos"):
+            self._set_devices(devices, defaults)
+            self.devices_loaded = True
+            set_target_latency(self.target_latency_ms, self.get_output_samplerate(), self.get_input_samplerate())
+            set_output_channels(self.get_output_channels(), self.get_monitor_channels())
+            scheduler.samplerate = self.get_output_samplerate()
+            for combo, device_list in ((self.input_combo, self.input_devices), (self.output_combo, self.output_devices),
+                                       (self.monitor_combo, self.monitor_devices)):
+                self._fill_device_combo(combo, device_list)
+            self._select_default_devices()
+            self.setup_hotkeys()
+
+    def _on_backends_ready(self):
+        """scipy.signal carregado: pré-carrega os clipes (já na taxa real da saída)."""
+        self.backends_ready = True
+        started = time.perf_counter()
+        futures = self._prewarm_clip_cache()
+        
+        def wait_prewarm():
+            wait(futures)
+            startup_profile.add("pré-carga dos clipes", started)
+            self.startup_signal.emit(not self.startup_errors)
         
+        threading.Thread(target=wait_prewarm, name="StartupPrewarm", daemon=True).start()
+        
+    def _device(self, index):
+        """Informações do dispositivo pelo índice (da lista enumerada na partida), ou None."""
+        return self.device_info[index] if 0 <= index < len(self.device_info) else None
+
     def get_device_default_samplerate(self, index):
         """Busca a taxa de amostragem padrão de um dispositivo pelo índice."""
-        if index == -1:
-            return SAMPLERATE # Default para 44100 se não selecionado
-        try:
-            return int(sd.query_devices(index)['default_samplerate'])
-        except Exception:
-            return SAMPLERATE
+        device = self._device(index)
+        if device is None:
+            return SAMPLERATE # Default para 44100 se não selecionado (ou ainda não enumerado)
+        return int(device['default_samplerate'])
+            
+    def get_device_output_channels(self, index):
+        """Canais de saída usados num dispositivo: os que ele aceita, até MAX_OUTPUT_CHANNELS."""
+        device = self._device(index)
+        if device is None:
+            return MAX_OUTPUT_CHANNELS
+        return max(1, min(int(device['max_output_channels']), MAX_OUTPUT_CHANNELS))
             
+    def get_output_channels(self): return self.get_device_output_channels(self.config.get('output_device_index', -1))
+    def get_monitor_channels(self): return self.get_device_output_channels(self.config.get('monitor_device_index', -1))
     def get_input_samplerate(self): return self.device_sample_rates.get('input', SAMPLERATE)
     def get_output_samplerate(self): return self.device_sample_rates.get('output', SAMPLERATE)
     def get_monitor_samplerate(self): return self.device_sample_rates.get('monitor', SAMPLERATE)
 
     def save_current_config(self, save_devices=False):
-        """Salva a configuração atual."""
+        """Registra a configuração atual no config_service (a escrita em disco é feita depois, por ele)."""
         input_idx = self.config.get('input_device_index', -1)
         output_idx = self.config.get('output_device_index', -1)
         monitor_idx = self.config.get('monitor_device_index', -1)
 
-        if save_devices and hasattr(self, 'input_combo') and self.input_combo.isVisible():
+        if save_devices and self.devices_loaded and hasattr(self, 'input_combo') and self.input_combo.isVisible():
             input_idx = self.input_combo.currentData()
             output_idx = self.output_combo.currentData()
             monitor_idx = self.monitor_combo.currentData()
@@ -348,7 +2972,14 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
             
         valid_shortcuts = {k: v for k, v in SOUNDBOARD_SHORTCUTS.items() if v or k == '0'}
         
-        save_config(input_idx, output_idx, monitor_idx, self.volume_level, self.mic_level, self.monitor_level, valid_shortcuts, self.soundboard_folder)
+        config_service.update(input_device_index=input_idx, output_device_index=output_idx, monitor_device_index=monitor_idx,
+                              volume_level=self.volume_level, mic_volume_level=self.mic_level, monitor_volume_level=self.monitor_level,
+                              soundboard_shortcuts=serialize_shortcuts(valid_shortcuts, SHORTCUT_POLICIES),
+                              soundboard_folder=self.soundboard_folder,
+                              clip_cache_mb=self.clip_cache_mb, target_latency_ms=self.target_latency_ms,
+                              bus_ducking=self.bus_ducking, duck_level=self.duck_level, duplex_mode=self.duplex_mode,
+                              resample_quality=self.resample_quality, disk_cache=self.disk_cache, active_bank=self.active_bank,
+                              clip_trims=CLIP_TRIMS, dsp=dsp_settings())
         
     # --- UI Setup ---
     def setup_ui(self):
@@ -391,14 +3022,62 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         self.config_tab = self._create_config_tab()
         self.tab_widget.addTab(self.config_tab, "⚙️ Configurações")
         
+        # --- Aba 3: Diagnóstico ---
+        self.diagnostics_tab = self._create_diagnostics_tab()
+        self.tab_widget.addTab(self.diagnostics_tab, "📊 Diagnóstico")
+        
         # 4. Status Bar
         self.status = QtWidgets.QLabel("Status: Pressione 'INICIAR AUDIO STREAMS'")
         self.status.setStyleSheet(f"color:{COLOR_WARNING}; font-size:14px; padding:10px; background:#222; border-radius: 8px; margin-top: 15px;")
         main_layout.addWidget(self.status)
         
+        # Profundidade atual do buffer de saída (atualizada periodicamente)
+        self.buffer_label = QtWidgets.QLabel()
+        self.buffer_label.setAlignment(QtCore.Qt.AlignRight)
+        self.buffer_label.setStyleSheet("color:#888; font-size:11px; padding:0 10px;")
+        main_layout.addWidget(self.buffer_label)
+        
+        self.buffer_timer = QtCore.QTimer(self)
+        self.buffer_timer.timeout.connect(self._update_buffer_label)
+        self.buffer_timer.timeout.connect(self._update_music_position)
+        self.buffer_timer.start(250)
+        self._update_buffer_label()
+        
         self._update_soundboard_ui_from_config()
         self._update_start_stop_ui()
         
+    def _update_buffer_label(self):
+        """Mostra o preenchimento do buffer de saída em ms e o total de áudio antigo descartado."""
+        sr = output_ring.samplerate
+        fill_ms = output_ring.fill() * 1000.0 / sr
+        dropped_ms = output_ring.dropped_frames * 1000.0 / sr
+        self.buffer_label.setText(
+            f"Buffer: {fill_ms:.0f} ms / alvo {self.target_latency_ms} ms | Descartado: {dropped_ms:.0f} ms"
+        )
+        
+    def _update_music_position(self):
+        """Atualiza a barra de posição da música principal (se estiver tocando)."""
+        position = scheduler.position('0')
+        if position is None:
+            self.music_seek_slider.setEnabled(False)
+            self.music_seek_slider.setValue(0)
+            self.music_position_label.setText("--:-- / --:--")
+            return
+        
+        current, duration = position
+        self.music_seek_slider.setEnabled(True)
+        if not self.music_seek_slider.isSliderDown() and duration > 0:
+            self.music_seek_slider.setValue(int(min(current / duration, 1.0) * 1000))
+        self.music_position_label.setText(
+            f"{int(current // 60):02d}:{int(current % 60):02d} / {int(duration // 60):02d}:{int(duration % 60):02d}"
+        )
+        
+    def _seek_music(self):
+        """Busca a posição escolhida na barra da música principal."""
+        position = scheduler.position('0')
+        if position is not None:
+            scheduler.seek('0', self.music_seek_slider.value() / 1000 * position[1])
+        
     def _handle_tab_change(self, index):
         """Gerencia a troca de abas para salvar configurações automaticamente."""
         # Se a aba anterior era a de Configurações (index 1), salva e tenta aplicar
@@ -424,12 +3103,25 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         
         self.btn_play = QtWidgets.QPushButton("🎵 Tocar/Parar Música (HOME + 0)")
         self.btn_play.setStyleSheet(f"padding:15px; font-size:14px; background:{COLOR_ACCENT_AUDIO}; color:black; font-weight: bold; border-radius: 8px;")
-        self.btn_play.clicked.connect(lambda: self.toggle_music('0'))
+        self.btn_play.clicked.connect(lambda: trigger_dispatcher.press(MUSIC_HOTKEY))
         self.btn_play.setEnabled(False) 
         music_layout.addWidget(self.btn_play)
 
         
         layout.addWidget(music_wrapper)
+        
+        # Barra de posição da música (streaming permite buscar qualquer ponto)
+        seek_layout = QtWidgets.QHBoxLayout()
+        self.music_seek_slider = NoScrollSlider(QtCore.Qt.Horizontal)
+        self.music_seek_slider.setRange(0, 1000)
+        self.music_seek_slider.setEnabled(False)
+        self.music_seek_slider.sliderReleased.connect(self._seek_music)
+        seek_layout.addWidget(self.music_seek_slider)
+        
+        self.music_position_label = QtWidgets.QLabel("--:-- / --:--")
+        self.music_position_label.setFixedWidth(100)
+        seek_layout.addWidget(self.music_position_label)
+        layout.addLayout(seek_layout)
 
         # 2. Botões de Efeito Rápido (Soundboard)
         soundboard_group = QtWidgets.QGroupBox("Botões de Efeito Rápido (HOME + Tecla)")
@@ -448,6 +3140,22 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         self.soundboard_scroll.setStyleSheet(f"QScrollArea {{ border: none; background: transparent; }}")
         
         soundboard_v_layout = QtWidgets.QVBoxLayout(soundboard_group)
+        
+        # Navegação entre bancos (também por HOME+PAGE UP / HOME+PAGE DOWN)
+        bank_layout = QtWidgets.QHBoxLayout()
+        self.btn_bank_prev = QtWidgets.QPushButton("◀")
+        self.btn_bank_next = QtWidgets.QPushButton("▶")
+        self.bank_label = QtWidgets.QLabel()
+        self.bank_label.setAlignment(QtCore.Qt.AlignCenter)
+        for button, delta in ((self.btn_bank_prev, -1), (self.btn_bank_next, 1)):
+            button.setFixedWidth(40)
+            button.setStyleSheet(f"background:#444; color:{COLOR_TEXT_NORMAL}; font-weight:bold; border-radius: 5px; padding: 5px;")
+            button.clicked.connect(lambda checked, d=delta: self.switch_bank(d))
+        bank_layout.addWidget(self.btn_bank_prev)
+        bank_layout.addWidget(self.bank_label, 1)
+        bank_layout.addWidget(self.btn_bank_next)
+        soundboard_v_layout.addLayout(bank_layout)
+        
         soundboard_v_layout.addWidget(self.soundboard_scroll)
         
         layout.addWidget(soundboard_group, 1) # Adiciona o grupo e permite expandir
@@ -484,6 +3192,8 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         
         self._setup_device_volume_section()
         self._setup_soundboard_management_section()
+        self._setup_performance_section()
+        self._setup_dsp_section()
         
         self.config_layout.addStretch(1)
         self.scroll_area_config.setWidget(self.config_container)
@@ -494,6 +3204,88 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         
         return tab
 
+    # --- Aba Diagnóstico ---
+    def _create_diagnostics_tab(self):
+        tab = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(tab)
+        layout.setContentsMargins(15, 15, 15, 15)
+        
+        self.diagnostics_label = QtWidgets.QLabel()
+        self.diagnostics_label.setTextInteractionFlags(QtCore.Qt.TextSelectableByMouse)
+        self.diagnostics_label.setAlignment(QtCore.Qt.AlignTop | QtCore.Qt.AlignLeft)
+        self.diagnostics_label.setStyleSheet(f"font-family: Consolas, monospace; font-size: 12px; background:#222; padding:10px; border-radius: 8px; border: 1px solid {COLOR_BORDER};")
+        layout.addWidget(self.diagnostics_label, 1)
+        
+        buttons_layout = QtWidgets.QHBoxLayout()
+        for text, handler in (("💾 Exportar CSV/JSON", self.export_diagnostics_dialog), ("🔄 Zerar Contadores", self.reset_diagnostics)):
+            button = QtWidgets.QPushButton(text)
+            button.clicked.connect(handler)
+            button.setStyleSheet(f"padding:10px; background:#444; color:{COLOR_TEXT_NORMAL}; font-weight:bold; border-radius: 8px;")
+            buttons_layout.addWidget(button)
+        layout.addLayout(buttons_layout)
+        
+        self.diagnostics_timer = QtCore.QTimer(self)
+        self.diagnostics_timer.timeout.connect(self._update_diagnostics)
+        self.diagnostics_timer.start(500)
+        
+        return tab
+        
+    def _update_diagnostics(self):
+        """Redesenha o painel de diagnóstico (só quando a aba está visível)."""
+        if self.tab_widget.currentWidget() is not self.diagnostics_tab:
+            return
+        
+        budget_us = BLOCKSIZE / self.get_output_samplerate() * 1e6
+        lines = [f"BLOCKSIZE {BLOCKSIZE} frames → orçamento de {budget_us / 1000:.2f} ms por callback",
+                 f"Canais: microfone {MIC_CHANNELS} | saída {output_channels} | monitor {monitor_channels}", ""]
+        for stats in STREAM_STATS:
+            if stats is input_stats and input_stream is not None and input_stream is output_stream:
+                lines += [f"[{stats.name.upper()}] modo duplex: o microfone é medido no callback da saída", ""]
+                continue
+            summary = stats.summary()
+            flags = summary['flags']
+            lines.append(f"[{stats.name.upper()}] callbacks: {summary['callbacks']}")
+            lines.append(f"  duração  p50 ≤ {summary['duration_p50_us']:.0f} µs | p99 ≤ {summary['duration_p99_us']:.0f} µs | máx {summary['duration_max_us']:.0f} µs ({summary['duration_max_us'] / budget_us * 100:.1f}% do orçamento)")
+            lines.append(f"  xruns    in over {flags['input_overflow']} | in under {flags['input_underflow']} | out over {flags['output_overflow']} | out under {flags['output_underflow']}")
+            if stats is not input_stats:
+                lines.append(f"  buffer   atual {summary['fill_last_ms']:.1f} ms | p99 ≤ {summary['fill_p99_ms']:.0f} ms")
+            if stats is not monitor_stats:
+                lines.append(f"  latência atual {summary['latency_last_ms']:.1f} ms | p50 ≤ {summary['latency_p50_ms']:.0f} ms | p99 ≤ {summary['latency_p99_ms']:.0f} ms")
+            lines.append("")
+        lines.append(f"Saída: pico {output_buffers.peak_hold:.2f} | RMS {output_buffers.rms:.3f} | blocos limitados {output_buffers.limited_blocks}")
+        lines.append(f"Buffer: underrun {output_ring.underrun_frames} frames | descartado {output_ring.dropped_frames} frames | overrun {output_ring.overrun_frames} frames")
+        if input_stream is not output_stream:
+            lines.append(f"Drift mic → saída: {mic_resampler.drift_ppm():+.0f} ppm | razão {mic_resampler.ratio:.6f} (nominal {mic_resampler.nominal:.6f}) | buffer médio {mic_resampler.fill_avg:.0f} frames")
+        triggers = trigger_stats.summary()
+        if triggers['triggers']:
+            lines.append(f"Disparos: {triggers['triggers']} | tecla → voz ativa p50 {triggers['activation_p50_ms']:.3f} ms, máx {triggers['activation_max_ms']:.3f} ms"
+                         f" | tecla → 1ª amostra p50 {triggers['first_sample_p50_ms']:.1f} ms, p99 {triggers['first_sample_p99_ms']:.1f} ms")
+        dsp_lines = dsp_report_lines()
+        if dsp_lines:
+            lines += ["", "[DSP] CPU por bloco"] + [f"  {line}" for line in dsp_lines]
+        self.diagnostics_label.setText("\n".join(lines))
+        
+    def export_diagnostics_dialog(self):
+        """Salva a instrumentação atual em CSV ou JSON."""
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Exportar Diagnóstico", "diagnostico.json", "JSON (*.json);;CSV (*.csv)")
+        if not path:
+            return
+        try:
+            export_diagnostics(path)
+            self.update_status_ui(f"Diagnóstico exportado: {path}", COLOR_ACCENT_MIC)
+        except Exception as e:
+            self.update_status_ui(f"Erro ao exportar diagnóstico: {e}", COLOR_ERROR)
+            
+    def reset_diagnostics(self):
+        for stats in STREAM_STATS:
+            stats.reset()
+        output_buffers.reset_stats()
+        monitor_buffers.reset_stats()
+        for chain in DSP_CHAINS:
+            chain.reset_stats()
+        trigger_stats.reset()
+        self._update_diagnostics()
+
     def _apply_and_save_config(self):
         """
         Salva e aplica as configurações do diálogo quando a aba de Configurações é fechada.
@@ -513,6 +3305,10 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
             'output': self.get_device_default_samplerate(new_output_idx),
             'monitor': self.get_device_default_samplerate(new_monitor_idx),
         }
+        set_target_latency(self.target_latency_ms, self.get_output_samplerate(), self.get_input_samplerate())
+        scheduler.samplerate = self.get_output_samplerate()
+        if output_stream is None: # Com os streams rodando, os canais mudam no próximo start_streams
+            set_output_channels(self.get_output_channels(), self.get_monitor_channels())
         
         # 3. Aplica mudanças (Hotkeys e UI)
         self.setup_hotkeys()
@@ -527,19 +3323,14 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         self.config_layout.addWidget(self._create_header("1. Seleção de Dispositivos (Reinicie os streams para aplicar)"))
         
         self.input_combo, input_wrapper = self._create_device_combo(self.input_devices, 'Microfone Real 🎙️')
-        default_in = self.config.get('input_device_index', sd.default.device[0] if sd.default.device else -1)
-        self._set_default_device(self.input_combo, default_in)
         self.config_layout.addWidget(input_wrapper)
 
         self.output_combo, output_wrapper = self._create_device_combo(self.output_devices, 'Saída Virtual (VB-CABLE) 🎤')
-        default_out = self.config.get('output_device_index', sd.default.device[1] if sd.default.device else -1)
-        self._set_default_device(self.output_combo, default_out)
         self.config_layout.addWidget(output_wrapper)
         
         self.monitor_combo, monitor_wrapper = self._create_device_combo(self.monitor_devices, 'Saída Monitor (Fones) 🎧')
-        default_monitor = self.config.get('monitor_device_index', sd.default.device[1] if sd.default.device else -1)
-        self._set_default_device(self.monitor_combo, default_monitor)
         self.config_layout.addWidget(monitor_wrapper)
+        self._select_default_devices()
 
         self.config_layout.addWidget(self._create_header("2. Controles de Volume")) 
         
@@ -552,6 +3343,17 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         monitor_volume_layout = self._create_volume_slider("Volume Escutar 👂:", self.monitor_level, self.update_monitor_volume)
         self.config_layout.addLayout(monitor_volume_layout)
         
+        duck_volume_layout = self._create_volume_slider("Volume da Voz com Áudio Tocando 🦆:", self.duck_level, self.update_duck_level)
+        self.config_layout.addLayout(duck_volume_layout)
+        
+        duck_layout = QtWidgets.QHBoxLayout()
+        for bus, text in (('music', "Abaixar voz durante a Música"), ('sfx', "Abaixar voz durante os Efeitos")):
+            check = QtWidgets.QCheckBox(text)
+            check.setChecked(self.bus_ducking.get(bus, True))
+            check.toggled.connect(lambda checked, b=bus: self.update_bus_ducking(b, checked))
+            duck_layout.addWidget(check)
+        self.config_layout.addLayout(duck_layout)
+        
     def _create_device_combo(self, device_list, label_text):
         """Cria e preenche um QComboBox para dispositivos de áudio, incluindo SR (Taxa de Amostragem)."""
         box = QtWidgets.QWidget()
@@ -565,7 +3367,14 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         
         combo = QtWidgets.QComboBox()
         combo.setStyleSheet(f"background:#222; color:{COLOR_TEXT_NORMAL}; padding: 5px; border-radius: 5px;")
+        self._fill_device_combo(combo, device_list)
+        h_layout.addWidget(combo)
+        
+        return combo, box
 
+    def _fill_device_combo(self, combo, device_list):
+        """(Re)preenche a ComboBox com os dispositivos, os virtuais primeiro."""
+        combo.clear()
         virtual_names = {"cable output", "cable input", "mixagem estéreo", "stereo mix", "what u hear", "vb-audio"}
         
         # Prioriza dispositivos virtuais
@@ -581,16 +3390,19 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
             if not any(vn in name_lower for vn in virtual_names):
                 text = f"{d['name']} (SR: {d['default_samplerate']:.0f} Hz)"
                 combo.addItem(text, d['index'])
-        
-        h_layout.addWidget(combo)
-        
-        return combo, box
 
     def _set_default_device(self, combo, default_index):
         """Tenta pré-selecionar o dispositivo padrão na ComboBox."""
         index = combo.findData(default_index)
         if index != -1:
             combo.setCurrentIndex(index)
+
+    def _select_default_devices(self):
+        """Seleciona nas ComboBoxes os dispositivos do config.json (ou os padrões do sistema)."""
+        default_in, default_out = self.default_devices
+        self._set_default_device(self.input_combo, self.config.get('input_device_index', default_in))
+        self._set_default_device(self.output_combo, self.config.get('output_device_index', default_out))
+        self._set_default_device(self.monitor_combo, self.config.get('monitor_device_index', default_out))
             
     def _create_volume_slider(self, label_text, initial_value, update_method):
         """Cria um layout horizontal com label, slider e label de valor para o volume."""
@@ -618,6 +3430,101 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         
         return h_layout
 
+    # --- Seção 4: Desempenho ---
+    def _setup_performance_section(self):
+        self.config_layout.addWidget(self._create_header("4. Desempenho"))
+        
+        h_layout = QtWidgets.QHBoxLayout()
+        h_layout.setSpacing(15)
+        
+        label = QtWidgets.QLabel("Memória do Cache de Clipes (MB) 🧠:")
+        label.setFixedWidth(250)
+        h_layout.addWidget(label)
+        
+        self.cache_spin = QtWidgets.QSpinBox()
+        self.cache_spin.setRange(16, 4096)
+        self.cache_spin.setSingleStep(16)
+        self.cache_spin.setValue(self.clip_cache_mb)
+        self.cache_spin.setStyleSheet(f"background:#222; color:{COLOR_TEXT_NORMAL}; padding: 5px; border-radius: 5px;")
+        self.cache_spin.valueChanged.connect(self.update_clip_cache_budget)
+        h_layout.addWidget(self.cache_spin)
+        
+        self.config_layout.addLayout(h_layout)
+        
+        latency_layout = QtWidgets.QHBoxLayout()
+        latency_layout.setSpacing(15)
+        
+        latency_label = QtWidgets.QLabel("Latência Máxima do Buffer (ms) ⏱️:")
+        latency_label.setFixedWidth(250)
+        latency_layout.addWidget(latency_label)
+        
+        self.latency_spin = QtWidgets.QSpinBox()
+        self.latency_spin.setRange(20, 1000)
+        self.latency_spin.setSingleStep(10)
+        self.latency_spin.setValue(self.target_latency_ms)
+        self.latency_spin.setStyleSheet(f"background:#222; color:{COLOR_TEXT_NORMAL}; padding: 5px; border-radius: 5px;")
+        self.latency_spin.valueChanged.connect(self.update_target_latency)
+        latency_layout.addWidget(self.latency_spin)
+        
+        self.config_layout.addLayout(latency_layout)
+        
+        quality_layout = QtWidgets.QHBoxLayout()
+        quality_layout.setSpacing(15)
+        
+        quality_label = QtWidgets.QLabel("Qualidade da Reamostragem 🎚️:")
+        quality_label.setFixedWidth(250)
+        quality_layout.addWidget(quality_label)
+        
+        self.quality_combo = QtWidgets.QComboBox()
+        self.quality_combo.setStyleSheet(f"background:#222; color:{COLOR_TEXT_NORMAL}; padding: 5px; border-radius: 5px;")
+        for quality, text in RESAMPLE_QUALITIES.items():
+            self.quality_combo.addItem(text, quality)
+        self.quality_combo.setCurrentIndex(max(0, self.quality_combo.findData(self.resample_quality)))
+        self.quality_combo.currentIndexChanged.connect(lambda _: self.update_resample_quality(self.quality_combo.currentData()))
+        quality_layout.addWidget(self.quality_combo)
+        
+        self.config_layout.addLayout(quality_layout)
+        
+        self.disk_cache_check = QtWidgets.QCheckBox(f"Cache em disco: guarda os clipes decodificados em '{DISK_CACHE_DIR}' (abertura instantânea)")
+        self.disk_cache_check.setChecked(self.disk_cache)
+        self.disk_cache_check.toggled.connect(self.update_disk_cache)
+        self.config_layout.addWidget(self.disk_cache_check)
+        
+        self.duplex_check = QtWidgets.QCheckBox("Modo Duplex: microfone direto na saída virtual em um único stream (quando as taxas e a API coincidem)")
+        self.duplex_check.setChecked(self.duplex_mode)
+        self.duplex_check.toggled.connect(self.update_duplex_mode)
+        self.config_layout.addWidget(self.duplex_check)
+
+    def _setup_dsp_section(self):
+        self.config_layout.addWidget(self._create_header("5. Processamento de Áudio (DSP)"))
+        
+        for chain in DSP_CHAINS:
+            for stage in chain.stages:
+                group = QtWidgets.QGroupBox()
+                group_layout = QtWidgets.QVBoxLayout(group)
+                
+                check = QtWidgets.QCheckBox(f"{stage.label} (orçamento de CPU: {stage.budget_us:.0f} µs por bloco)")
+                check.setChecked(stage.enabled)
+                check.toggled.connect(lambda enabled, st=stage: self.update_dsp_stage(st, enabled=enabled))
+                group_layout.addWidget(check)
+                
+                params_layout = QtWidgets.QHBoxLayout()
+                params_layout.setSpacing(10)
+                for param, text, minimum, maximum, step in stage.PARAMS:
+                    params_layout.addWidget(QtWidgets.QLabel(f"{text}:"))
+                    spin = QtWidgets.QDoubleSpinBox()
+                    spin.setDecimals(2 if step < 0.1 else 1)
+                    spin.setRange(minimum, maximum)
+                    spin.setSingleStep(step)
+                    spin.setValue(getattr(stage, param))
+                    spin.setStyleSheet(f"background:#222; color:{COLOR_TEXT_NORMAL}; padding: 5px; border-radius: 5px;")
+                    spin.valueChanged.connect(lambda value, st=stage, p=param: self.update_dsp_stage(st, **{p: value}))
+                    params_layout.addWidget(spin)
+                params_layout.addStretch(1)
+                group_layout.addLayout(params_layout)
+                
+                self.config_layout.addWidget(group)
+
     # --- Seção 3: Soundboard Management (Customizados) ---
     def _setup_soundboard_management_section(self):
         
@@ -641,9 +3548,9 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
             if widget is not None:
                 widget.deleteLater()
                 
-        # Filtra e ordena os atalhos
+        # Filtra e ordena os atalhos (os slots HOME+1..9 primeiro, pelo número)
         custom_keys = sorted([k for k in SOUNDBOARD_SHORTCUTS.keys() if SOUNDBOARD_SHORTCUTS[k] and k != '0'], key=lambda x: (
-            0 if x.startswith('home+') and x.strip('home+').isdigit() and int(x.strip('home+')) in range(1, 10) else 1,
+            0 if bank_slot(x) else 1,
             x.split('+')[-1]
         ))
         
@@ -659,11 +3566,13 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
             h_layout = QtWidgets.QHBoxLayout(h_widget)
             h_layout.setContentsMargins(5, 5, 5, 5)
 
-            is_auto_key = hotkey.startswith('home+') and hotkey.strip('home+').isdigit() and int(hotkey.strip('home+')) in range(1, 10)
-            
             label_text = f"**{hotkey.upper()}** — {os.path.basename(path)}" if path else f"**{hotkey.upper()}** — Nenhum áudio."
-            if is_auto_key and self.soundboard_folder:
-                 label_text = f"**[AUTO] {hotkey.upper()}** — {os.path.basename(path)}"
+            if bank_slot(hotkey) and self.soundboard_banks:
+                 label_text += " (substitui o slot dos bancos)"
+            policy = SHORTCUT_POLICIES.get(hotkey)
+            if policy is not None:
+                 label_text += f" [{policy.mode}{f' x{policy.max_voices}' if policy.mode == 'overlap' else ''}"
+                 label_text += f", grupo {policy.choke_group}]" if policy.choke_group else "]"
                  
             label_sb = QtWidgets.QLabel(label_text)
             label_sb.setStyleSheet("padding:5px; background:transparent; font-size:12px;")
@@ -680,12 +3589,7 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
             btn_remove.setToolTip("Remover Atalho")
             btn_remove.setStyleSheet(f"background:{COLOR_ERROR}; color:white; font-weight:bold; border-radius: 5px; padding: 5px;")
             btn_remove.setFixedWidth(40)
-            
-            if is_auto_key and self.soundboard_folder:
-                btn_remove.setEnabled(False)
-                btn_remove.setToolTip("Desabilitado. Desvincule a pasta para remover atalhos automáticos.")
-            else:
-                btn_remove.clicked.connect(lambda checked, k=hotkey: self.remove_shortcut(k))
+            btn_remove.clicked.connect(lambda checked, k=hotkey: self.remove_shortcut(k))
             
             h_layout.addWidget(btn_remove)
             self.custom_shortcuts_container.addWidget(h_widget)
@@ -693,33 +3597,32 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
     # --- MÉTODOS DE CONTROLE ---
     
     def _map_folder_to_shortcuts(self, initial_load=False):
-        """Mapeia os 9 primeiros arquivos de áudio da pasta para atalhos HOME+1 a HOME+9."""
+        """
+        Divide todos os áudios da pasta em bancos de BANK_SIZE; o banco ativo fica em
+        HOME+1 a HOME+9 e HOME+PAGE UP/DOWN troca de banco (sem limite de arquivos).
+        """
         global SOUNDBOARD_SHORTCUTS
         
         if not self.soundboard_folder or not os.path.isdir(self.soundboard_folder):
+            self.soundboard_banks = []
+            self.folder_watcher.watch(None)
             if not initial_load:
                 self.update_status_ui("Pasta de Soundboard inválida ou não selecionada.", COLOR_WARNING)
             return
 
-        # Lista arquivos de áudio (wav, mp3, ogg, flac)
-        audio_files = []
-        for f in os.listdir(self.soundboard_folder):
-            if f.lower().endswith(('.wav', '.mp3', '.ogg', '.flac')):
-                audio_files.append(os.path.join(self.soundboard_folder, f))
-        
-        audio_files.sort() # Ordena por nome para mapeamento consistente
-
-        # Mapeia H+1 a H+9 (máximo 9 arquivos)
-        for i in range(1, 10):
-            hotkey = f"home+{i}"
-            if i - 1 < len(audio_files):
-                SOUNDBOARD_SHORTCUTS[hotkey] = audio_files[i - 1]
-            # Remove o atalho automático se o arquivo foi removido/acabou
-            elif hotkey in SOUNDBOARD_SHORTCUTS and hotkey.startswith('home+') and hotkey.strip('home+').isdigit():
+        # A varredura inicial é a mesma base que o watcher usa para detectar as mudanças seguintes
+        audio_files = sorted(self.folder_watcher.watch(self.soundboard_folder))
+        self.soundboard_banks = split_banks(audio_files)
+        self.active_bank = min(max(self.active_bank, 0), max(len(self.soundboard_banks) - 1, 0))
+
+        # Versões anteriores gravavam os 9 primeiros arquivos como atalhos HOME+N: agora vêm dos bancos
+        folder = os.path.abspath(self.soundboard_folder)
+        for hotkey, path in list(SOUNDBOARD_SHORTCUTS.items()):
+            if bank_slot(hotkey) and path and os.path.dirname(os.path.abspath(path)) == folder:
                 del SOUNDBOARD_SHORTCUTS[hotkey]
 
         if not initial_load:
-            self.update_status_ui(f"{len(audio_files)} arquivos mapeados na pasta Soundboard.", COLOR_ACCENT_MIC)
+            self.update_status_ui(f"{len(audio_files)} arquivos mapeados na pasta Soundboard ({len(self.soundboard_banks)} bancos).", COLOR_ACCENT_MIC)
             self._update_soundboard_ui_from_config()
             self.setup_hotkeys()
             self.save_current_config()
@@ -733,105 +3636,109 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
             self.update_status_ui(f"Pasta Soundboard selecionada: {folder}", COLOR_ACCENT_MIC)
             
     def setup_hotkeys(self):
-        """Configura todos os atalhos de teclado registrados."""
-        self._unregister_hotkeys()
-        
-        # Atalho mestre para parar música/soundboard: HOME + END
-        keyboard.add_hotkey('home+end', lambda: self.stop_all_audio())
+        """
+        Registra no keyboard só os atalhos do índice (banco ativo + customizados + música),
+        então o custo dos hooks não cresce com o tamanho da biblioteca. Trocar de banco não
+        re-registra nada: HOME+1..9 continuam os mesmos, muda apenas o índice.
+        """
+        self.hotkey_index = trigger_dispatcher.index = build_hotkey_index(SOUNDBOARD_SHORTCUTS, self.soundboard_banks, self.active_bank,
+                                                                          SHORTCUT_POLICIES)
+        # Sem o listener do keyboard (a thread de partida ainda não o iniciou, ou ele falhou) só
+        # o índice é atualizado; _on_devices_loaded registra os atalhos quando ele fica pronto
+        if self.hotkeys_ready:
+            self._unregister_hotkeys()
+            
+            # Atalho mestre para parar música/soundboard (HOME + END) e os disparos vão para o
+            # despachante; só a troca de banco passa pela UI (ela redesenha os botões)
+            keyboard.add_hotkey(BANK_NEXT_HOTKEY, lambda: self.bank_signal.emit(1))
+            keyboard.add_hotkey(BANK_PREV_HOTKEY, lambda: self.bank_signal.emit(-1))
 
-        for hotkey, path in SOUNDBOARD_SHORTCUTS.items():
-            if path:
+            chords = set(self.hotkey_index) | {f"home+{slot}" for slot in range(1, BANK_SIZE + 1)} | {STOP_ALL_HOTKEY}
+            for hotkey in chords:
                 try:
                     # Usar lambda para garantir que o hotkey correto seja passado
-                    keyboard.add_hotkey(hotkey, lambda k=hotkey: self.hotkey_signal.emit(k))
+                    keyboard.add_hotkey(hotkey, lambda k=hotkey: trigger_dispatcher.press(k))
                 except ValueError as e:
                     self.update_status_ui(f"ERRO Hotkey '{hotkey}': {e}", COLOR_ERROR)
-
-    def _unregister_hotkeys(self):
-        """Remove todos os hotkeys registrados para evitar duplicação."""
-        keyboard.unhook_all_hotkeys()
         
-    def play_soundboard_audio(self, hotkey):
-        """Lida com a lógica de iniciar/parar um atalho de soundboard."""
-        global current_soundboard_key, soundboard_stop_event, playing_music, stop_music_event
-        path = SOUNDBOARD_SHORTCUTS.get(hotkey)
-
-        if not path:
-            self.update_status_ui(f"Atalho {hotkey.upper()} não configurado.", COLOR_WARNING)
-            return
-            
-        if not input_stream or not output_stream or not monitor_stream:
-            self.update_status_ui("Streams de áudio não iniciados. Ative-os primeiro!", COLOR_ERROR)
-            return
-
-        is_music = hotkey == '0'
-
-        if is_music:
-            self.toggle_music(hotkey)
-            return
-
-        # Lógica para Soundboard (efeitos)
-        if current_soundboard_key == hotkey:
-            # Parar o efeito atual se a mesma tecla for pressionada
-            if soundboard_stop_event:
-                soundboard_stop_event.set()
-                current_soundboard_key = None
+        self._prewarm_clip_cache()
+        
+    def switch_bank(self, delta):
+        """Avança/volta o banco ativo (circular) e atualiza o índice e os botões."""
+        if len(self.soundboard_banks) < 2:
             return
+        self.active_bank = (self.active_bank + delta) % len(self.soundboard_banks)
+        self._update_soundboard_ui_from_config()
+        self._prewarm_clip_cache(self.soundboard_banks[self.active_bank])
+        self.update_status_ui(f"Banco {self.active_bank + 1}/{len(self.soundboard_banks)} ativo em HOME+1..{BANK_SIZE}.", COLOR_ACCENT_AUDIO)
+        self.save_current_config()
 
-        if current_soundboard_key is not None:
-            self.update_status_ui(f"Aguarde o efeito '{current_soundboard_key.upper()}' terminar...", COLOR_WARNING)
-            return 
-            
-        if playing_music:
-            stop_music_event.set() # Para a música se um efeito for iniciado
-            
-        current_soundboard_key = hotkey
-        soundboard_stop_event = threading.Event()
-
-        threading.Thread(
-            target=play_audio_thread,
-            args=(path, False, self.status_signal.emit, hotkey, soundboard_stop_event),
-            daemon=True
-        ).start()
+    def _on_folder_change(self, added, removed, changed):
+        """
+        Chamado da thread do watcher: descarta do cache só os arquivos afetados, avisa a UI
+        (o botão aparece na hora) e decodifica os novos/alterados ali mesmo, fora da thread da UI.
+        """
+        for path in removed + changed:
+            clip_cache.invalidate(path)
+        self.folder_signal.emit(added, removed, changed)
+        for path in added + changed:
+            try:
+                clip_cache.get(path, scheduler.samplerate)
+            except Exception as e:
+                print(f"Erro ao decodificar '{path}': {e}", file=sys.stderr)
+        # Depois de decodificar: um arquivo renomeado reaproveita o .npy antes de o antigo ser esquecido
+        disk_store.forget(os.path.abspath(path) for path in removed)
 
-    def toggle_music(self, key):
-        """Inicia ou para a reprodução da música principal (key='0')."""
-        global playing_music, stop_music_event
-        path = SOUNDBOARD_SHORTCUTS.get(key)
+    def _apply_folder_changes(self, added, removed, changed):
+        """Atualiza bancos, índice e só os botões afetados (os atalhos HOME+1..9 não mudam)."""
+        files = set(path for bank in self.soundboard_banks for path in bank)
+        files.difference_update(removed)
+        files.update(added)
+        self.soundboard_banks = split_banks(sorted(files))
+        self.active_bank = min(self.active_bank, max(len(self.soundboard_banks) - 1, 0))
+        self._update_soundboard_ui_from_config()
         
-        if not path:
-            self.update_status_ui("Escolha uma música principal primeiro!", COLOR_ERROR)
-            return
+        summary = ", ".join(f"{label}: {', '.join(os.path.basename(p) for p in paths)}" for label, paths in
+                            (("novos", added), ("removidos", removed), ("alterados", changed)) if paths)
+        self.update_status_ui(f"📂 Pasta do Soundboard atualizada ({summary}).", COLOR_ACCENT_MIC)
 
-        if playing_music:
-            stop_music_event.set()
-        else:
-            if current_soundboard_key is not None:
-                self.update_status_ui(f"Música ignorada: Soundboard ({current_soundboard_key.upper()}) está tocando.", COLOR_WARNING)
+    def _prewarm_clip_cache(self, paths=None):
+        """
+        Pré-carrega no cache os áudios dos atalhos (todos, se paths for None) em paralelo,
+        mostrando o progresso na barra de status (via status_signal, seguro entre threads).
+        Retorna os futures do lote (nenhum antes de a partida carregar o scipy).
+        """
+        if not self.backends_ready:
+            return [] # _on_backends_ready pré-carrega tudo, já na taxa real da saída
+        if paths is None:
+            # A música principal (0) toca em streaming e não ocupa o cache. A biblioteca inteira
+            # passa pelo cache em disco; o banco ativo e os customizados vão por último para
+            # ficarem como os mais recentes do LRU em memória.
+            active = self.soundboard_banks[self.active_bank] if self.soundboard_banks else []
+            others = [p for i, bank in enumerate(self.soundboard_banks) if i != self.active_bank for p in bank]
+            paths = others + active + [p for k, p in SOUNDBOARD_SHORTCUTS.items() if k != '0']
+        started = time.perf_counter()
+        
+        def progress(done, total, failed):
+            if done < total:
+                self.status_signal.emit(f"⏳ Pré-carregando clipes: {done}/{total}...", COLOR_WARNING)
                 return
-                
-            threading.Thread(
-                target=play_audio_thread, 
-                args=(path, True, self.status_signal.emit), 
-                daemon=True
-            ).start()
-            
-    def stop_all_audio(self):
-        """Para a música e o soundboard simultaneamente (HOME+END)."""
-        global playing_music, stop_music_event, current_soundboard_key, soundboard_stop_event
+            message = f"✅ {total} clipes prontos em {time.perf_counter() - started:.1f} s"
+            if failed:
+                self.status_signal.emit(f"{message} ({failed} com erro, veja o console)", COLOR_WARNING)
+            else:
+                self.status_signal.emit(message, COLOR_ACCENT_MIC)
         
-        stopped = False
+        return clip_cache.prewarm_async(paths, self.get_output_samplerate(), progress)
+
+    def _unregister_hotkeys(self):
+        """Remove todos os hotkeys registrados para evitar duplicação."""
+        keyboard.unhook_all_hotkeys()
         
-        if playing_music:
-            stop_music_event.set()
-            stopped = True
-            
-        if current_soundboard_key is not None and soundboard_stop_event:
-            soundboard_stop_event.set()
-            current_soundboard_key = None
-            stopped = True
-            
-        if stopped:
+    def stop_all_audio(self):
+        """Para a música e o soundboard simultaneamente (HOME+END)."""
+        if scheduler.is_playing():
+            scheduler.stop_all()
             self.update_status_ui("TODOS os áudios parados (HOME+END). Retornando ao modo voz...", COLOR_WARNING)
         
     def add_shortcut_dialog(self, hotkey=None, path=None):
@@ -866,13 +3773,63 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         btn_select_file.setStyleSheet(f"padding: 8px; background:{COLOR_ACCENT_AUDIO}; color:black; font-weight: bold; border-radius: 5px;")
         layout.addWidget(btn_select_file)
         
-        # 3. Botão Salvar
+        # 3. Corte de silêncio (opcional): vazio usa os pontos detectados na análise do clipe
+        layout.addWidget(QtWidgets.QLabel("\nCorte do áudio em ms (opcional):"))
+        trim_layout = QtWidgets.QHBoxLayout()
+        trim = CLIP_TRIMS.get(path, [None, None]) if path else [None, None]
+        self.trim_inputs = []
+        for label, value in (("Início", trim[0]), ("Fim", trim[1])):
+            spin = QtWidgets.QSpinBox()
+            spin.setRange(-1, 3600 * 1000)
+            spin.setSpecialValueText("Automático") # -1 = ponto detectado
+            spin.setSuffix(" ms")
+            spin.setValue(-1 if value is None else int(value))
+            spin.setStyleSheet("padding: 6px; background: #333; border: 1px solid #555; border-radius: 5px;")
+            trim_layout.addWidget(QtWidgets.QLabel(label))
+            trim_layout.addWidget(spin, 1)
+            self.trim_inputs.append(spin)
+        layout.addLayout(trim_layout)
+        self.trim_detected_label = QtWidgets.QLabel()
+        self.trim_detected_label.setStyleSheet("font-size: 11px; color: #aaa;")
+        layout.addWidget(self.trim_detected_label)
+        self._update_trim_detected_label(path)
+        
+        # 4. Modo de disparo: o que a mesma tecla faz com o som tocando, e o grupo de corte
+        policy = SHORTCUT_POLICIES.get(hotkey, DEFAULT_POLICY)
+        layout.addWidget(QtWidgets.QLabel("\nModo de disparo:"))
+        self.mode_combo = QtWidgets.QComboBox()
+        self.mode_combo.setStyleSheet("padding: 6px; background: #333; border: 1px solid #555; border-radius: 5px;")
+        for mode, text in PLAY_MODES.items():
+            self.mode_combo.addItem(text, mode)
+        self.mode_combo.setCurrentIndex(max(0, self.mode_combo.findData(policy.mode)))
+        layout.addWidget(self.mode_combo)
+        
+        mode_layout = QtWidgets.QHBoxLayout()
+        self.max_voices_spin = QtWidgets.QSpinBox()
+        self.max_voices_spin.setRange(1, MAX_VOICES)
+        self.max_voices_spin.setValue(policy.max_voices)
+        self.max_voices_spin.setStyleSheet("padding: 6px; background: #333; border: 1px solid #555; border-radius: 5px;")
+        self.max_voices_spin.setEnabled(policy.mode == 'overlap')
+        self.mode_combo.currentIndexChanged.connect(lambda _: self.max_voices_spin.setEnabled(self.mode_combo.currentData() == 'overlap'))
+        self.choke_input = QtWidgets.QLineEdit(policy.choke_group)
+        self.choke_input.setPlaceholderText("Nenhum")
+        self.choke_input.setStyleSheet("padding: 6px; background: #333; border: 1px solid #555; border-radius: 5px;")
+        mode_layout.addWidget(QtWidgets.QLabel("Vozes"))
+        mode_layout.addWidget(self.max_voices_spin)
+        mode_layout.addWidget(QtWidgets.QLabel("Grupo de corte"))
+        mode_layout.addWidget(self.choke_input, 1)
+        layout.addLayout(mode_layout)
+        
+        # 5. Botão Salvar
         btn_save = QtWidgets.QPushButton("Salvar Atalho")
-        btn_save.clicked.connect(lambda: self._save_shortcut(dialog, self.hotkey_input.text(), self.file_path_input.text(), hotkey))
+        btn_save.clicked.connect(lambda: self._save_shortcut(dialog, self.hotkey_input.text(), self.file_path_input.text(), hotkey,
+                                                             [None if spin.value() < 0 else spin.value() for spin in self.trim_inputs],
+                                                             PlayPolicy(self.mode_combo.currentData(), self.max_voices_spin.value(),
+                                                                        self.choke_input.text())))
         btn_save.setStyleSheet(f"padding: 10px; margin-top: 15px; background:{COLOR_ACCENT_MIC}; color:black; font-weight:bold; border-radius: 8px;")
         layout.addWidget(btn_save)
         
-        # 4. Botão Cancelar
+        # 6. Botão Cancelar
         btn_cancel = QtWidgets.QPushButton("Cancelar")
         btn_cancel.clicked.connect(dialog.reject)
         btn_cancel.setStyleSheet(f"padding: 10px; background:#444; color:{COLOR_TEXT_NORMAL}; border-radius: 8px;")
@@ -910,31 +3867,48 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         )
         if path:
             self.file_path_input.setText(path)
+            self._update_trim_detected_label(path)
+            
+    def _update_trim_detected_label(self, path):
+        """Mostra no diálogo o corte detectado, se o clipe já foi analisado (não decodifica na UI)."""
+        samplerate = scheduler.samplerate
+        clip = clip_cache.peek(path, samplerate) if path and os.path.exists(path) else None
+        if clip is None:
+            self.trim_detected_label.setText("Automático: silêncio do início/fim detectado quando o clipe é carregado.")
+            return
+        start_ms, end_ms = clip.start * 1000 // samplerate, clip.end * 1000 // samplerate
+        total_ms = len(clip.audio) * 1000 // samplerate
+        self.trim_detected_label.setText(f"Detectado: início {start_ms} ms, fim {end_ms} ms (arquivo com {total_ms} ms).")
             
-    def _save_shortcut(self, dialog, hotkey_to_save, path, previous_hotkey=None):
-        """Salva o atalho no dicionário global e na configuração."""
+    def _save_shortcut(self, dialog, hotkey_to_save, path, previous_hotkey=None, trim=None, policy=None):
+        """Salva o atalho (com o corte manual e o modo de disparo, se houver) no dicionário global e na configuração."""
         global SOUNDBOARD_SHORTCUTS
         
         if not hotkey_to_save or not path:
             self.update_status_ui("Atalho e caminho do arquivo são obrigatórios!", COLOR_ERROR)
             return
+        
+        if trim and any(point is not None for point in trim):
+            CLIP_TRIMS[path] = trim
+        else:
+            CLIP_TRIMS.pop(path, None)
 
         # 1. Remove atalho anterior, se estiver sendo editado ou renomeado
         if previous_hotkey and previous_hotkey != hotkey_to_save and previous_hotkey in SOUNDBOARD_SHORTCUTS:
             del SOUNDBOARD_SHORTCUTS[previous_hotkey]
+            SHORTCUT_POLICIES.pop(previous_hotkey, None)
             
-        # 2. Remove o atalho se o hotkey já existir com outro arquivo
-        if hotkey_to_save in SOUNDBOARD_SHORTCUTS and SOUNDBOARD_SHORTCUTS[hotkey_to_save] != path:
-             # Se for um atalho automático de pasta (H+1 a H+9), o mapeamento automático será desvinculado
-            is_auto_key = hotkey_to_save.startswith('home+') and hotkey_to_save.strip('home+').isdigit() and int(hotkey_to_save.strip('home+')) in range(1, 10)
-            if is_auto_key and self.soundboard_folder:
-                self.soundboard_folder = ''
-                self.update_status_ui("A pasta de Soundboard foi desvinculada para manter sua edição manual.", COLOR_WARNING)
-            
-        # 3. Salva o novo atalho
+        # 2. Salva o novo atalho (um HOME+N customizado tem prioridade sobre o slot N dos bancos)
         SOUNDBOARD_SHORTCUTS[hotkey_to_save] = path
+        if policy is not None and not policy.is_default():
+            SHORTCUT_POLICIES[hotkey_to_save] = policy
+        else:
+            SHORTCUT_POLICIES.pop(hotkey_to_save, None)
             
-        self.update_status_ui(f"Atalho {hotkey_to_save} salvo. Reiniciando hotkeys...", COLOR_ACCENT_MIC)
+        if bank_slot(hotkey_to_save) and self.soundboard_banks:
+            self.update_status_ui(f"Atalho {hotkey_to_save} salvo; ele substitui o slot {bank_slot(hotkey_to_save)} em todos os bancos.", COLOR_WARNING)
+        else:
+            self.update_status_ui(f"Atalho {hotkey_to_save} salvo. Reiniciando hotkeys...", COLOR_ACCENT_MIC)
         self._update_soundboard_ui_from_config()
         self._update_custom_shortcuts_ui() # Atualiza a lista na aba de Configurações
         self.setup_hotkeys()
@@ -945,19 +3919,8 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
     def remove_shortcut(self, hotkey):
         global SOUNDBOARD_SHORTCUTS
         if hotkey in SOUNDBOARD_SHORTCUTS:
-            
-            # Se for um atalho automático (H+1 a H+9), o mapeamento de pasta é quebrado
-            is_auto_key = hotkey.startswith('home+') and hotkey.strip('home+').isdigit() and int(hotkey.strip('home+')) in range(1, 10)
-            if is_auto_key and self.soundboard_folder:
-                self.soundboard_folder = ''
-                self.update_status_ui("A pasta de Soundboard foi desvinculada para permitir a remoção de atalhos.", COLOR_WARNING)
-                
             del SOUNDBOARD_SHORTCUTS[hotkey]
-            
-            # Se a pasta não foi desvinculada, tenta remapear após remover
-            if self.soundboard_folder:
-                self._map_folder_to_shortcuts()
-                
+            SHORTCUT_POLICIES.pop(hotkey, None)
             self.update_status_ui(f"Atalho {hotkey} removido. Reiniciando hotkeys...", COLOR_WARNING)
             self._update_soundboard_ui_from_config()
             self._update_custom_shortcuts_ui() # Atualiza a lista na aba de Configurações
@@ -966,20 +3929,65 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
             
     # --- Atualizações de Volume e UI ---
 
+    # Os sliders só registram o valor no config_service: a gravação em disco é juntada e feita fora da UI
+
     def update_music_volume(self, value):
         global music_volume_factor
         self.volume_level = value
         music_volume_factor = value / 100.0
+        config_service.update(volume_level=value)
         
     def update_mic_volume(self, value):
         global mic_volume_factor
         self.mic_level = value
         mic_volume_factor = value / 100.0
+        config_service.update(mic_volume_level=value)
         
     def update_monitor_volume(self, value):
         global monitor_volume_factor
         self.monitor_level = value
         monitor_volume_factor = value / 100.0
+        config_service.update(monitor_volume_level=value)
+        
+    def update_duck_level(self, value):
+        self.duck_level = value
+        mixer.duck_level = value / 100.0
+        config_service.update(duck_level=value)
+        
+    def update_bus_ducking(self, bus, enabled):
+        self.bus_ducking[bus] = enabled
+        mixer.bus_ducking[bus] = enabled
+        config_service.update(bus_ducking=self.bus_ducking)
+        
+    def update_clip_cache_budget(self, value):
+        self.clip_cache_mb = value
+        clip_cache.set_budget(value)
+        config_service.update(clip_cache_mb=value)
+        
+    def update_duplex_mode(self, enabled):
+        self.duplex_mode = enabled
+        config_service.update(duplex_mode=enabled)
+        
+    def update_disk_cache(self, enabled):
+        self.disk_cache = disk_store.enabled = enabled
+        config_service.update(disk_cache=enabled)
+        
+    def update_resample_quality(self, quality):
+        """Troca a qualidade da reamostragem; os clipes são decodificados de novo em segundo plano."""
+        global resample_quality
+        self.resample_quality = resample_quality = quality
+        config_service.update(resample_quality=quality)
+        self._prewarm_clip_cache()
+        
+    def update_dsp_stage(self, stage, **settings):
+        """Aplica na hora (o callback usa os coeficientes novos no próximo bloco)."""
+        stage.update(**settings)
+        config_service.update(dsp=dsp_settings())
+        
+    def update_target_latency(self, value):
+        self.target_latency_ms = value
+        set_target_latency(value, self.get_output_samplerate(), self.get_input_samplerate())
+        config_service.update(target_latency_ms=value)
 
     @QtCore.pyqtSlot(str, str)
     def update_status_ui(self, message, color):
@@ -987,18 +3995,42 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         self.status.setText(f"Status: {message}")
         self.status.setStyleSheet(f"color:{color}; font-size:14px; padding:10px; background:#222; border-radius: 8px; margin-top: 15px;")
 
-    def _clear_soundboard_container(self):
-        """Limpa o layout dinâmico do Soundboard (QGridLayout)."""
-        while self.soundboard_grid_layout.count():
-            item = self.soundboard_grid_layout.takeAt(0)
-            widget = item.widget()
-            if widget is not None:
-                widget.deleteLater()
+    def _create_soundboard_button(self, hotkey):
+        """Cria o botão de um atalho do grid (o texto é preenchido por _update_soundboard_ui_from_config)."""
+        btn_play_sb = QtWidgets.QPushButton()
+        
+        # Adiciona o ícone padrão
+        if os.path.exists(ICON_PATH):
+            btn_play_sb.setIcon(QtGui.QIcon(ICON_PATH))
+            
+        btn_play_sb.setStyleSheet(f"""
+            QPushButton {{
+                background:#222; 
+                color:{COLOR_TEXT_NORMAL}; 
+                padding: 5px; 
+                font-weight: bold; 
+                border-radius: 8px;
+                border: 1px solid {COLOR_ACCENT_MIC};
+                min-height: 70px;
+                max-height: 70px;
+                text-align: center;
+                font-size: 11px;
+            }}
+            QPushButton:hover {{
+                background: {COLOR_ACCENT_MIC};
+                color: black;
+            }}
+        """)
+        
+        btn_play_sb.clicked.connect(lambda checked, k=hotkey: trigger_dispatcher.press(k))
+        return btn_play_sb
     
     def _update_soundboard_ui_from_config(self):
-        """Redesenha a seção do Soundboard com base em SOUNDBOARD_SHORTCUTS usando QGridLayout."""
+        """
+        Sincroniza a seção do Soundboard (QGridLayout) com o índice de atalhos: os botões
+        existentes são reaproveitados e só os que mudaram de áudio ou posição são tocados.
+        """
         global SOUNDBOARD_SHORTCUTS 
-        self._clear_soundboard_container()
         
         is_active = input_stream is not None and output_stream is not None and monitor_stream is not None
         
@@ -1010,54 +4042,52 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
             self.btn_play.setEnabled(False)
             self.btn_play.setText("🎵 Tocar/Parar Música (Áudio não configurado)")
             
-        # 2. Ordenação para Soundboard
-        sorted_keys = sorted([k for k in SOUNDBOARD_SHORTCUTS.keys() if SOUNDBOARD_SHORTCUTS[k] and k != '0'], key=lambda x: (
-            0 if x.startswith('home+') and x.strip('home+').isdigit() and int(x.strip('home+')) in range(1, 10) else 1,
+        # 2. Banco ativo (o índice é refeito aqui porque os atalhos podem ter acabado de mudar)
+        self.hotkey_index = trigger_dispatcher.index = build_hotkey_index(SOUNDBOARD_SHORTCUTS, self.soundboard_banks, self.active_bank,
+                                                                          SHORTCUT_POLICIES)
+        total_banks = len(self.soundboard_banks)
+        if total_banks:
+            self.bank_label.setText(f"Banco {self.active_bank + 1}/{total_banks} (HOME+PAGE UP / HOME+PAGE DOWN)")
+        else:
+            self.bank_label.setText("Sem pasta mapeada: apenas atalhos customizados")
+        self.btn_bank_prev.setEnabled(total_banks > 1)
+        self.btn_bank_next.setEnabled(total_banks > 1)
+            
+        # 3. Ordenação para Soundboard: slots do banco (HOME+1..9) e depois os customizados
+        sorted_keys = sorted([k for k, entry in self.hotkey_index.items() if entry[2] != 'music'], key=lambda x: (
+            bank_slot(x) or BANK_SIZE + 1,
             x.split('+')[-1]
         ))
         
         COLUMNS = 5 
+        layout = self.soundboard_grid_layout
+        
+        for hotkey in set(self.soundboard_buttons) - set(sorted_keys):
+            btn_play_sb = self.soundboard_buttons.pop(hotkey)
+            layout.removeWidget(btn_play_sb)
+            btn_play_sb.deleteLater()
         
         for index, hotkey in enumerate(sorted_keys):
-            path = SOUNDBOARD_SHORTCUTS.get(hotkey) 
-            
-            btn_play_sb = QtWidgets.QPushButton()
-            file_name = os.path.basename(path)
+            path = self.hotkey_index[hotkey][1]
             
-            btn_play_sb.setText(f"[{hotkey.upper()}]\n{file_name[:20]}{'...' if len(file_name) > 20 else ''}")
+            btn_play_sb = self.soundboard_buttons.get(hotkey)
+            if btn_play_sb is None:
+                btn_play_sb = self.soundboard_buttons[hotkey] = self._create_soundboard_button(hotkey)
             
-            btn_play_sb.setToolTip(f"Tocar/Parar | {hotkey.upper()} - {path}")
-            
-            # Adiciona o ícone padrão
-            if os.path.exists(ICON_PATH):
-                btn_play_sb.setIcon(QtGui.QIcon(ICON_PATH))
-                
-            btn_play_sb.setStyleSheet(f"""
-                QPushButton {{
-                    background:#222; 
-                    color:{COLOR_TEXT_NORMAL}; 
-                    padding: 5px; 
-                    font-weight: bold; 
-                    border-radius: 8px;
-                    border: 1px solid {COLOR_ACCENT_MIC};
-                    min-height: 70px;
-                    max-height: 70px;
-                    text-align: center;
-                    font-size: 11px;
-                }}
-                QPushButton:hover {{
-                    background: {COLOR_ACCENT_MIC};
-                    color: black;
-                }}
-            """)
-            
-            btn_play_sb.clicked.connect(lambda checked, k=hotkey: self.play_soundboard_audio(k))
+            tooltip = f"Tocar/Parar | {hotkey.upper()} - {path}"
+            if btn_play_sb.toolTip() != tooltip:
+                file_name = os.path.basename(path)
+                btn_play_sb.setText(f"[{hotkey.upper()}]\n{file_name[:20]}{'...' if len(file_name) > 20 else ''}")
+                btn_play_sb.setToolTip(tooltip)
             btn_play_sb.setEnabled(is_active)
             
             row = index // COLUMNS
             col = index % COLUMNS
             
-            self.soundboard_grid_layout.addWidget(btn_play_sb, row, col)
+            position = layout.indexOf(btn_play_sb)
+            if position < 0 or layout.getItemPosition(position)[:2] != (row, col):
+                layout.removeWidget(btn_play_sb)
+                layout.addWidget(btn_play_sb, row, col)
             
         SOUNDBOARD_SHORTCUTS = {k: v for k, v in SOUNDBOARD_SHORTCUTS.items() if v or k == '0'}
         
@@ -1072,7 +4102,8 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         if is_active:
             text = "PARAR AUDIO STREAMS (Desativar)"
             style = f"padding:15px; background:{COLOR_ERROR}; color:white; font-weight:bold; font-size:18px; border-radius: 10px; margin-bottom: 15px;"
-            status_text = f"Streams ATIVOS (IN: {input_sr:.0f} | OUT: {output_sr:.0f} Hz). Monitoramento Condicional OK."
+            mode = "DUPLEX" if input_stream is output_stream else "SEPARADOS"
+            status_text = f"Streams ATIVOS ({mode} | IN: {input_sr:.0f} | OUT: {output_sr:.0f} Hz). Monitoramento Condicional OK."
             status_color = COLOR_ACCENT_MIC
             self.start_stop_action.setText("Parar Streams") # Para o menu da bandeja
         else:
@@ -1092,6 +4123,10 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         """Inicia os streams de áudio do microfone real, saída virtual e monitoramento usando a taxa de amostragem correta."""
         global input_stream, output_stream, monitor_stream
         
+        if not self.devices_loaded:
+            self.update_status_ui("Carregando dispositivos de áudio, aguarde...", COLOR_WARNING)
+            return
+        
         input_device_index = self.config.get('input_device_index', -1)
         output_device_index = self.config.get('output_device_index', -1)
         monitor_device_index = self.config.get('monitor_device_index', -1)
@@ -1103,15 +4138,41 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         input_sr = self.get_input_samplerate()
         output_sr = self.get_output_samplerate()
         monitor_sr = self.get_monitor_samplerate()
+        
+        # Canais por dispositivo (estéreo quando o cabo/fone aceita); clipes de outra contagem são refeitos
+        if set_output_channels(self.get_output_channels(), self.get_monitor_channels()):
+            self._prewarm_clip_cache()
+        
+        # Estatísticas novas a cada sessão (as da anterior ficam visíveis até aqui)
+        output_buffers.reset_stats()
+        monitor_buffers.reset_stats()
+        for stats in STREAM_STATS:
+            stats.reset()
+        for chain in DSP_CHAINS:
+            chain.reset_stats()
 
         try:
-            # Tenta iniciar com a taxa padrão do dispositivo. Se falhar, PortAudio irá tentar a default.
-            input_stream = sd.InputStream(device=input_device_index, channels=CHANNELS, samplerate=input_sr, blocksize=BLOCKSIZE, callback=input_callback)
-            output_stream = sd.OutputStream(device=output_device_index, channels=CHANNELS, samplerate=output_sr, blocksize=BLOCKSIZE, callback=output_callback)
-            monitor_stream = sd.OutputStream(device=monitor_device_index, channels=CHANNELS, samplerate=monitor_sr, blocksize=BLOCKSIZE, callback=monitor_callback)
+            # Duplex (um único stream mic → cabo) quando os dispositivos permitem; senão, streams separados
+            duplex_stream = self._open_duplex_stream(input_device_index, output_device_index) if self.duplex_mode else None
+            if duplex_stream is not None:
+                input_stream = output_stream = duplex_stream
+            else:
+                # Tenta iniciar com a taxa padrão do dispositivo. Se falhar, PortAudio irá tentar a default.
+                input_stream = sd.InputStream(device=input_device_index, channels=MIC_CHANNELS, samplerate=input_sr, blocksize=BLOCKSIZE, callback=input_callback)
+                output_stream = sd.OutputStream(device=output_device_index, channels=output_channels, samplerate=output_sr, blocksize=BLOCKSIZE, callback=output_callback)
+                # Taxas reais negociadas; o drift entre os dois relógios é corrigido na leitura do microfone
+                set_target_latency(self.target_latency_ms, output_stream.samplerate, input_stream.samplerate)
+                mic_resampler.configure(input_stream.samplerate, output_stream.samplerate)
+            monitor_stream = sd.OutputStream(device=monitor_device_index, channels=monitor_channels, samplerate=monitor_sr, blocksize=BLOCKSIZE, callback=monitor_callback)
+            
+            # Filtros da DSP projetados para as taxas reais (o microfone roda na taxa da entrada)
+            mic_chain.configure(input_stream.samplerate, MIC_CHANNELS)
+            output_chain.configure(output_stream.samplerate, output_channels)
+            mixer.set_samplerate(output_stream.samplerate)
 
             input_stream.start()
-            output_stream.start()
+            if output_stream is not input_stream:
+                output_stream.start()
             monitor_stream.start() # Inicia o monitoramento, o callback lida com a lógica de ativação/desativação
 
             self._update_start_stop_ui()
@@ -1123,31 +4184,46 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
             print(f"ERRO: {e}", file=sys.stderr)
             self.stop_streams() # Garante que todos os streams sejam fechados em caso de falha
 
+    def _open_duplex_stream(self, input_device_index, output_device_index):
+        """
+        Abre um sd.Stream full-duplex (microfone e saída virtual no mesmo callback) se os dois
+        dispositivos usam a mesma taxa e a mesma API de host. Retorna None para usar o modo separado.
+        """
+        input_sr = self.get_input_samplerate()
+        if input_sr != self.get_output_samplerate():
+            return None
+        try:
+            if self._device(input_device_index)['hostapi'] != self._device(output_device_index)['hostapi']:
+                return None
+            return sd.Stream(device=(input_device_index, output_device_index), channels=(MIC_CHANNELS, output_channels),
+                             samplerate=input_sr, blocksize=BLOCKSIZE, callback=duplex_callback)
+        except Exception as e:
+            print(f"Modo duplex indisponível, usando streams separados: {e}", file=sys.stderr)
+            return None
+
     def stop_streams(self):
         """Para todos os streams de áudio."""
-        global input_stream, output_stream, monitor_stream, playing_music, mode_voice
+        global input_stream, output_stream, monitor_stream
         
         self.stop_all_audio() # Garante que todo áudio de soundboard/música pare
 
+        if output_stream:
+            if output_stream is not input_stream: # No duplex é o mesmo stream
+                output_stream.stop()
+                output_stream.close()
+            output_stream = None
         if input_stream:
             input_stream.stop()
             input_stream.close()
             input_stream = None
-        if output_stream:
-            output_stream.stop()
-            output_stream.close()
-            output_stream = None
         if monitor_stream:
             monitor_stream.stop()
             monitor_stream.close()
             monitor_stream = None
             
-        mode_voice = True
-        playing_music = False
-
-        while not output_queue.empty():
-            try: output_queue.get_nowait()
-            except: pass
+        scheduler.reset() # Sem callback de saída, as vozes paradas são liberadas direto
+        output_ring.clear()
+        monitor_ring.clear()
             
         self._update_start_stop_ui()
 
@@ -1164,15 +4240,15 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         global monitor_stream
         if monitor_stream is None: return
         
-        is_playing = playing_music or current_soundboard_key is not None
+        is_playing = bool(mixer.active_voices())
         
         if is_playing and monitor_stream.stopped:
             # Se for tocar som, o monitoramento deve estar ativo para ouvir o soundboard
             monitor_stream.start() 
-        elif not is_playing and not mode_voice and monitor_stream.stopped:
+        elif not is_playing and mixer.is_ducking() and monitor_stream.stopped:
             # Se a voz estiver pausada e não houver som, não precisa de monitoramento
             pass 
-        elif mode_voice and monitor_stream.stopped:
+        elif not mixer.is_ducking() and monitor_stream.stopped:
             # Se a voz estiver ativa, ligue o monitoramento
             monitor_stream.start()
         
@@ -1220,15 +4296,559 @@ class VoiceGamingSWITCH(QtWidgets.QMainWindow):
         self.hide()
         event.ignore()
         
+# ==================== VERIFICAÇÕES DE LINHA DE COMANDO ====================
+
+VOICE_CYCLE_BLOCKS = 40 # Blocos entre as paradas das vozes no --check-allocs
+
+def check_callback_allocations(blocks=5000, samplerate=SAMPLERATE):
+    """
+    Simula microfone → saída → monitor por 'blocks' callbacks com vozes tocando e mede
+    com tracemalloc se o caminho dos callbacks aloca memória. Passa se nenhum callback criar
+    array (pico e retenção abaixo do tamanho de um bloco); sobram só os poucos bytes dos
+    contadores int/float trocados a cada chamada, que não crescem com o número de blocos.
+    As vozes param e voltam a cada VOICE_CYCLE_BLOCKS, passando pelo fade-out, pelo fade-in
+    da música e pelas rampas do ducking. A medição estrita usa os estágios de DSP do jeito
+    padrão (limitador ligado); depois repete com todos ligados: o lfilter do passa-altas, do
+    gate e do compressor devolve arrays novos a cada bloco (liberados no mesmo callback),
+    então ali só a retenção precisa ficar abaixo de um bloco.
+    """
+    t = np.arange(BLOCKSIZE, dtype=np.float32) / samplerate
+    indata = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32).reshape(-1, MIC_CHANNELS)
+    outdata = np.zeros((BLOCKSIZE, output_channels), dtype=np.float32)
+    monitor_out = np.zeros((BLOCKSIZE, monitor_channels), dtype=np.float32)
+    mic_chain.configure(samplerate, MIC_CHANNELS) # Como na abertura dos streams (projeta os filtros)
+    output_chain.configure(samplerate, output_channels)
+
+    # Vozes sintéticas direto no pool, uma música com os canais da saída e um efeito mono
+    # (clipes longos o bastante para toda a simulação)
+    voices = mixer.voices[:2]
+    for voice, channels, bus in zip(voices, (output_channels, 1), ('music', 'sfx')):
+        clip = np.resize(indata, ((blocks + 200) * BLOCKSIZE, channels)) * 2.0
+        voice.bus, voice.key, voice.gain, voice.data, voice.stream = bus, f'teste {channels}', 0.5, clip, None
+        voice.pos, voice.stopped, voice.finished, voice.active = 0, False, False, True
+
+    def run(count):
+        for block in range(count):
+            # Papel do agendador: para as vozes e as religa depois que o fade-out termina
+            for voice in voices:
+                if block % VOICE_CYCLE_BLOCKS == 0:
+                    voice.stop()
+                elif voice.finished:
+                    voice.pos, voice.fade_in, voice.fade_out, voice.stopped, voice.finished = 0, 0, 0, False, False
+            input_callback(indata, BLOCKSIZE, None, None)
+            output_callback(outdata, BLOCKSIZE, None, None)
+            monitor_callback(monitor_out, BLOCKSIZE, None, None)
+
+    def measure(flags):
+        for stage, flag in zip(stages, flags):
+            stage.enabled = flag
+        tracemalloc.start()
+        try:
+            # Aquecimento já rastreado: os contadores (ints) trocados depois não contam como retenção
+            run(100)
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            run(blocks)
+            after, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return after - before, peak - before
+
+    stages = [stage for chain in DSP_CHAINS for stage in chain.stages]
+    enabled = [stage.enabled for stage in stages]
+    try:
+        net, transient = measure([stage.default_enabled for stage in stages])
+        dsp_net, dsp_transient = measure([True] * len(stages))
+    finally:
+        for stage, was_enabled in zip(stages, enabled):
+            stage.enabled = was_enabled
+        for voice in voices:
+            voice.active = False
+            voice.data = None
+
+    block_bytes = BLOCKSIZE * output_channels * 4
+    ok = net < block_bytes and transient < block_bytes and dsp_net < block_bytes
+
+    print(f"Callbacks simulados: {blocks} x 3 ({BLOCKSIZE} frames, microfone mono, saída {output_channels} e monitor {monitor_channels} canais)")
+    defaults = ', '.join(stage.name for stage in stages if stage.default_enabled) or 'nenhum'
+    print(f"DSP padrão ({defaults}) — memória retida: {net} bytes | Pico transitório: {transient} bytes (limite {block_bytes} bytes)")
+    print(f"DSP toda ligada — memória retida: {dsp_net} bytes (limite {block_bytes} bytes) | Pico transitório do lfilter: {dsp_transient} bytes")
+    print("OK: caminho dos callbacks sem alocação (e sem retenção com a DSP)." if ok else "FALHOU: os callbacks estão alocando memória.")
+    return ok
+
+def benchmark_resampling(folder=None, samplerate=SAMPLERATE):
+    """
+    Mede a vazão (amostras de entrada por segundo) de cada qualidade de reamostragem nos
+    clipes da pasta do soundboard e compara com o resample_poly chamado com as taxas brutas
+    (que projeta o filtro de novo a cada clipe). 'frio' inclui o projeto dos filtros; 'cache'
+    roda de novo com os filtros já prontos. Clipes que já estão em 'samplerate' são
+    convertidos para 48 kHz (ou 44,1 kHz), para que todo arquivo passe pelo reamostrador.
+    """
+    folder = folder or load_config().get('soundboard_folder', '')
+    if not folder or not os.path.isdir(folder):
+        print(f"ERRO: pasta de clipes inválida: '{folder}'", file=sys.stderr)
+        return False
+
+    clips = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(AUDIO_EXTENSIONS):
+            continue
+        try:
+            audio, sr = sf.read(os.path.join(folder, name), dtype='float32', always_2d=True)
+        except Exception as e:
+            print(f"Ignorando '{name}': {e}", file=sys.stderr)
+            continue
+        dst = samplerate if sr != samplerate else (48000 if samplerate != 48000 else 44100)
+        clips.append((audio.mean(axis=1), sr, dst))
+    if not clips:
+        print(f"ERRO: nenhum áudio em '{folder}'", file=sys.stderr)
+        return False
+
+    total = sum(len(audio) for audio, _, _ in clips)
+    pairs = sorted({(sr, dst) for _, sr, dst in clips})
+    print(f"{len(clips)} clipes, {total / 1e6:.2f} M amostras | conversões: " + ", ".join(f"{a}→{b}" for a, b in pairs))
+
+    methods = [('resample_poly (taxas brutas)', lambda audio, sr, dst: scipy_signal.resample_poly(audio, dst, sr))]
+    methods += [(quality, lambda audio, sr, dst, quality=quality: resample(audio, sr, dst, quality)) for quality in RESAMPLE_QUALITIES]
+    scipy_signal.resample_poly(clips[0][0][:4096], 2, 1) # Aquecimento do scipy (fora da medição)
+    for name, method in methods:
+        with _filter_lock:
+            _filter_cache.clear()
+        rates = []
+        for _ in range(4):
+            started = time.perf_counter()
+            for audio, sr, dst in clips:
+                method(audio, sr, dst)
+            rates.append(total / (time.perf_counter() - started) / 1e6)
+        print(f"  {name:30s} frio {rates[0]:8.2f} M amostras/s | cache {max(rates[1:]):8.2f} M amostras/s")
+    return True
+
+# ==================== MODO HEADLESS (RENDER/BENCHMARK OFFLINE) ====================
+
+class FakeStream:
+    """Dispositivo simulado: chama o callback de um stream com um relógio próprio, sem PortAudio."""
+    now = 0.0 # Instante simulado do callback em execução (relógio do controle de drift)
+
+    def __init__(self, callback, samplerate, channels=MAX_OUTPUT_CHANNELS, blocksize=BLOCKSIZE, drift_ppm=0.0):
+        self.callback = callback
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.period = blocksize / (samplerate * (1.0 + drift_ppm / 1e6)) # Duração real de um bloco
+        self.next_time = 0.0
+        self.buffer = np.zeros((blocksize, channels), dtype=np.float32)
+        self.stopped = True
+
+    def start(self): self.stopped = False
+    def stop(self): self.stopped = True
+    def close(self): self.stopped = True
+
+    def run_block(self, indata=None, duplex=False):
+        """Executa um callback (entrada: indata; saída: preenche self.buffer) e retorna o tempo de CPU."""
+        FakeStream.now = self.next_time
+        started = time.perf_counter()
+        if duplex:
+            self.callback(indata, self.buffer, self.blocksize, None, None)
+        elif indata is not None:
+            self.callback(indata, self.blocksize, None, None)
+        else:
+            self.callback(self.buffer, self.blocksize, None, None)
+        elapsed = time.perf_counter() - started
+        self.next_time += self.period
+        return elapsed
+
+def _load_headless_mic(mic, samplerate, total_frames):
+    """Sinal do microfone simulado: arquivo de áudio (em loop) ou um tom de 220 Hz."""
+    if mic and mic != 'tom':
+        audio, sr = sf.read(mic, dtype='float32', always_2d=True)
+        audio = audio.mean(axis=1)
+        audio = resample(audio, sr, samplerate).astype(np.float32)
+    else:
+        t = np.arange(samplerate, dtype=np.float32) / samplerate
+        audio = (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    if len(audio) == 0:
+        audio = np.zeros(1, dtype=np.float32)
+    return np.resize(audio, total_frames).reshape(-1, MIC_CHANNELS)
+
+def _parse_triggers(triggers, shortcuts, banks, active_bank, policies):
+    """
+    Converte 'TEMPO:ATALHO' ou 'TEMPO:ARQUIVO' em eventos (tempo, atalho, entrada do índice)
+    ordenados. Atalhos são resolvidos pelo mesmo índice da interface ('0' continua sendo a
+    música); HOME+END vira o evento de parar tudo (entrada None) e HOME+PAGE DOWN/UP trocam
+    o banco dos disparos seguintes, como no programa. Qualquer outro alvo que não seja um
+    arquivo existente gera ValueError.
+    """
+    parsed = []
+    for trigger in triggers:
+        at, _, target = trigger.partition(':')
+        try:
+            at = float(at)
+        except ValueError:
+            raise ValueError(f"tempo inválido em '{trigger}' (use TEMPO:ATALHO, ex.: 1.5:home+1)") from None
+        parsed.append((at, MUSIC_HOTKEY if target == '0' else target))
+
+    events = []
+    index = build_hotkey_index(shortcuts, banks, active_bank, policies)
+    for at, chord in sorted(parsed, key=lambda event: event[0]):
+        if chord == STOP_ALL_HOTKEY:
+            events.append((at, chord, None))
+        elif chord in (BANK_NEXT_HOTKEY, BANK_PREV_HOTKEY):
+            if len(banks) >= 2:
+                active_bank = (active_bank + (1 if chord == BANK_NEXT_HOTKEY else -1)) % len(banks)
+                index = build_hotkey_index(shortcuts, banks, active_bank, policies)
+        elif chord in index:
+            events.append((at, chord, index[chord]))
+        elif os.path.isfile(chord):
+            events.append((at, chord, (os.path.basename(chord), chord, 'sfx', DEFAULT_POLICY)))
+        else:
+            raise ValueError(f"'{chord}' não é um atalho configurado nem um arquivo existente")
+    return events
+
+def _percentiles_us(samples):
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1e6
+    return f"p50 {p50:7.1f} | p95 {p95:7.1f} | p99 {p99:7.1f} | máx {samples.max() * 1e6:7.1f} µs"
+
+def run_headless(duration=10.0, mic=None, triggers=(), render_path=None, samplerate=SAMPLERATE, drift_ppm=0.0, duplex=False,
+                 input_samplerate=None, channels=MAX_OUTPUT_CHANNELS, dsp_all=False):
+    """
+    Roda o pipeline real (input_callback → output_callback → monitor_callback, mixer e agendador)
+    com dispositivos simulados e relógio simulado, sem placa de som nem interface. Grava a
+    saída virtual em WAV (opcional) e imprime tempo de CPU por callback, profundidade do
+    buffer e underruns. 'drift_ppm' faz o relógio do microfone andar mais rápido/devagar e
+    'input_samplerate' simula um microfone com taxa nominal diferente da saída;
+    'duplex' usa o duplex_callback (um único stream, drift não se aplica), 'channels' é a
+    contagem de canais da saída e do monitor simulados e 'dsp_all' liga todos os estágios de
+    DSP (além dos ligados no config.json) para medir a CPU de cada um. Retorna a saída
+    renderizada, ou None se algum --trigger não puder ser resolvido.
+    """
+    global input_stream, output_stream, monitor_stream
+
+    config = load_config()
+    shortcuts, policies = parse_shortcuts(config.get('soundboard_shortcuts', {}))
+    CLIP_TRIMS.update(config.get('clip_trims', {}))
+    folder = config.get('soundboard_folder', '')
+    banks = split_banks(sorted(scan_soundboard_folder(folder))) if folder and os.path.isdir(folder) else []
+    try:
+        events = _parse_triggers(triggers, shortcuts, banks, config.get('active_bank', 0), policies)
+    except ValueError as e:
+        print(f"Erro no --trigger: {e}", file=sys.stderr)
+        return None
+
+    # Mesmos ajustes que a interface aplicaria ao abrir
+    global music_volume_factor, mic_volume_factor, monitor_volume_factor, resample_quality
+    music_volume_factor = config.get('volume_level', 80) / 100.0
+    mic_volume_factor = config.get('mic_volume_level', 100) / 100.0
+    monitor_volume_factor = config.get('monitor_volume_level', 50) / 100.0
+    mixer.bus_ducking.update(config.get('bus_ducking', {}))
+    mixer.duck_level = config.get('duck_level', 0) / 100.0
+    resample_quality = config.get('resample_quality', RESAMPLE_QUALITY)
+    disk_store.enabled = config.get('disk_cache', True)
+    input_samplerate = samplerate if duplex else (input_samplerate or samplerate)
+    set_target_latency(config.get('target_latency_ms', TARGET_LATENCY_MS), samplerate, input_samplerate)
+    mic_resampler.clock = trigger_stats.clock = lambda: FakeStream.now
+    trigger_stats.reset()
+    mic_resampler.configure(input_samplerate, samplerate)
+    set_output_channels(channels, channels)
+    apply_dsp_settings(config.get('dsp', {}))
+    for chain in DSP_CHAINS:
+        for stage in chain.stages:
+            stage.enabled = stage.enabled or dsp_all
+    mic_chain.configure(input_samplerate, MIC_CHANNELS)
+    output_chain.configure(samplerate, channels)
+    mixer.set_samplerate(samplerate)
+    scheduler.samplerate = samplerate
+    scheduler.status_callback = lambda message, color: print(f"  [status] {message}")
+
+    # Pré-carrega os efeitos para que o disparo não dependa da velocidade do disco
+    clip_cache.prewarm([entry[1] for _, _, entry in events if entry is not None and entry[2] == 'sfx'], samplerate)
+
+    if duplex:
+        input_stream = output_stream = FakeStream(duplex_callback, samplerate, channels)
+    else:
+        input_stream = FakeStream(input_callback, input_samplerate, MIC_CHANNELS, drift_ppm=drift_ppm)
+        output_stream = FakeStream(output_callback, samplerate, channels)
+    monitor_stream = FakeStream(monitor_callback, samplerate, channels)
+    for stream in (input_stream, output_stream, monitor_stream):
+        stream.start()
+
+    blocks = int(np.ceil(duration * samplerate / BLOCKSIZE))
+    mic_signal = _load_headless_mic(mic, input_samplerate, (blocks + 16) * BLOCKSIZE)
+    rendered = np.zeros((blocks * BLOCKSIZE, channels), dtype=np.float32)
+
+    # Estatísticas pré-alocadas (uma posição por bloco de saída)
+    cpu = {'input': np.zeros(int(blocks * 2 * input_samplerate / samplerate) + 2), 'output': np.zeros(blocks), 'monitor': np.zeros(blocks)}
+    depth = np.zeros(blocks)
+    input_count = 0
+    underrun_blocks = 0
+
+    try:
+        for block in range(blocks):
+            now = output_stream.next_time
+
+            # Dispara os eventos que caem antes deste bloco (a latência inclui a espera pelo bloco)
+            FakeStream.now = now
+            while events and events[0][0] <= now:
+                pressed, hotkey, entry = events.pop(0)
+                if entry is None:
+                    scheduler.stop_all()
+                    scheduler.status_callback(f"TODOS os áudios parados ({hotkey.upper()}).", COLOR_WARNING)
+                else:
+                    key, path, bus, policy = entry
+                    scheduler.trigger(key, path, bus, policy, pressed)
+            scheduler.step()
+
+            if duplex:
+                start = (block * BLOCKSIZE) % (len(mic_signal) - BLOCKSIZE)
+                cpu['output'][block] = output_stream.run_block(mic_signal[start:start + BLOCKSIZE], duplex=True)
+            else:
+                # Entrada com relógio próprio: pode rodar 0, 1 ou 2 vezes por bloco de saída (drift)
+                while input_stream.next_time <= now and input_count < len(cpu['input']):
+                    start = (input_count * BLOCKSIZE) % (len(mic_signal) - BLOCKSIZE)
+                    cpu['input'][input_count] = input_stream.run_block(mic_signal[start:start + BLOCKSIZE])
+                    input_count += 1
+
+            depth[block] = output_ring.fill()
+            underruns_before = output_ring.underrun_frames
+            if not duplex:
+                cpu['output'][block] = output_stream.run_block()
+            if output_ring.underrun_frames > underruns_before:
+                underrun_blocks += 1
+            rendered[block * BLOCKSIZE:(block + 1) * BLOCKSIZE] = output_stream.buffer
+
+            cpu['monitor'][block] = monitor_stream.run_block()
+            monitor_stream.next_time = output_stream.next_time
+    finally:
+        scheduler.step() # Registra a latência dos disparos do último bloco
+        scheduler.reset()
+        scheduler.step()
+        mic_resampler.clock = trigger_stats.clock = time.perf_counter
+        input_stream = output_stream = monitor_stream = None
+
+    budget = BLOCKSIZE / samplerate
+    mode = "duplex" if duplex else f"streams separados, microfone a {input_samplerate} Hz com drift de {drift_ppm:+.0f} ppm"
+    print(f"Headless: {duration:.1f} s simulados a {samplerate} Hz em {channels} canal(is), blocos de {BLOCKSIZE} frames "
+          f"(orçamento {budget * 1e3:.2f} ms por bloco), {mode}")
+    for name, samples in (('input', cpu['input'][:input_count]), ('output', cpu['output']), ('monitor', cpu['monitor'])):
+        if len(samples):
+            print(f"  CPU {name:8s}: {_percentiles_us(samples)} ({samples.max() / budget * 100:.1f}% do orçamento no pior caso)")
+    for line in dsp_report_lines():
+        print(f"  DSP {line}")
+    triggers = trigger_stats.summary()
+    if triggers['triggers']:
+        print(f"  Disparos: {triggers['triggers']} | tecla → 1ª amostra p50 {triggers['first_sample_p50_ms']:.1f} ms | "
+              f"máx {triggers['first_sample_max_ms']:.1f} ms (simulado: espera pelo próximo bloco)")
+    depth_ms = depth * 1000.0 / input_samplerate
+    tail = depth_ms[len(depth_ms) // 2:] # Segunda metade: depois que o controle de drift convergiu
+    print(f"  Buffer de saída: média {depth_ms.mean():.1f} ms | máx {depth_ms.max():.1f} ms | "
+          f"2ª metade {tail.min():.1f}–{tail.max():.1f} ms")
+    if not duplex:
+        print(f"  Drift compensado: {mic_resampler.drift_ppm():+.0f} ppm (razão {mic_resampler.ratio:.6f}, nominal {mic_resampler.nominal:.6f})")
+    print(f"  Underruns: {underrun_blocks} blocos ({output_ring.underrun_frames} frames) | "
+          f"descartados {output_ring.dropped_frames} frames | overruns {output_ring.overrun_frames} frames | "
+          f"blocos limitados {output_buffers.limited_blocks}")
+
+    if render_path:
+        sf.write(render_path, rendered, samplerate)
+        print(f"  Saída gravada em {render_path}")
+    return rendered
+
+BENCH_POLICIES = [PlayPolicy('toggle'), PlayPolicy('oneshot'), PlayPolicy('retrigger'), PlayPolicy('overlap', 4),
+                  PlayPolicy('retrigger', choke_group='bench'), PlayPolicy('overlap', 2, 'bench')]
+
+def _bench_clips(folder):
+    """Clipes do teste de estresse: os áudios da pasta ou, sem pasta, rajadas de ruído sintéticas."""
+    if folder and os.path.isdir(folder):
+        return sorted(scan_soundboard_folder(folder)), None
+    workdir = tempfile.TemporaryDirectory()
+    rng = np.random.default_rng(0)
+    paths = []
+    for n, seconds in enumerate((0.15, 0.3, 0.5, 1.0, 2.0, 4.0)):
+        audio = (0.2 * rng.standard_normal((int(SAMPLERATE * seconds), 2))).astype(np.float32)
+        paths.append(os.path.join(workdir.name, f"bench_{n}.wav"))
+        sf.write(paths[-1], audio, SAMPLERATE)
+    return paths, workdir
+
+def _policy_violations(voices, policies):
+    """
+    Conta o que a PlayPolicy de cada atalho não permite nas vozes audíveis (ativas, sem parada
+    nem fim): cópias além do limite do modo (uma, ou max_voices no modo sobrepor) e grupos de
+    corte com mais de um atalho tocando.
+    """
+    copies, groups = {}, {}
+    for voice in voices:
+        if voice.active and not voice.stopped and not voice.finished:
+            copies[voice.key] = copies.get(voice.key, 0) + 1
+            if voice.choke_group:
+                groups.setdefault(voice.choke_group, set()).add(voice.key)
+    violations = 0
+    for key, count in copies.items():
+        policy = policies.get(key, DEFAULT_POLICY)
+        violations += count > (policy.max_voices if policy.mode == 'overlap' else 1)
+    return violations + sum(len(keys) > 1 for keys in groups.values())
+
+def benchmark_triggers(rate=300, duration=5.0, folder=None, samplerate=SAMPLERATE):
+    """
+    Teste de estresse dos disparos com os threads reais (TriggerDispatcher e agendador):
+    uma thread aperta atalhos aleatórios, com todos os modos de disparo e grupos de corte,
+    'rate' vezes por segundo, enquanto outra roda os callbacks de entrada, saída e monitor no
+    ritmo real dos blocos com dispositivos simulados. Passa se o p99 do tempo por bloco ficar
+    abaixo de metade do orçamento, com o p50 tecla → voz ativa abaixo de
+    1 ms e o p99 tecla → 1ª amostra abaixo de dois blocos + 1 ms. Com o pool cheio o disparo
+    espera o callback liberar o slot roubado, então o p99 da ativação inclui essa espera.
+    Depois de cada bloco as vozes audíveis são conferidas contra as políticas (sem cópias
+    repetidas de alternar/uma vez/reiniciar, sobrepor até max_voices, grupos exclusivos).
+    """
+    global input_stream, output_stream, monitor_stream, trigger_stats
+
+    folder = folder or load_config().get('soundboard_folder', '')
+    paths, workdir = _bench_clips(folder)
+    if not paths:
+        print(f"ERRO: nenhum áudio em '{folder}'", file=sys.stderr)
+        return False
+    disk_enabled = disk_store.enabled
+    disk_store.enabled = workdir is None # Clipes sintéticos não vão para o cache em disco
+
+    hotkeys = [f"bench+{n}" for n in range(len(paths) * 2)]
+    index = {hotkey: (hotkey, paths[n % len(paths)], 'sfx', BENCH_POLICIES[n % len(BENCH_POLICIES)])
+             for n, hotkey in enumerate(hotkeys)}
+    previous_index, previous_stats = trigger_dispatcher.index, trigger_stats
+    trigger_stats = TriggerLatencyStats(int(rate * duration) + 1)
+    trigger_stats.log = False
+
+    mic_resampler.configure(samplerate, samplerate)
+    mic_chain.configure(samplerate, MIC_CHANNELS)
+    output_chain.configure(samplerate, output_channels)
+    mixer.set_samplerate(samplerate)
+    scheduler.samplerate = samplerate
+    clip_cache.prewarm(paths, samplerate)
+    input_stream = FakeStream(input_callback, samplerate, MIC_CHANNELS)
+    output_stream = FakeStream(output_callback, samplerate, output_channels)
+    monitor_stream = FakeStream(monitor_callback, samplerate, monitor_channels)
+    trigger_dispatcher.index = index
+    scheduler.start()
+    trigger_dispatcher.start()
+
+    period = BLOCKSIZE / samplerate
+    blocks = int((duration + 0.5) / period) # Meio segundo a mais para as últimas vozes chegarem ao DAC
+    cpu = np.zeros(blocks)
+    late = [0]
+    policies = {key: policy for key, _, _, policy in index.values()}
+    violations, full_blocks = [0], [0]
+    mic_block = np.zeros((BLOCKSIZE, MIC_CHANNELS), dtype=np.float32)
+
+    def audio():
+        started = time.perf_counter()
+        for block in range(blocks):
+            deadline = started + (block + 1) * period
+            begin = time.perf_counter()
+            input_stream.run_block(mic_block)
+            output_stream.run_block()
+            monitor_stream.run_block()
+            cpu[block] = time.perf_counter() - begin
+            violations[0] += _policy_violations(mixer.voices, policies)
+            full_blocks[0] += all(voice.active for voice in mixer.voices)
+            remaining = deadline - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+            else:
+                late[0] += 1 # O próximo bloco já deveria ter saído
+
+    def fire():
+        rng = np.random.default_rng(1)
+        started = time.perf_counter()
+        for n in range(int(rate * duration)):
+            delay = started + n / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            trigger_dispatcher.press(hotkeys[rng.integers(len(hotkeys))])
+
+    audio_thread = threading.Thread(target=audio, name="BenchAudio")
+    fire_thread = threading.Thread(target=fire, name="BenchTriggers")
+    try:
+        audio_thread.start()
+        fire_thread.start()
+        fire_thread.join()
+        audio_thread.join()
+        time.sleep(SCHEDULER_POLL_S * 2) # Última passada do agendador (registra as latências)
+        summary = trigger_stats.summary()
+    finally:
+        scheduler.stop_all()
+        time.sleep(SCHEDULER_POLL_S * 2)
+        trigger_dispatcher.index, trigger_stats = previous_index, previous_stats
+        disk_store.enabled = disk_enabled
+        input_stream = output_stream = monitor_stream = None
+        if workdir is not None:
+            workdir.cleanup()
+
+    p99 = np.percentile(cpu, 99)
+    first_sample_limit = 2 * period * 1e3 + 1.0
+    ok = (p99 < period / 2 and summary['activation_p50_ms'] < 1.0
+          and summary['first_sample_p99_ms'] < first_sample_limit and not violations[0])
+    print(f"Estresse: {int(rate * duration)} disparos ({rate}/s por {duration:.1f} s) em {len(hotkeys)} atalhos, "
+          f"modos {', '.join(sorted({p.mode for p in BENCH_POLICIES}))}, polifonia {MAX_VOICES}")
+    print(f"  Callbacks por bloco: {_percentiles_us(cpu)} (orçamento {period * 1e6:.0f} µs, limite do p99 {period * 5e5:.0f} µs) | "
+          f"blocos atrasados {late[0]} (o SO não rodou a thread a tempo)")
+    print(f"  Vozes disparadas: {summary['triggers']} | tecla → voz ativa p50 {summary['activation_p50_ms']:.3f} ms (limite 1 ms) | "
+          f"p99 {summary['activation_p99_ms']:.3f} ms (inclui a espera por slots roubados)")
+    print(f"  Tecla → 1ª amostra p50 {summary['first_sample_p50_ms']:.2f} ms | p99 {summary['first_sample_p99_ms']:.2f} ms "
+          f"(limite {first_sample_limit:.1f} ms: dois blocos + 1 ms)")
+    print(f"  Políticas: {violations[0]} violação(ões) em {blocks} blocos (pool cheio em {full_blocks[0]})")
+    print("OK: disparos em rajada sem atrasar os callbacks." if ok
+          else "FALHOU: os disparos em rajada atrasaram o áudio ou a ativação, ou furaram as políticas.")
+    return ok
+
 # ==================== INICIALIZAÇÃO ====================
 
+_MODULE_DONE = time.perf_counter()
+
 if __name__ == "__main__":
-    keyboard.unhook_all()
+    parser = argparse.ArgumentParser(description="VoiceGaming SWITCH")
+    parser.add_argument('--check-allocs', type=int, nargs='?', const=5000, metavar='BLOCOS',
+                        help="Verifica com tracemalloc que os callbacks de áudio não alocam memória e sai.")
+    parser.add_argument('--bench-resample', nargs='?', const='', metavar='PASTA',
+                        help="Compara a vazão das qualidades de reamostragem nos clipes (padrão: pasta do soundboard) e sai.")
+    parser.add_argument('--bench-triggers', type=int, nargs='?', const=300, metavar='POR_SEGUNDO',
+                        help="Teste de estresse: dispara atalhos com todos os modos nessa taxa por --duration segundos e sai.")
+    parser.add_argument('--headless', action='store_true',
+                        help="Roda o pipeline com dispositivos simulados (sem placa de som) e imprime o benchmark.")
+    parser.add_argument('--render', metavar='SAIDA.wav', help="Grava a saída virtual do modo headless em WAV.")
+    parser.add_argument('--mic', metavar='ARQUIVO', help="Áudio usado como microfone no modo headless (padrão: tom de 220 Hz).")
+    parser.add_argument('--trigger', action='append', default=[], metavar='TEMPO:ATALHO',
+                        help="Dispara um atalho (ex.: 1.5:home+1, 0:0, 4:home+end) ou arquivo no modo headless. Pode repetir.")
+    parser.add_argument('--duration', type=float, default=10.0, metavar='S', help="Duração simulada do modo headless.")
+    parser.add_argument('--samplerate', type=int, default=SAMPLERATE, help="Taxa dos dispositivos simulados.")
+    parser.add_argument('--drift-ppm', type=float, default=0.0, help="Diferença de relógio do microfone simulado (ppm).")
+    parser.add_argument('--input-samplerate', type=int, metavar='HZ', help="Taxa nominal do microfone simulado (padrão: igual à saída).")
+    parser.add_argument('--duplex', action='store_true', help="Simula o modo duplex (um único stream mic → saída).")
+    parser.add_argument('--dsp-all', action='store_true', help="Liga todos os estágios de DSP no modo headless (mede a CPU de cada um).")
+    parser.add_argument('--channels', type=int, choices=range(1, MAX_OUTPUT_CHANNELS + 1), default=MAX_OUTPUT_CHANNELS,
+                        help="Canais da saída e do monitor simulados no modo headless.")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="Abre a interface, espera a partida terminar (dispositivos, scipy e pré-carga), imprime o tempo de cada fase e sai.")
+    args, qt_args = parser.parse_known_args()
     
-    if not QtWidgets.QApplication.instance():
-        app = QtWidgets.QApplication(sys.argv)
-    else:
-        app = QtWidgets.QApplication.instance()
+    if args.check_allocs:
+        sys.exit(0 if check_callback_allocations(args.check_allocs) else 1)
+    
+    if args.bench_resample is not None:
+        sys.exit(0 if benchmark_resampling(args.bench_resample, args.samplerate) else 1)
+    
+    if args.bench_triggers:
+        sys.exit(0 if benchmark_triggers(args.bench_triggers, args.duration, samplerate=args.samplerate) else 1)
+    
+    if args.headless or args.render:
+        rendered = run_headless(args.duration, args.mic, args.trigger, args.render, args.samplerate, args.drift_ppm,
+                                args.duplex, args.input_samplerate, args.channels, args.dsp_all)
+        sys.exit(0 if rendered is not None else 2)
+    
+    startup_profile.add("importações (numpy, PyQt5, stdlib)", _STARTUP_T0, _IMPORTS_DONE)
+    startup_profile.add("definições do módulo (mixer, DSP, buffers)", _IMPORTS_DONE, _MODULE_DONE)
+    
+    with startup_profile.phase("QApplication"):
+        if not QtWidgets.QApplication.instance():
+            app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+        else:
+            app = QtWidgets.QApplication.instance()
         
     app.setQuitOnLastWindowClosed(False) 
     
@@ -1239,6 +4859,18 @@ if __name__ == "__main__":
     font = QtGui.QFont("Segoe UI", 10)
     app.setFont(font)
     
-    window = VoiceGamingSWITCH()
-    window.show()
+    app.aboutToQuit.connect(config_service.flush) # Grava o que ainda estiver na janela de espera
+    app.aboutToQuit.connect(disk_store.flush)
+    
+    with startup_profile.phase("janela (config + widgets)"):
+        window = VoiceGamingSWITCH()
+        window.show()
+    
+    if args.profile_startup:
+        def finish_profile(ok):
+            startup_profile.report()
+            if not ok:
+                print(f"Partida com erros em: {', '.join(window.startup_errors)}", file=sys.stderr)
+            app.exit(0 if ok else 1)
+        window.startup_signal.connect(finish_profile)
     sys.exit(app.exec_())
\ No newline at end of file